@@ -2,6 +2,25 @@ import pandas as pd
 import numpy as np
 import math
 import asyncio
+from .strategy_plan import plan_cache, PRICE_FIELDS
+from .indicators import IndicatorCache, indicator_column, normalize_params
+from .timeframes import TF_SECONDS, TF_MS, DEFAULT_TIMEFRAME, resample, align, take
+from .profiling import NULL_PROFILE
+
+# Bars of history an indicator needs before its value stops depending on where the data starts.
+# EMA-style recursions never fully forget their seed, so they get EMA_WARMUP x length
+# (seed weight (1 - 2/(L+1))^(10L) < 1e-8). PSAR / SuperTrend carry a flip state, so they get a fixed floor.
+EMA_WARMUP = 10
+PATH_WARMUP = 500
+
+# Taker fee charged on both legs, and the simulated starting wallet (the paper ledger uses both too)
+FEE_RATE = 0.0005
+STARTING_BALANCE = 1000.0
+
+def to_ms(value):
+    ts = pd.to_datetime(value)
+    if ts.tzinfo is not None: ts = ts.tz_convert(None)
+    return int(ts.value // 1_000_000)
 
 class Backtester:
     def __init__(self):
@@ -15,147 +34,248 @@ class Backtester:
         if isinstance(data, list): return [self.sanitize(i) for i in data]
         return data
 
-    def calc_tv_ema(self, series, length):
-        vals = series.values
-        ema = np.full_like(vals, np.nan, dtype=float)
-        alpha = 2.0 / (length + 1)
-        # TradingView starts with an SMA
-        if len(vals) < length: return pd.Series(ema, index=series.index)
-        ema[length-1] = np.mean(vals[:length])
-        for i in range(length, len(vals)):
-            ema[i] = alpha * vals[i] + (1 - alpha) * ema[i-1]
-        return pd.Series(ema, index=series.index)
-
-    def prepare_data(self, df, logic):
+    def ts_ms(self, df):
+        # Epoch-ms int64 view of the timestamp column (datetime or compact int64 frames)
+        ts = df['timestamp'].values
+        return ts if ts.dtype.kind in 'iu' else ts.astype('datetime64[ms]').astype(np.int64)
+
+    def format_ts(self, ms):
+        # Same text as str(pd.Timestamp), but only for the rows that are actually emitted
+        stamps = np.asarray(ms, dtype=np.int64).astype('datetime64[ms]')
+        if len(stamps) == 0: return [] # np.char.replace fails on an empty array (numpy 2)
+        return np.char.replace(np.datetime_as_string(stamps, unit='s'), 'T', ' ').tolist()
+
+    def price_array(self, df, col):
+        # Compact frames keep prices as float32, round them back to the quoted tick size
+        vals = df[col].values
+        if vals.dtype != np.float32: return vals
+        dp = df.attrs.get('decimals', {}).get(col)
+        return vals.astype(np.float64) if dp is None else np.round(vals.astype(np.float64), dp)
+
+    def trades_to_rows(self, cols, start=0, stop=None):
+        # Columnar trades -> the row dicts the dashboard renders, for one page at a time
+        sl = slice(start, stop)
+        entry_t, exit_t = self.format_ts(np.asarray(cols['entry_time'])[sl]), self.format_ts(np.asarray(cols['exit_time'])[sl])
+        fields = [np.asarray(cols[c])[sl].tolist() for c in ['entry_price', 'exit_price', 'qty', 'pnl', 'reason']]
+        return [{'entry_time': entry_t[k], 'exit_time': exit_t[k], 'entry_price': ep, 'exit_price': xp, 'qty': q, 'pnl': p, 'reason': r} for k, (ep, xp, q, p, r) in enumerate(zip(*fields))]
+
+    def indicator_lookback(self, name, params):
+        p = normalize_params(name, params)
+        length = int(p.get('length') or 14)
+        if name in ['ema', 'keltner_upper', 'keltner_lower']: return length * EMA_WARMUP
+        if name in ['macd', 'ppo']: return max(p['fast'], p['slow']) * EMA_WARMUP
+        if name == 'tsi': return (p['long_length'] + p['short_length']) * EMA_WARMUP
+        if name == 'adx': return length * EMA_WARMUP * 2 # rma decays at 1/length, half the speed of an ema
+        if name == 'uo': return p['slow'] + 1
+        if name == 'hma': return length + int(np.sqrt(length))
+        if name == 'stoch_k': return p['window'] + p['smooth']
+        if name == 'stoch_d': return p['window'] + p['smooth'] + p['d_smooth']
+        if name == 'ichimoku_a': return max(p['conversion'], p['base']) + p['displacement']
+        if name == 'ichimoku_b': return p['span_b'] + p['displacement']
+        # obv / adl are running totals: their level depends on where the data starts, not a window
+        if name in ['supertrend', 'psar', 'obv', 'adl']: return max(length, PATH_WARMUP)
+        return length + 1
+
+    def warmup_bars(self, logic):
+        # In bars of the strategy's timeframe; another timeframe's lookback (+1 partial bucket) is converted
+        plan = plan_cache.get(logic)
+        base_sec = TF_SECONDS.get(plan.timeframe, 3600)
+        warmup = 0
+        for _, name, params, tf in plan.indicators:
+            bars = self.indicator_lookback(name, params) if name not in PRICE_FIELDS else 0
+            if tf: bars = math.ceil((bars + 1) * TF_SECONDS[tf] / base_sec)
+            warmup = max(warmup, bars)
+        return warmup + 1 # +1 so the previous bar is valid for CROSSES_* on the first visible bar
+
+    def data_window(self, logic, timeframe):
+        # [startDate - warm-up, endDate] in epoch ms, so the vault only loads what the run needs
+        s_date, e_date = logic.get('startDate'), logic.get('endDate')
+        if not (s_date and e_date): return None, None
+        warmup_ms = self.warmup_bars(logic) * TF_SECONDS.get(timeframe, 3600) * 1000
+        return to_ms(s_date) - warmup_ms, to_ms(e_date) + 86400000
+
+    def can_roll_up(self, base_tf, tf):
+        return TF_SECONDS[tf] > TF_SECONDS[base_tf] and TF_SECONDS[tf] % TF_SECONDS[base_tf] == 0
+
+    def vault_timeframes(self, logic):
+        # Timeframes the caller must load from the vault: anything that isn't a roll-up of the strategy's bars
+        plan = plan_cache.get(logic)
+        return [tf for tf in plan.timeframes if not self.can_roll_up(plan.timeframe, tf)]
+
+    def timeframe_frame(self, df, base_tf, tf, frames=None):
+        if frames and tf in frames and frames[tf] is not None and not frames[tf].empty: return frames[tf]
+        if self.can_roll_up(base_tf, tf): return resample(self.ts_ms(df), df, TF_MS[tf])
+        return None
+
+    def prepare_data(self, df, logic, frames=None, profile=NULL_PROFILE):
+        # frames: optional {tf: vault DataFrame} for timeframes that can't be rolled up from df
         try:
-            conditions = logic.get('conditions', [])
-            for cond in conditions:
-                for side in ['left', 'right']:
-                    item = cond.get(side)
-                    if not item or item.get('type') == 'number': continue
-                    name, params = item.get('type'), item.get('params', {})
-                    length = int(params.get('length') or 14)
-                    col_name = f"{name}_{length}"
-                    if col_name in df.columns: continue
-
-                    if name == 'ema': df[col_name] = self.calc_tv_ema(df['close'], length)
-                    elif name == 'sma': df[col_name] = df['close'].rolling(window=length).mean()
-                    elif name == 'rsi':
-                        delta = df['close'].diff()
-                        gain = (delta.where(delta > 0, 0)).rolling(window=length).mean()
-                        loss = (-delta.where(delta < 0, 0)).rolling(window=length).mean()
-                        df[col_name] = 100 - (100 / (1 + (gain / loss)))
-                    elif name == 'macd':
-                        f, s = int(params.get('fast', 12)), int(params.get('slow', 26))
-                        df[col_name] = self.calc_tv_ema(df['close'], f) - self.calc_tv_ema(df['close'], s)
-                    elif name == 'vwap':
-                        tp = (df['high'] + df['low'] + df['close']) / 3
-                        df[col_name] = (tp * df['volume']).rolling(window=length).sum() / df['volume'].rolling(window=length).sum()
+            plan = plan_cache.get(logic)
+            caches = {None: (IndicatorCache(df), None)}
+            for _, name, params, tf in plan.indicators:
+                col_name = indicator_column(name, params, tf)
+                if col_name in df.columns: continue
+                if tf not in caches:
+                    tf_df = self.timeframe_frame(df, plan.timeframe, tf, frames)
+                    idx = None if tf_df is None else align(self.ts_ms(df), TF_MS[plan.timeframe], self.ts_ms(tf_df), TF_MS[tf])
+                    caches[tf] = (None if tf_df is None else IndicatorCache(tf_df), idx)
+                cache, idx = caches[tf]
+                if cache is None: continue
+                with profile.stage(f"indicator:{col_name}"):
+                    df[col_name] = cache.get(name, params) if idx is None else take(cache.get(name, params), idx)
             return df.ffill().bfill().fillna(0)
         except: return df
 
-    def calculate_audit_stats(self, trades, equity_curve):
-        if not trades: return {"profit_factor": 0, "avg_win": 0, "avg_loss": 0, "max_drawdown": 0, "sharpe_ratio": 0, "sortino_ratio": 0, "expectancy": 0, "max_cons_losses": 0, "avg_duration": "0h 0m"}
-        wins = [t['pnl'] for t in trades if t['pnl'] > 0]
-        losses = [t['pnl'] for t in trades if t['pnl'] <= 0]
-        avg_win, avg_loss = np.mean(wins) if wins else 0.0, np.mean(losses) if losses else 0.0
-        profit_factor = (sum(wins) / abs(sum(losses))) if sum(losses) != 0 else 999.0
-        
-        balances = pd.Series([e['balance'] for e in equity_curve])
-        drawdowns = (balances - balances.cummax()) / balances.cummax() * 100
-        returns = balances.pct_change().dropna()
-        sortino = (returns.mean() / returns[returns<0].std() * np.sqrt(365*24)) if not returns[returns<0].empty else 0
-        
-        max_cons, curr_cons = 0, 0
-        for t in trades:
-            if t['pnl'] < 0: curr_cons += 1; max_cons = max(max_cons, curr_cons)
-            else: curr_cons = 0
-                
-        durations = [(pd.to_datetime(t['exit_time'], utc=True) - pd.to_datetime(t['entry_time'], utc=True)).total_seconds() for t in trades]
-        avg_sec = np.mean(durations) if durations else 0
+    def run_lengths(self, mask):
+        # Lengths of consecutive True runs, e.g. [T T F T] -> [2 1]
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], mask.astype(np.int8), [0]))))
+        return edges[1::2] - edges[::2]
+
+    def calculate_audit_stats(self, pnl, entry_idx, exit_idx, equity, t_ms, bars_in_market):
+        empty = {"profit_factor": 0, "avg_win": 0, "avg_loss": 0, "max_drawdown": 0, "max_drawdown_duration": "0d 0h", "sharpe_ratio": 0, "sortino_ratio": 0, "calmar_ratio": 0, "expectancy": 0, "max_cons_losses": 0, "avg_duration": "0h 0m", "exposure_pct": 0, "monthly_returns": {}}
+        if len(pnl) == 0 or len(equity) < 2: return empty
+        wins, losses = pnl[pnl > 0], pnl[pnl <= 0]
+        avg_win, avg_loss = wins.mean() if len(wins) else 0.0, losses.mean() if len(losses) else 0.0
+        profit_factor = (wins.sum() / abs(losses.sum())) if losses.sum() != 0 else 999.0
+        win_rate = len(wins) / len(pnl)
+
+        # Per-bar equity, so annualisation follows the real bar size of any timeframe
+        bar_sec = max(float(np.median(np.diff(t_ms[:1000]))) / 1000.0, 1.0)
+        periods_per_year = 365 * 86400 / bar_sec
+        peak = np.maximum.accumulate(equity)
+        drawdowns = (equity - peak) / peak * 100
+        max_dd = abs(float(drawdowns.min()))
+        underwater = self.run_lengths(equity < peak)
+        dd_days, dd_rem = divmod((underwater.max() if len(underwater) else 0) * bar_sec, 86400)
+
+        returns = np.diff(equity) / equity[:-1]
+        std = returns.std()
+        downside = np.sqrt(np.mean(np.minimum(returns, 0) ** 2))
+        sharpe = returns.mean() / std * np.sqrt(periods_per_year) if std > 0 else 0
+        sortino = returns.mean() / downside * np.sqrt(periods_per_year) if downside > 0 else 0
+        years = (t_ms[-1] - t_ms[0]) / (365 * 86400 * 1000)
+        cagr = (equity[-1] / equity[0]) ** (1 / years) - 1 if years > 0 and equity[-1] > 0 else -1.0
+        calmar = (cagr * 100) / max_dd if max_dd > 0 else 0
+
+        cons = self.run_lengths(pnl < 0)
+        avg_sec = float(np.mean(t_ms[exit_idx] - t_ms[entry_idx])) / 1000.0
         h, m = divmod(avg_sec, 3600)
+
+        # Month-end equity vs previous month-end (first month vs starting equity)
+        months = t_ms.astype('datetime64[ms]').astype('datetime64[M]')
+        ends = np.append(np.flatnonzero(months[1:] != months[:-1]), len(months) - 1)
+        month_eq = equity[ends]
+        month_ret = month_eq / np.concatenate(([equity[0]], month_eq[:-1])) - 1
+        monthly = {str(mo): round(float(r) * 100, 2) for mo, r in zip(months[ends], month_ret)}
         return {
             "profit_factor": round(float(profit_factor), 2),
             "avg_win": round(float(avg_win), 2),
             "avg_loss": round(float(avg_loss), 2),
-            "max_drawdown": round(abs(float(drawdowns.min())), 2),
-            "sharpe_ratio": round(float(returns.mean() / returns.std() * np.sqrt(365*24)) if returns.std() != 0 else 0, 2),
+            "max_drawdown": round(max_dd, 2),
+            "max_drawdown_duration": f"{int(dd_days)}d {int(dd_rem // 3600)}h",
+            "sharpe_ratio": round(float(sharpe), 2),
             "sortino_ratio": round(float(sortino), 2),
-            "expectancy": round(float((len(wins)/len(trades) * avg_win) + ((1 - len(wins)/len(trades)) * avg_loss)), 2),
-            "max_cons_losses": max_cons,
-            "avg_duration": f"{int(h)}h {int(m//60)}m"
+            "calmar_ratio": round(float(calmar), 2),
+            "expectancy": round(float(win_rate * avg_win + (1 - win_rate) * avg_loss), 2),
+            "max_cons_losses": int(cons.max()) if len(cons) else 0,
+            "avg_duration": f"{int(h)}h {int(m//60)}m",
+            "exposure_pct": round(bars_in_market / max(len(equity) - 1, 1) * 100, 2),
+            "monthly_returns": monthly
         }
 
-    def run_simulation(self, df, logic):
+    def run_simulation(self, df, logic, columnar=False, frames=None, profile=NULL_PROFILE):
+        # profile: a profiling.BacktestProfile to collect per-stage wall times into
         try:
-            df = self.prepare_data(df, logic)
+            # Only compute indicators over [startDate - warm-up, endDate]
+            warmup = self.warmup_bars(logic)
             s_date, e_date = logic.get('startDate'), logic.get('endDate')
             if s_date and e_date:
-                mask = (df['timestamp'] >= pd.to_datetime(s_date)) & (df['timestamp'] <= pd.to_datetime(e_date) + pd.Timedelta(days=1))
-                df = df[mask].reset_index(drop=True)
-            elif len(df) > 200: df = df.iloc[200:].reset_index(drop=True)
+                ts = self.ts_ms(df)
+                lo = int(np.searchsorted(ts, to_ms(s_date), side='left'))
+                hi = int(np.searchsorted(ts, to_ms(e_date) + 86400000, side='right'))
+                start = max(0, lo - warmup)
+                with profile.stage("indicators"):
+                    df = self.prepare_data(df.iloc[start:hi].reset_index(drop=True), logic, frames, profile)
+                    df = df.iloc[lo - start:].reset_index(drop=True)
+            else:
+                with profile.stage("indicators"):
+                    df = self.prepare_data(df.reset_index(drop=True), logic, frames, profile)
+                    if len(df) > warmup: df = df.iloc[warmup:].reset_index(drop=True)
             
             if df.empty: return {"error": "No data in range"}
 
-            # --- SIMULTANEOUS TRUTH LOGIC ---
-            entry_signals = pd.Series(True, index=df.index)
-            has_event, event_mask = False, pd.Series(False, index=df.index)
-            eps = 0.00000001
-
-            def get_s(item):
-                if item['type'] == 'number': return pd.Series(float(item['params']['value']), index=df.index)
-                if item['type'] in ['close', 'open', 'high', 'low', 'volume']: return df[item['type']]
-                return df.get(f"{item['type']}_{int(item['params'].get('length', 14))}", pd.Series(0, index=df.index))
-
-            for cond in logic.get('conditions', []):
-                l, r = get_s(cond['left']), get_s(cond['right'])
-                op = cond['operator']
-                if op == 'CROSSES_ABOVE':
-                    event_mask |= (l > r + eps) & (l.shift(1) <= r.shift(1) + eps); has_event = True
-                elif op == 'CROSSES_BELOW':
-                    event_mask |= (l < r - eps) & (l.shift(1) >= r.shift(1) - eps); has_event = True
-                elif op == 'GREATER_THAN': entry_signals &= (l > r + eps)
-                elif op == 'LESS_THAN': entry_signals &= (l < r - eps)
-
-            if has_event: entry_signals &= event_mask
+            # --- SIMULTANEOUS TRUTH LOGIC (compiled once, evaluated as NumPy arrays) ---
+            with profile.stage("signals"):
+                entry_signals = plan_cache.get(logic).evaluate(df, lambda d, name, params, tf: d.get(indicator_column(name, params, tf), 0))
             
             # --- EXECUTION ---
-            balance, wallet_pct, leverage = 1000.0, float(logic.get('walletPct', 10)), float(logic.get('leverage', 1))
+            balance, wallet_pct, leverage = STARTING_BALANCE, float(logic.get('walletPct', 10)), float(logic.get('leverage', 1))
             sl_pct, tp_pct, tsl_pct = float(logic.get('sl', 0)), float(logic.get('tp', 0)), float(logic.get('tsl', 0))
             side = logic.get('side', 'BUY').upper()
-            equity_curve, closed_trades, position = [], [], None
+            trade_rows, position = [], None
+            equity = np.empty(len(df))
+            equity[0] = balance
             
-            c_vals, h_vals, l_vals, t_vals, sig_vals = df['close'].values, df['high'].values, df['low'].values, df['timestamp'].astype(str).values, entry_signals.values
-
-            for i in range(1, len(df)):
-                curr_c, curr_h, curr_l, curr_t, sig = float(c_vals[i]), float(h_vals[i]), float(l_vals[i]), t_vals[i], sig_vals[i]
-                if position:
-                    exit_p, reason = 0.0, ''
-                    ent = position['entry_price']
-                    position['highest_seen'] = max(position['highest_seen'], curr_h)
-                    position['lowest_seen'] = min(position['lowest_seen'], curr_l)
-                    if side == 'BUY':
-                        if sl_pct > 0 and curr_l <= ent * (1 - sl_pct/100): exit_p, reason = ent * (1 - sl_pct/100), 'SL'
-                        elif tp_pct > 0 and curr_h >= ent * (1 + tp_pct/100): exit_p, reason = ent * (1 + tp_pct/100), 'TP'
-                        elif tsl_pct > 0 and curr_l <= position['highest_seen'] * (1 - tsl_pct/100): exit_p, reason = position['highest_seen'] * (1 - tsl_pct/100), 'Trailing Stop'
-                    else:
-                        if sl_pct > 0 and curr_h >= ent * (1 + sl_pct/100): exit_p, reason = ent * (1 + sl_pct/100), 'SL'
-                        elif tp_pct > 0 and curr_l <= ent * (1 - tp_pct/100): exit_p, reason = ent * (1 - tp_pct/100), 'TP'
-                        elif tsl_pct > 0 and curr_h >= position['lowest_seen'] * (1 + tsl_pct/100): exit_p, reason = position['lowest_seen'] * (1 + tsl_pct/100), 'Trailing Stop'
-                    if exit_p > 0:
-                        pnl = (exit_p - ent) * position['qty'] if side == 'BUY' else (ent - exit_p) * position['qty']
-                        net = pnl - (exit_p * position['qty'] * 0.0005)
-                        balance += net
-                        closed_trades.append({'entry_time': position['entry_time'], 'exit_time': curr_t, 'entry_price': round(ent, 5), 'exit_price': round(exit_p, 5), 'qty': round(position['qty'], 5), 'pnl': round(net, 5), 'reason': reason})
-                        position = None
-                if not position and sig:
-                    trade_val = balance * (wallet_pct / 100.0) * leverage
-                    q = trade_val / curr_c
-                    balance -= (trade_val * 0.0005)
-                    position = {'entry_price': curr_c, 'qty': q, 'entry_time': curr_t, 'highest_seen': curr_c, 'lowest_seen': curr_c}
-                if i % 60 == 0: equity_curve.append({'time': curr_t, 'balance': round(balance, 2)})
-
-            return {"metrics": { "final_balance": round(balance, 2), "total_trades": len(closed_trades), "win_rate": round(len([t for t in closed_trades if t['pnl']>0])/len(closed_trades)*100,1) if closed_trades else 0, "total_return_pct": round(((balance-1000)/1000)*100,2), "start_date": str(df.iloc[0]["timestamp"]), "end_date": str(df.iloc[-1]["timestamp"]), "audit": self.calculate_audit_stats(closed_trades, equity_curve) }, "trades": closed_trades[::-1], "equity": equity_curve[::max(1, len(equity_curve)//1000)] }
+            # Bar indices only, timestamps are formatted after the loop for emitted trades / equity points
+            c_vals, h_vals, l_vals, sig_vals = self.price_array(df, 'close'), self.price_array(df, 'high'), self.price_array(df, 'low'), entry_signals
+            t_ms = self.ts_ms(df)
+
+            with profile.stage("simulation"):
+                for i in range(1, len(df)):
+                    curr_c, curr_h, curr_l, sig = float(c_vals[i]), float(h_vals[i]), float(l_vals[i]), sig_vals[i]
+                    if position:
+                        exit_p, reason = 0.0, ''
+                        ent = position['entry_price']
+                        position['highest_seen'] = max(position['highest_seen'], curr_h)
+                        position['lowest_seen'] = min(position['lowest_seen'], curr_l)
+                        if side == 'BUY':
+                            if sl_pct > 0 and curr_l <= ent * (1 - sl_pct/100): exit_p, reason = ent * (1 - sl_pct/100), 'SL'
+                            elif tp_pct > 0 and curr_h >= ent * (1 + tp_pct/100): exit_p, reason = ent * (1 + tp_pct/100), 'TP'
+                            elif tsl_pct > 0 and curr_l <= position['highest_seen'] * (1 - tsl_pct/100): exit_p, reason = position['highest_seen'] * (1 - tsl_pct/100), 'Trailing Stop'
+                        else:
+                            if sl_pct > 0 and curr_h >= ent * (1 + sl_pct/100): exit_p, reason = ent * (1 + sl_pct/100), 'SL'
+                            elif tp_pct > 0 and curr_l <= ent * (1 - tp_pct/100): exit_p, reason = ent * (1 - tp_pct/100), 'TP'
+                            elif tsl_pct > 0 and curr_h >= position['lowest_seen'] * (1 + tsl_pct/100): exit_p, reason = position['lowest_seen'] * (1 + tsl_pct/100), 'Trailing Stop'
+                        if exit_p > 0:
+                            pnl = (exit_p - ent) * position['qty'] if side == 'BUY' else (ent - exit_p) * position['qty']
+                            net = pnl - (exit_p * position['qty'] * FEE_RATE)
+                            balance += net
+                            trade_rows.append((position['entry_i'], i, ent, exit_p, position['qty'], net, reason))
+                            position = None
+                    if not position and sig:
+                        trade_val = balance * (wallet_pct / 100.0) * leverage
+                        q = trade_val / curr_c
+                        balance -= (trade_val * FEE_RATE)
+                        position = {'entry_price': curr_c, 'qty': q, 'entry_i': i, 'highest_seen': curr_c, 'lowest_seen': curr_c}
+                    # Full-resolution mark-to-market equity
+                    if position:
+                        u = (curr_c - position['entry_price']) if side == 'BUY' else (position['entry_price'] - curr_c)
+                        equity[i] = balance + u * position['qty']
+                    else: equity[i] = balance
+
+            entry_idx = np.array([r[0] for r in trade_rows], dtype=np.int64)
+            exit_idx = np.array([r[1] for r in trade_rows], dtype=np.int64)
+            pnl = np.array([r[5] for r in trade_rows], dtype=np.float64)
+            bars_in_market = int((exit_idx - entry_idx).sum()) + ((len(df) - 1 - position['entry_i']) if position else 0)
+            with profile.stage("audit_stats"): audit = self.calculate_audit_stats(pnl, entry_idx, exit_idx, equity, t_ms, bars_in_market)
+
+            # Newest first, epoch-ms times. columnar=True hands these arrays straight to the streaming encoders.
+            trades = {
+                'entry_time': t_ms[entry_idx][::-1], 'exit_time': t_ms[exit_idx][::-1],
+                'entry_price': np.round(np.array([r[2] for r in trade_rows], dtype=np.float64), 5)[::-1],
+                'exit_price': np.round(np.array([r[3] for r in trade_rows], dtype=np.float64), 5)[::-1],
+                'qty': np.round(np.array([r[4] for r in trade_rows], dtype=np.float64), 5)[::-1],
+                'pnl': np.round(pnl, 5)[::-1],
+                'reason': np.array([r[6] for r in trade_rows], dtype=object)[::-1]
+            }
+            if not columnar: trades = self.trades_to_rows(trades)
+            # Chart gets at most ~1000 evenly spaced equity points
+            sampled = np.arange(0, len(equity), max(1, len(equity) // 1000))
+            sampled_t = self.format_ts(t_ms[sampled])
+            equity_curve = [{'time': sampled_t[k], 'balance': round(float(equity[i]), 2)} for k, i in enumerate(sampled)]
+            first_t, last_t = self.format_ts(t_ms[[0, -1]])
+
+            return {"metrics": { "final_balance": round(balance, 2), "total_trades": len(pnl), "win_rate": round(int((pnl > 0).sum())/len(pnl)*100,1) if len(pnl) else 0, "total_return_pct": round(((balance-STARTING_BALANCE)/STARTING_BALANCE)*100,2), "start_date": first_t, "end_date": last_t, "audit": audit }, "trades": trades, "equity": equity_curve }
         except Exception as e: return {"error": str(e)}
 
 backtester = Backtester()
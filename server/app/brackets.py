@@ -0,0 +1,79 @@
+import asyncio
+import json
+import time
+import hmac
+import hashlib
+import requests
+import ccxt.async_support as ccxt
+from .symbols import symbol_registry
+
+# Exchange-native SL / TP ("bracket") legs, opt-in per strategy with logic['exchangeBrackets'].
+#
+# The legs are sent together with the entry, so an exit no longer waits for the engine to see the
+# price and fire a market order. The engine's own exit monitor stays off for bracketed positions
+# (a second, engine-side close would flip the position). The engine reconciles by polling the
+# exchange position every RECONCILE_SECONDS: flat means a leg (or the user) closed it.
+RECONCILE_SECONDS = 10
+DELTA_URLS = {'api': {'public': 'https://api.india.delta.exchange', 'private': 'https://api.india.delta.exchange'}}
+COINDCX_POSITIONS_URL = "https://api.coindcx.com/exchange/v1/derivatives/futures/positions"
+
+def bracket_levels(side, entry_price, sl_pct=0, tp_pct=0):
+    # Same trigger prices the backtester and the exit monitor use
+    sign = 1 if side == 'BUY' else -1
+    sl = entry_price * (1 - sign * sl_pct / 100) if sl_pct > 0 else None
+    tp = entry_price * (1 + sign * tp_pct / 100) if tp_pct > 0 else None
+    return sl, tp
+
+def supports(broker, tsl_pct):
+    # CoinDCX legs are plain SL / TP; a trailing stop there stays with the engine's exit monitor
+    return broker == "DELTA" or (broker == "COINDCX" and not tsl_pct)
+
+def order_params(broker, side, entry_price, sl_pct=0, tp_pct=0, tsl_pct=0):
+    sl, tp = bracket_levels(side, entry_price, sl_pct, tp_pct)
+    if broker == "DELTA":
+        params = {'bracket_stop_trigger_method': 'last_traded_price'}
+        if sl: params['bracket_stop_loss_price'] = str(round(sl, 8))
+        if tp: params['bracket_take_profit_price'] = str(round(tp, 8))
+        if tsl_pct > 0: params['bracket_trail_amount'] = str(round(entry_price * tsl_pct / 100, 8))
+        return params
+    params = {}
+    if sl: params['stop_loss_price'] = round(sl, 8)
+    if tp: params['take_profit_price'] = round(tp, 8)
+    return params
+
+class BracketTracker:
+    def __init__(self, reconcile_seconds=RECONCILE_SECONDS):
+        self.reconcile_seconds = reconcile_seconds
+        self.checked = {}  # strat_id -> last reconcile time
+
+    def due(self, strat_id):
+        now = time.time()
+        if now - self.checked.get(strat_id, 0) < self.reconcile_seconds: return False
+        self.checked[strat_id] = now
+        return True
+
+    def forget(self, strat_id):
+        self.checked.pop(strat_id, None)
+
+    async def position_size(self, broker, symbol, api_key, secret):
+        # Absolute open size on the exchange, None when it can't be read (never treated as flat)
+        try:
+            if broker == "DELTA":
+                exchange = ccxt.delta({'apiKey': api_key, 'secret': secret, 'options': {'defaultType': 'future'}, 'urls': DELTA_URLS})
+                try: positions = await exchange.fetch_positions([symbol])
+                finally: await exchange.close()
+                return sum(abs(float(p.get('contracts') or 0)) for p in positions)
+            if broker == "COINDCX":
+                payload = {"timestamp": int(time.time() * 1000), "page": "1", "size": "100"}
+                json_payload = json.dumps(payload, separators=(',', ':'))
+                signature = hmac.new(bytes(secret, 'utf-8'), bytes(json_payload, 'utf-8'), hashlib.sha256).hexdigest()
+                headers = {'Content-Type': 'application/json', 'X-AUTH-APIKEY': api_key, 'X-AUTH-SIGNATURE': signature}
+                resp = await asyncio.to_thread(requests.post, COINDCX_POSITIONS_URL, data=json_payload, headers=headers, timeout=10)
+                if resp.status_code != 200: return None
+                market = symbol_registry.get(broker, symbol).order
+                return sum(abs(float(p.get('active_pos') or 0)) for p in resp.json() if p.get('pair') == market)
+        except Exception as err:
+            print(f"Bracket Reconcile Error: {err}")
+        return None
+
+bracket_tracker = BracketTracker()
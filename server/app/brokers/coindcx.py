@@ -1,10 +1,21 @@
-import pandas as pd
-import requests
 import asyncio
+import json
+import os
 import time
-import urllib3
+import aiohttp
+import pandas as pd
+from ..symbols import symbol_registry
 
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+# Async CoinDCX market data on one persistent aiohttp session (ccxt's async client already depends
+# on aiohttp). History comes from CoinDCX's own candles when it has fresh ones, else from Binance
+# spot / futures. Which source served a symbol is remembered, so warm fetches are a single request;
+# cold ones start the Binance requests as hedges once CoinDCX is slow or empty, instead of queueing.
+REQUEST_TIMEOUT = 10  # seconds, per request
+HEDGE_SECONDS = 0.35  # CoinDCX head start before the Binance fallbacks are sent as well
+STALE_MS = 172800000  # CoinDCX candles ending more than 48h ago come from a dead API node
+SOURCES = ("coindcx", "binance_spot", "binance_futures")
+BINANCE_URLS = {"binance_spot": "https://api.binance.com/api/v3/klines", "binance_futures": "https://fapi.binance.com/fapi/v1/klines"}
+BINANCE_COLUMNS = ['time', 'open', 'high', 'low', 'close', 'volume', 'close_time', 'qav', 'num_trades', 'taker_base', 'taker_quote', 'ignore']
 
 class CoinDCXManager:
     def __init__(self):
@@ -14,88 +25,99 @@ class CoinDCXManager:
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)",
             "Accept": "application/json"
         }
+        self.session, self.session_loop = None, None
+        self.sources = {}  # symbol -> source that last served its history
+
+    async def client(self):
+        # One session per event loop (scripts run their own loop via asyncio.run)
+        loop = asyncio.get_running_loop()
+        if self.session is None or self.session.closed or self.session_loop is not loop:
+            self.session = aiohttp.ClientSession(headers=self.stealth_headers, timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+                                                 connector=aiohttp.TCPConnector(limit=50))
+            self.session_loop = loop
+        return self.session
+
+    async def close(self):
+        if self.session is not None and not self.session.closed: await self.session.close()
+        self.session = None
+
+    async def get_json(self, url, params=None, verify=True):
+        # Parsed body of a 200 response, None on any other status or a network error / timeout
+        try:
+            session = await self.client()
+            async with session.get(url, params=params, ssl=None if verify else False) as resp:
+                if resp.status != 200: return None
+                return await resp.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError): return None
 
     async def fetch_symbols(self):
-        import json, os
         if os.path.exists("/app/coindcx_verified.json"):
             try:
                 with open("/app/coindcx_verified.json", "r") as f: return json.load(f)
             except: pass
-        try:
-            response = await asyncio.to_thread(requests.get, "https://api.coindcx.com/exchange/v1/markets_details", headers=self.stealth_headers, timeout=15, verify=False)
-            if response.status_code != 200:
-                response = await asyncio.to_thread(requests.get, "https://api.coindcx.com/exchange/ticker", headers=self.stealth_headers, timeout=15, verify=False)
-            if response.status_code != 200: return ["BTCUSDT", "ETHUSDT"]
+        data = await self.get_json("https://api.coindcx.com/exchange/v1/markets_details", verify=False)
+        if data is None: data = await self.get_json("https://api.coindcx.com/exchange/ticker", verify=False)
+        if not isinstance(data, list): return ["BTCUSDT", "ETHUSDT"]
+        symbols = [item.get('coindcx_name', item.get('market', '')) for item in data]
+        return sorted(list(set([s for s in symbols if s and ('USDT' in s or 'USD' in s)])))
 
-            symbols = [item.get('coindcx_name', item.get('market', '')) for item in response.json()]
-            return sorted(list(set([s for s in symbols if s and ('USDT' in s or 'USD' in s)])))
-        except Exception: return ["BTCUSDT", "ETHUSDT"]
+    async def fetch_source(self, source, symbol, tf, limit):
+        # One history request; a usable frame or None
+        if source == "coindcx":
+            params = {'pair': symbol_registry.get("COINDCX", symbol).candles, 'interval': tf, 'limit': min(limit, 2000)}
+            data = await self.get_json(f"{self.public_url}/market_data/candles", params, verify=False)
+            if not isinstance(data, list) or not data: return None
+            df = self.frame(pd.DataFrame(data), limit)
+            if df is None: return None
+            latest_ms = int(pd.to_numeric(df['time']).max())
+            if int(time.time() * 1000) - latest_ms >= STALE_MS:
+                print(f"⚠️ CoinDCX API node is stale (Ends in {df.iloc[-1]['timestamp']}). Moving to Binance Liquidity...")
+                return None
+            return df
+        params = {"symbol": symbol_registry.get("COINDCX", symbol).vault_key, "interval": tf, "limit": min(limit, 1000)}
+        data = await self.get_json(BINANCE_URLS[source], params)
+        if not isinstance(data, list) or not data: return None
+        return self.frame(pd.DataFrame(data, columns=BINANCE_COLUMNS), limit)
+
+    def frame(self, df, limit):
+        if 'time' not in df.columns: return None
+        df['timestamp'] = pd.to_datetime(pd.to_numeric(df['time']), unit='ms')
+        cols = ['open', 'high', 'low', 'close', 'volume']
+        df[cols] = df[cols].apply(pd.to_numeric, errors='coerce')
+        df = df.drop_duplicates(subset=['timestamp']).sort_values('timestamp').reset_index(drop=True).dropna().tail(limit)
+        return df if not df.empty else None
 
     async def fetch_history(self, symbol, timeframe='1h', limit=3000):
+        tf_map = {'1m': '1m', '5m': '5m', '15m': '15m', '1h': '1h', '4h': '4h', '1d': '1d'}
+        tf = tf_map.get(timeframe, '1h')
         try:
-            clean_symbol = symbol.replace("/", "").replace("-", "").replace("_", "")
-            tf_map = {'1m': '1m', '5m': '5m', '15m': '15m', '1h': '1h', '4h': '4h', '1d': '1d'}
-            tf = tf_map.get(timeframe, '1h')
-            fetch_limit = min(limit, 2000)
-            
-            # --- ATTEMPT 1: CoinDCX Native API ---
-            url = f"{self.public_url}/market_data/candles"
-            candidates = [clean_symbol]
-            if clean_symbol.endswith('USDT'):
-                base = clean_symbol[:-4]
-                candidates.extend([f"B-{base}_USDT", f"B-{clean_symbol}", f"{base}_USDT", f"I-{base}_INR"])
-            
-            data = None
-            for cand in candidates:
-                params = {'pair': cand, 'interval': tf, 'limit': fetch_limit}
-                response = await asyncio.to_thread(requests.get, url, params=params, headers=self.stealth_headers, verify=False)
-                if response.status_code == 200:
-                    resp_json = response.json()
-                    if isinstance(resp_json, list) and len(resp_json) > 0:
-                        data = resp_json
-                        break
-            
-            if data and isinstance(data, list):
-                df = pd.DataFrame(data)
-                if 'time' in df.columns:
-                    df['timestamp'] = pd.to_datetime(df['time'], unit='ms')
-                    cols = ['open', 'high', 'low', 'close', 'volume']
-                    df[cols] = df[cols].apply(pd.to_numeric, errors='coerce')
-                    df = df.drop_duplicates(subset=['timestamp']).sort_values('timestamp').reset_index(drop=True).dropna().tail(limit)
-                    
-                    if not df.empty:
-                        import time
-                        # 🛑 STALE DATA DETECTOR
-                        # If CoinDCX returns data older than 48 hours, it's a dead API node. Throw it away!
-                        latest_ms = int(pd.to_numeric(df['time']).max())
-                        current_ms = int(time.time() * 1000)
-                        if (current_ms - latest_ms) < 172800000: # 48 hours in ms
-                            return df
-                        else:
-                            print(f"⚠️ CoinDCX API node is stale (Ends in {df.iloc[-1]['timestamp']}). Moving to Binance Liquidity...")
-                
-            # --- ATTEMPT 2: THE UNIVERSAL LIQUIDITY FALLBACK (Binance) ---
-            print(f"⚠️ CoinDCX missing history for {symbol}. Falling back to Liquidity Provider...")
-            b_params = {"symbol": clean_symbol, "interval": tf, "limit": min(limit, 1000)}
-            
-            # Try Binance Spot
-            b_resp = await asyncio.to_thread(requests.get, "https://api.binance.com/api/v3/klines", params=b_params, timeout=10)
-            if b_resp.status_code != 200:
-                # Try Binance Futures
-                b_resp = await asyncio.to_thread(requests.get, "https://fapi.binance.com/fapi/v1/klines", params=b_params, timeout=10)
-                
-            if b_resp.status_code == 200:
-                b_data = b_resp.json()
-                if b_data and len(b_data) > 0:
-                    df = pd.DataFrame(b_data, columns=['time', 'open', 'high', 'low', 'close', 'volume', 'close_time', 'qav', 'num_trades', 'taker_base', 'taker_quote', 'ignore'])
-                    df['timestamp'] = pd.to_datetime(df['time'], unit='ms')
-                    cols = ['open', 'high', 'low', 'close', 'volume']
-                    df[cols] = df[cols].apply(pd.to_numeric, errors='coerce')
-                    return df.drop_duplicates(subset=['timestamp']).sort_values('timestamp').reset_index(drop=True).dropna().tail(limit)
-
-            return pd.DataFrame()
+            known = self.sources.get(symbol)
+            if known:
+                df = await self.fetch_source(known, symbol, tf, limit)
+                if df is not None: return df
+                self.sources.pop(symbol, None) # source went away: resolve again
+            return await self.resolve_history(symbol, tf, limit)
         except Exception as e:
             print(f"Fetch Error: {e}")
             return pd.DataFrame()
 
+    async def resolve_history(self, symbol, tf, limit):
+        # CoinDCX first; the Binance fallbacks race alongside once it is slow or came back empty.
+        # Preference order still decides which answer is used.
+        tasks = {"coindcx": asyncio.create_task(self.fetch_source("coindcx", symbol, tf, limit))}
+        try:
+            done, _ = await asyncio.wait(tasks.values(), timeout=HEDGE_SECONDS)
+            if not (done and tasks["coindcx"].result() is not None):
+                for source in SOURCES[1:]: tasks[source] = asyncio.create_task(self.fetch_source(source, symbol, tf, limit))
+            for source in SOURCES:
+                if source not in tasks: continue
+                df = await tasks[source]
+                if df is not None:
+                    if source != "coindcx": print(f"⚠️ CoinDCX missing history for {symbol}. Using {source.replace('_', ' ').title()}...")
+                    self.sources[symbol] = source
+                    return df
+            return pd.DataFrame()
+        finally:
+            for t in tasks.values(): t.cancel()
+
 coindcx_manager = CoinDCXManager()
@@ -0,0 +1,122 @@
+import os
+import time
+import socket
+import asyncio
+import threading
+import pyarrow as pa
+from .metrics import metrics
+
+# Append-only record of what the live engine evaluated: one row per (tick, strategy) with the price,
+# the left / right value of every condition and the decision taken. record() only appends a tuple;
+# run() converts the buffer into one compressed Arrow record batch every FLUSH_SECONDS, in a thread.
+#
+# Files are Arrow IPC streams (zstd buffers), one per UTC day per engine process:
+#   JOURNAL_DIR/2026-10-19/<host>-<pid>.arrows
+# journal_query.py memory-maps and scans them. DECISION_JOURNAL=0 turns recording off.
+JOURNAL_DIR = os.getenv("JOURNAL_DIR", "/app/journal")
+JOURNAL_ENABLED = os.getenv("DECISION_JOURNAL", "1") == "1"
+FLUSH_SECONDS = 5
+MAX_BUFFER = 500_000 # rows; past this (writer stuck) new rows are dropped and counted
+DAY_MS = 86400000
+
+# Decisions: WAIT (conditions false), ENTRY (conditions true), NO_DATA (no candles to evaluate),
+# HOLD (in position, no exit hit), EXIT:<reason>, BRACKET (exits owned by the exchange)
+SCHEMA = pa.schema([
+    ('ts', pa.timestamp('ms')),
+    ('strategy_id', pa.int32()),
+    ('broker', pa.dictionary(pa.int16(), pa.string())),
+    ('symbol', pa.dictionary(pa.int16(), pa.string())),
+    ('price', pa.float64()),
+    ('state', pa.dictionary(pa.int8(), pa.string())),
+    ('decision', pa.dictionary(pa.int8(), pa.string())),
+    ('lhs', pa.list_(pa.float64())),  # per condition, at the evaluated bar
+    ('rhs', pa.list_(pa.float64())),
+])
+
+def write_options():
+    codec = next((c for c in ("zstd", "lz4") if pa.Codec.is_available(c)), None)
+    return pa.ipc.IpcWriteOptions(compression=codec)
+
+def day_of(ts_ms): return time.strftime('%Y-%m-%d', time.gmtime(ts_ms // 1000))
+
+class DecisionJournal:
+    def __init__(self, directory=JOURNAL_DIR, enabled=JOURNAL_ENABLED):
+        self.directory, self.enabled = directory, enabled
+        self.active = False # set by run(): nothing is buffered without a writer draining it
+        self.rows = []
+        self.lock = threading.Lock()
+        self.writer, self.sink, self.day = None, None, None
+        self.options = write_options()
+        self.written = self.dropped = 0
+
+    def record(self, ts_ms, strategy_id, broker, symbol, price, state, decision, values=()):
+        if not self.active: return
+        if len(self.rows) >= MAX_BUFFER:
+            self.dropped += 1
+            return
+        self.rows.append((ts_ms, strategy_id, broker, symbol, price, state, decision, values))
+
+    def path_for(self, day):
+        folder = os.path.join(self.directory, day)
+        os.makedirs(folder, exist_ok=True)
+        base = os.path.join(folder, f"{socket.gethostname()}-{os.getpid()}")
+        path, n = f"{base}.arrows", 1
+        while os.path.exists(path): # a restarted pid never appends to a closed stream
+            path, n = f"{base}.{n}.arrows", n + 1
+        return path
+
+    def rotate(self, day):
+        self.close_writer()
+        self.sink = pa.OSFile(self.path_for(day), 'wb')
+        self.writer = pa.ipc.new_stream(self.sink, SCHEMA, options=self.options)
+        self.day = day
+
+    def close_writer(self):
+        if self.writer is not None: self.writer.close()
+        if self.sink is not None: self.sink.close()
+        self.writer = self.sink = self.day = None
+
+    def batch(self, rows):
+        ts, sid, broker, symbol, price, state, decision, values = zip(*rows)
+        return pa.record_batch([
+            pa.array(ts, pa.int64()).cast(pa.timestamp('ms')),
+            pa.array(sid, pa.int32()),
+            pa.array(broker, pa.string()).dictionary_encode().cast(SCHEMA.field('broker').type),
+            pa.array(symbol, pa.string()).dictionary_encode().cast(SCHEMA.field('symbol').type),
+            pa.array(price, pa.float64()),
+            pa.array(state, pa.string()).dictionary_encode().cast(SCHEMA.field('state').type),
+            pa.array(decision, pa.string()).dictionary_encode().cast(SCHEMA.field('decision').type),
+            pa.array([[v[0] for v in vals] for vals in values], SCHEMA.field('lhs').type),
+            pa.array([[v[1] for v in vals] for vals in values], SCHEMA.field('rhs').type),
+        ], schema=SCHEMA)
+
+    def flush(self):
+        # Blocking: the buffer so far -> one batch per UTC day it spans. Returns rows written.
+        with self.lock:
+            rows, self.rows = self.rows, []
+            if not rows: return 0
+            by_day = {}
+            for r in rows: by_day.setdefault(day_of(r[0]), []).append(r)
+            for day in sorted(by_day):
+                if day != self.day: self.rotate(day)
+                self.writer.write_batch(self.batch(by_day[day]))
+            self.sink.flush()
+        self.written += len(rows)
+        metrics.inc('journal_rows_total', len(rows))
+        return len(rows)
+
+    async def run(self, is_running=lambda: True):
+        if not self.enabled: return
+        self.active = True
+        print(f"📓 Decision journal writing to {self.directory}")
+        try:
+            while is_running():
+                await asyncio.sleep(FLUSH_SECONDS)
+                try: await asyncio.to_thread(self.flush)
+                except Exception as e: print(f"Decision Journal Error: {e}")
+        finally:
+            self.active = False
+            await asyncio.to_thread(self.flush)
+            with self.lock: self.close_writer()
+
+decision_journal = DecisionJournal()
@@ -3,6 +3,7 @@ import time
 import asyncio
 import requests
 from . import database
+from .metrics import metrics
 from sqlalchemy import text
 
 async def ping_delta():
@@ -55,6 +56,16 @@ def ping_database():
     except Exception as e:
         return {"status": "FAILED", "latency_ms": None, "error": str(e)}
 
+@metrics.collect
+def pool_readings():
+    # Read straight off the pool object, no connection is checked out
+    pool = database.engine.pool
+    readings = []
+    for state, attr in (("size", "size"), ("checked_out", "checkedout"), ("checked_in", "checkedin"), ("overflow", "overflow")):
+        fn = getattr(pool, attr, None)
+        if callable(fn): readings.append(("db_pool_connections", "gauge", fn(), {"state": state}))
+    return readings
+
 async def run_full_diagnostics():
     delta_res, coindcx_res = await asyncio.gather(ping_delta(), ping_coindcx())
     db_res = ping_database()
@@ -62,5 +73,6 @@ async def run_full_diagnostics():
     return {
         "database": db_res,
         "delta_india": delta_res,
-        "coindcx": coindcx_res
+        "coindcx": coindcx_res,
+        "metrics": metrics.snapshot()
     }
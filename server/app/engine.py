@@ -1,3 +1,4 @@
+import os
 import asyncio
 import json
 import websockets
@@ -12,28 +13,125 @@ from sqlalchemy.orm import Session
 from sqlalchemy.orm.attributes import flag_modified
 from . import models, database, security, crud
 from .brokers.coindcx import coindcx_manager
+from .strategy_plan import plan_cache, PRICE_FIELDS
+from .indicators import calculate_indicator, indicator_key, IndicatorCache
+from .indicator_stream import SeriesStreams
+from .timeframes import CandleBook, TF_MS, OHLCV, align, take
+from .backtester import backtester
+from .paper_ledger import paper_ledger
+from .exit_monitor import exit_monitor
+from . import brackets
+from .brackets import bracket_tracker
+from .metrics import metrics, order_stage
+from .sharding import ShardLeases, RENEW_SECONDS
+from . import market_data
+from .symbols import symbol_registry
+from .decision_journal import decision_journal
+
+SEED_BARS = (100, 1000)  # history fetched per timeframe: the deepest warm-up it needs, within these bounds
+RESEED_SECONDS = 900     # refetch each series now and then to pick up real volumes and any missed ticks
+
+class LiveFrame:
+    # What one tick of one (broker, symbol, strategy timeframe) evaluates against: the strategy's last
+    # closed bar and the bar in progress, plus closed bars of any other timeframe its conditions reference.
+    # Indicator values come from streaming state (SeriesStreams): closed bars were fed once as they
+    # closed, the bar in progress is peeked, so nothing here grows with the length of the history.
+    def __init__(self, streams, timeframe, other_streams):
+        self.streams, self.timeframe, self.other_streams = streams, timeframe, other_streams
+        series = streams.series
+        self.df = pd.DataFrame([series.bars[-1], series.current], columns=['timestamp'] + OHLCV)
+        self.last_ts = self.df['timestamp'].values.astype(np.int64)
+        self.values = {} # (indicator key, tf) -> values at the two bars, shared by every strategy on the frame
+        self.hits, self.misses = 0, 0
+        self.frames = {} # tf -> IndicatorCache, only for indicators without a streaming version
+
+    def fallback(self, tf, streams):
+        # Whole-frame computation for an indicator make_stream() doesn't know
+        if tf not in self.frames: self.frames[tf] = IndicatorCache(streams.series.frame(with_current=tf is None))
+        return self.frames[tf]
+
+    def compute(self, df, name, params, tf):
+        key = (indicator_key(name, params), tf)
+        if key in self.values:
+            self.hits += 1
+            return self.values[key]
+        self.misses += 1
+        if tf is None:
+            s = self.streams
+            prev, cur = s.closed(name, params, [len(s.series.bars) - 1]), s.current(name, params)
+            out = np.array(prev + [cur], dtype=np.float64) if prev is not None else self.fallback(None, s).get(name, params)[-2:]
+        else:
+            other = self.other_streams(tf)
+            if other is None or not other.series.bars: out = np.full(len(self.last_ts), np.nan)
+            else:
+                # Same rule as the backtester: last bar of tf that had closed, only for the two bars evaluated
+                idx = align(self.last_ts, TF_MS[self.timeframe], other.series.closed()[:, 0], TF_MS[tf])
+                vals = other.closed(name, params, idx)
+                out = np.array(vals, dtype=np.float64) if vals is not None else take(self.fallback(tf, other).get(name, params), idx)
+        self.values[key] = out
+        return out
 
 class RealTimeEngine:
     def __init__(self):
         self.is_running = False
         self.delta_ws_url = "wss://socket.india.delta.exchange"
+        self.books = {}      # (broker, symbol) -> CandleBook, fed by every tick
+        self.streams = {}    # (broker, symbol, tf) -> SeriesStreams over that CandleSeries
+        self.last_tick = {}  # broker -> time.time() of the newest ticker snapshot
+        self.now = time.time # market clock for candles / reseeding, the replay harness swaps in its own
+        self.leases = None   # ShardLeases once start() runs; None trades every symbol (replay harness, doctors)
+        self.trading = 0     # execute_trade calls in progress; stop() waits for them before handing shards back
+        self.board = market_data.BoardReader() if os.getenv("PRICE_BOARD", "1") == "1" else None # shared tickers, see market_data_worker.py
+        metrics.collect(self.tick_lag)
+
+    def tick_lag(self):
+        now = time.time()
+        return [("tick_lag_seconds", "gauge", now - at, {"broker": broker}) for broker, at in self.last_tick.items()]
+
+    def owns(self, broker, symbol):
+        return self.leases is None or self.leases.owns(broker, symbol)
 
     async def get_active_symbols(self, db: Session, broker="DELTA"):
         strategies = db.query(models.Strategy).filter(
             models.Strategy.is_running == True, 
             models.Strategy.broker == broker
         ).all()
-        return list(set([s.symbol for s in strategies]))
+        return [s for s in set([s.symbol for s in strategies]) if self.owns(broker, s)]
 
-    async def fetch_history(self, symbol, broker="DELTA"):
+    def forget_market(self, broker, symbol):
+        # Shard handed to another process: drop its bars, caches and exit levels, they'd go stale here
+        self.books.pop((broker, symbol), None)
+        for key in [k for k in self.streams if k[:2] == (broker, symbol)]: del self.streams[key]
+        exit_monitor.retain(broker, symbol, set())
+        db = database.SessionLocal()
+        try: paper_ledger.forget(db, broker, symbol)
+        finally: db.close()
+
+    async def run_lease_loop(self):
+        while self.is_running:
+            gained, lost = await asyncio.to_thread(self.leases.sync)
+            if gained or lost:
+                print(f"🔒 Shard leases: own {sorted(self.leases.owned)} of {self.leases.shards} ({self.leases.worker_id})")
+                for broker, symbol in [k for k in self.books if not self.owns(*k)]: self.forget_market(broker, symbol)
+            metrics.set('engine_shards_owned', len(self.leases.owned))
+            await asyncio.sleep(RENEW_SECONDS)
+
+    async def stop(self, drain_seconds=10):
+        # Stop taking ticks, let trades in progress finish (an order may be on the wire), then free our shards.
+        # If one is still running at the deadline keep the leases: they lapse on their own, nobody doubles the order.
+        self.is_running = False
+        deadline = time.monotonic() + drain_seconds
+        while self.trading and time.monotonic() < deadline: await asyncio.sleep(0.05)
+        if self.leases and not self.trading: await asyncio.to_thread(self.leases.release)
+
+    async def fetch_history(self, symbol, broker="DELTA", timeframe='1m', limit=100):
         exchange = None
         try:
             if broker == "COINDCX":
-                return await coindcx_manager.fetch_history(symbol, timeframe='1m', limit=100)
+                return await coindcx_manager.fetch_history(symbol, timeframe=timeframe, limit=limit)
             else:
                 exchange = ccxt.delta({'options': {'defaultType': 'future'}, 'urls': { 'api': {'public': 'https://api.india.delta.exchange', 'private': 'https://api.india.delta.exchange'}, 'www': 'https://india.delta.exchange'}})
-                hist_symbol = symbol.replace('-', '') if 'USDT' not in symbol else symbol
-                ohlcv = await exchange.fetch_ohlcv(hist_symbol, timeframe='1m', limit=100)
+                ohlcv = await exchange.fetch_ohlcv(symbol_registry.get(broker, symbol).candles, timeframe=timeframe, limit=limit)
                 if not ohlcv: return pd.DataFrame()
                 df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
                 cols = ['open', 'high', 'low', 'close', 'volume']
@@ -43,235 +141,128 @@ class RealTimeEngine:
         finally: 
             if exchange: await exchange.close()
 
+    def calculate_indicator(self, df, name, params):
+        return calculate_indicator(df, name, params)
 
-        
-        first_valid = np.argmax(valid_mask)
-        start_idx = first_valid + length - 1
-        if start_idx >= len(vals): return pd.Series(ema, index=series.index)
-        
-        # TradingView starts the EMA with an SMA baseline
-        ema[start_idx] = np.mean(vals[first_valid : start_idx + 1])
-        
-        # TradingView strict compounding loop
-        for i in range(start_idx + 1, len(vals)):
-            if np.isnan(vals[i]):
-                ema[i] = ema[i-1]
-            else:
-                ema[i] = alpha * vals[i] + (1 - alpha) * ema[i - 1]
-        return pd.Series(ema, index=series.index)
+    def seed_bars(self, plan, tf):
+        lookback = [backtester.indicator_lookback(name, params) for _, name, params, node_tf in plan.indicators
+                    if node_tf == tf and name not in PRICE_FIELDS]
+        return min(max(max(lookback, default=0) + 2, SEED_BARS[0]), SEED_BARS[1])
 
-    def calculate_indicator(self, df, name, params):
-        import pandas as pd
-        import numpy as np
-        try:
-            length = int(params.get('length') or 14)
-            if name == 'rsi':
-                delta = df['close'].diff()
-                gain = (delta.where(delta > 0, 0)).rolling(window=length).mean()
-                loss = (-delta.where(delta < 0, 0)).rolling(window=length).mean()
-                return 100 - (100 / (1 + (gain / loss)))
-            elif name == 'ema': return self.calc_tv_ema(df['close'], length)
-            elif name == 'sma': return df['close'].rolling(window=length).mean()
-            elif name == 'macd':
-                f, s = int(params.get('fast', 12)), int(params.get('slow', 26))
-                return self.calc_tv_ema(df['close'], f) - self.calc_tv_ema(df['close'], s)
-            elif name == 'bb_upper':
-                std = float(params.get('std', 2.0))
-                return df['close'].rolling(window=length).mean() + (df['close'].rolling(window=length).std() * std)
-            elif name == 'bb_lower':
-                std = float(params.get('std', 2.0))
-                return df['close'].rolling(window=length).mean() - (df['close'].rolling(window=length).std() * std)
-            elif name == 'atr':
-                tr = pd.concat([df['high'] - df['low'], (df['high'] - df['close'].shift()).abs(), (df['low'] - df['close'].shift()).abs()], axis=1).max(axis=1)
-                return tr.rolling(window=length).mean()
-            elif name == 'vwap':
-                tp = (df['high'] + df['low'] + df['close']) / 3
-                return (tp * df['volume']).rolling(window=length).sum() / df['volume'].rolling(window=length).sum()
-            elif name == 'donchian_upper': return df['high'].rolling(window=length).max()
-            elif name == 'donchian_lower': return df['low'].rolling(window=length).min()
-            elif name == 'keltner_upper' or name == 'keltner_lower':
-                mult = float(params.get('multiplier', 2.0))
-                mid = self.calc_tv_ema(df['close'], length)
-                tr = pd.concat([df['high'] - df['low'], (df['high'] - df['close'].shift()).abs(), (df['low'] - df['close'].shift()).abs()], axis=1).max(axis=1)
-                atr = tr.rolling(window=length).mean()
-                if name == 'keltner_upper': return mid + (mult * atr)
-                else: return mid - (mult * atr)
-            elif name == 'supertrend':
-                mult = float(params.get('multiplier', 3.0))
-                hl2 = (df['high'] + df['low']) / 2
-                tr = pd.concat([df['high'] - df['low'], (df['high'] - df['close'].shift()).abs(), (df['low'] - df['close'].shift()).abs()], axis=1).max(axis=1)
-                atr = tr.rolling(window=length).mean().values
-                c_val, u_val, l_val = df['close'].values, (hl2 + mult * atr).values, (hl2 - mult * atr).values
-                st = np.zeros(len(c_val))
-                in_up = True
-                for i in range(1, len(c_val)):
-                    if c_val[i] > u_val[i-1]: in_up = True
-                    elif c_val[i] < l_val[i-1]: in_up = False
-                    else:
-                        if in_up and l_val[i] < l_val[i-1]: l_val[i] = l_val[i-1]
-                        if not in_up and u_val[i] > u_val[i-1]: u_val[i] = u_val[i-1]
-                    st[i] = l_val[i] if in_up else u_val[i]
-                return pd.Series(st, index=df.index)
-            elif name == 'psar':
-                step, max_step = float(params.get('step', 0.02)), float(params.get('max_step', 0.2))
-                h_val, l_val = df['high'].values, df['low'].values
-                psar = np.zeros(len(h_val))
-                bull = True
-                af = step
-                hp, lp, ep = h_val[0], l_val[0], h_val[0]
-                psar[0] = l_val[0]
-                for i in range(1, len(h_val)):
-                    psar[i] = psar[i-1] + af * (ep - psar[i-1])
-                    if bull:
-                        if l_val[i] < psar[i]: bull, psar[i], af, ep, lp = False, hp, step, l_val[i], l_val[i]
-                        else:
-                            if h_val[i] > hp: hp, ep, af = h_val[i], h_val[i], min(af + step, max_step)
-                            if i > 1 and l_val[i-1] < psar[i]: psar[i] = l_val[i-1]
-                            if i > 2 and l_val[i-2] < psar[i]: psar[i] = l_val[i-2]
-                    else:
-                        if h_val[i] > psar[i]: bull, psar[i], af, ep, hp = True, lp, step, h_val[i], h_val[i]
-                        else:
-                            if l_val[i] < lp: lp, ep, af = l_val[i], l_val[i], min(af + step, max_step)
-                            if i > 1 and h_val[i-1] > psar[i]: psar[i] = h_val[i-1]
-                            if i > 2 and h_val[i-2] > psar[i]: psar[i] = h_val[i-2]
-                return pd.Series(psar, index=df.index)
-            elif name == 'aroon_up': return df['high'].rolling(window=length+1).apply(lambda x: 100 * np.argmax(x) / length, raw=True)
-            elif name == 'aroon_down': return df['low'].rolling(window=length+1).apply(lambda x: 100 * np.argmin(x) / length, raw=True)
-            elif name == 'williams_r':
-                hh = df['high'].rolling(window=length).max()
-                ll = df['low'].rolling(window=length).min()
-                return (hh - df['close']) / (hh - ll) * -100
-            elif name == 'mom': return df['close'] - df['close'].shift(length)
-            elif name == 'hma':
-                half_l, sqrt_l = int(length / 2), int(np.sqrt(length))
-                def wma(s, l):
-                    weights = np.arange(1, l + 1)
-                    return s.rolling(l).apply(lambda x: np.dot(x, weights) / weights.sum(), raw=True)
-                diff = 2 * wma(df['close'], half_l) - wma(df['close'], length)
-                return wma(diff, sqrt_l)
-            elif name == 'tsi':
-                long_l, short_l = int(params.get('long_length', 25)), int(params.get('short_length', 13))
-                diff = df['close'].diff()
-                num = self.calc_tv_ema(self.calc_tv_ema(diff, long_l), short_l)
-                den = self.calc_tv_ema(self.calc_tv_ema(diff.abs(), long_l), short_l)
-                return 100 * (num / den)
-            elif name == 'uo':
-                fast, mid, slow = int(params.get('fast', 7)), int(params.get('mid', 14)), int(params.get('slow', 28))
-                prev_close = df['close'].shift(1)
-                bp = df['close'] - pd.concat([df['low'], prev_close], axis=1).min(axis=1)
-                tr = pd.concat([df['high'], prev_close], axis=1).max(axis=1) - pd.concat([df['low'], prev_close], axis=1).min(axis=1)
-                a1 = bp.rolling(fast).sum() / tr.rolling(fast).sum()
-                a2 = bp.rolling(mid).sum() / tr.rolling(mid).sum()
-                a3 = bp.rolling(slow).sum() / tr.rolling(slow).sum()
-                return 100 * (4 * a1 + 2 * a2 + a3) / 7
-            return pd.Series(0, index=df.index)
-        except Exception as e:
-            print(f"Indicator Math Error: {e}")
-            return pd.Series(0, index=df.index)
+    async def ensure_series(self, symbol, broker, tf, capacity, current_price):
+        # History is fetched once per (broker, symbol, timeframe); after that ticks keep it current
+        book = self.books.setdefault((broker, symbol), CandleBook())
+        series = book.track(tf, capacity)
+        if series.current is None or self.now() - series.seeded_at > RESEED_SECONDS:
+            with order_stage('history_fetch', broker, symbol): df = await self.fetch_history(symbol, broker, tf, capacity)
+            if df is not None and not df.empty:
+                series.seed(df)
+                series.seeded_at = self.now()
+                series.fold(int(self.now() * 1000), current_price)
+            elif series.current is not None: series.seeded_at = self.now() # keep the tick-built bars, retry later
+        return series if series.current is not None else None
+
+    def series_streams(self, symbol, broker, tf):
+        # Streaming indicator state of one tracked series; starts over when track() replaced the series
+        series = self.books.get((broker, symbol), CandleBook()).series.get(tf)
+        if series is None: return None
+        key = (broker, symbol, tf)
+        streams = self.streams.get(key)
+        if streams is None or streams.series is not series: streams = self.streams[key] = SeriesStreams(series)
+        return streams
+
+    async def ensure_plan_series(self, symbol, broker, plan, current_price):
+        for tf in plan.timeframes: await self.ensure_series(symbol, broker, tf, self.seed_bars(plan, tf), current_price)
+        return await self.ensure_series(symbol, broker, plan.timeframe, self.seed_bars(plan, None), current_price)
 
-    async def check_conditions(self, symbol, broker, current_price, logic):
+    async def load_indicator_frame(self, symbol, broker, current_price, plan):
+        # One frame per (symbol, strategy timeframe) per tick, shared by every strategy on it
+        series = await self.ensure_plan_series(symbol, broker, plan, current_price)
+        if series is None or not series.bars: return None # bar in progress carries the live price, plus one closed bar
+        return LiveFrame(self.series_streams(symbol, broker, plan.timeframe), plan.timeframe, lambda tf: self.series_streams(symbol, broker, tf))
+
+    async def check_conditions(self, symbol, broker, current_price, logic, plan=None, cache=None, trace=None):
         try:
-            conditions = logic.get('conditions', [])
-            if not conditions: return False
-            
-            df = await self.fetch_history(symbol, broker)
-            if df is None or df.empty: return False
-            
-            # Inject current live price into the last row for real-time awareness
-            df.loc[df.index[-1], 'close'] = current_price
-            df = self.calculate_indicator(df, 'all_needed', logic) # Internal helper logic
+            plan = plan or plan_cache.get(logic)
+            if not plan.conditions: return False
             
-            # Prepare Indicators
-            for cond in conditions:
-                for side in ['left', 'right']:
-                    item = cond.get(side)
-                    if not item or item.get('type') == 'number': continue
-                    name, params = item.get('type'), item.get('params', {})
-                    length = int(params.get('length') or 14)
-                    col_name = f"{name}_{length}"
-                    if col_name not in df.columns:
-                        df[col_name] = self.calculate_indicator(df, name, params)
-
-            last = df.iloc[-1]
-            prev = df.iloc[-2]
-            
-            has_event = False
-            event_triggered = False
-            all_states_true = True
-            eps = 0.00000001
-
-            def get_v(row, item):
-                if item['type'] == 'number': return float(item['params']['value'])
-                if item['type'] in ['close', 'open', 'high', 'low']: return float(row[item['type']])
-                return float(row.get(f"{item['type']}_{int(item['params'].get('length', 14))}", 0))
-
-            for cond in conditions:
-                v_l, v_r = get_v(last, cond['left']), get_v(last, cond['right'])
-                p_l, p_r = get_v(prev, cond['left']), get_v(prev, cond['right'])
-                op = cond['operator']
-                
-                if op == 'CROSSES_ABOVE':
-                    has_event = True
-                    if (v_l > v_r + eps) and (p_l <= p_r + eps): event_triggered = True
-                elif op == 'CROSSES_BELOW':
-                    has_event = True
-                    if (v_l < v_r - eps) and (p_l >= p_r - eps): event_triggered = True
-                elif op == 'GREATER_THAN':
-                    if not (v_l > v_r + eps): all_states_true = False
-                elif op == 'LESS_THAN':
-                    if not (v_l < v_r - eps): all_states_true = False
-                elif op == 'EQUALS':
-                    if not (abs(v_l - v_r) < eps): all_states_true = False
-
-            if has_event:
-                return event_triggered and all_states_true
-            return all_states_true
+            cache = cache or await self.load_indicator_frame(symbol, broker, current_price, plan)
+            if cache is None: return False
+            with order_stage('indicators', broker, symbol): return plan.evaluate_last(cache.df, cache.compute, trace)
         except: return False
 
-    async def fire_order(self, db, strat_id, broker, symbol, side, qty, api_key_enc, secret_enc, price, reason, trade_mode="LIVE"):
+    async def fire_order(self, db, strat_id, broker, symbol, side, qty, api_key_enc, secret_enc, price, reason, trade_mode="LIVE", bracket=None):
+        # bracket: exchange-side SL / TP fields from brackets.order_params, sent with the entry (LIVE only)
         try:
             if trade_mode == 'PAPER':
-                crud.create_log(db, strat_id, f"📄 PAPER TRADE: {reason} {side} {qty} {symbol} @ ${price}", "SUCCESS")
+                fill = paper_ledger.fill(strat_id, broker, symbol, side, qty, price, reason)
+                if fill is None: return False
+                paper_ledger.save(db, strat_id, fill['record'])
+                pnl = f" | PnL ${fill['pnl']:.2f}" if fill['pnl'] is not None else ""
+                crud.create_log(db, strat_id, f"📄 PAPER TRADE: {reason} {side} {qty} {symbol} @ ${fill['price']:.6g} | Fee ${fill['fee']:.4f}{pnl}", "SUCCESS")
                 return True
-            api_key = security.decrypt_value(api_key_enc)
-            secret = security.decrypt_value(secret_enc)
+            with order_stage('decrypt', broker, symbol):
+                api_key = security.decrypt_value(api_key_enc)
+                secret = security.decrypt_value(secret_enc)
             
-            if broker == "DELTA":
-                exchange = ccxt.delta({'apiKey': api_key, 'secret': secret, 'options': { 'defaultType': 'future' }, 'urls': { 'api': {'public': 'https://api.india.delta.exchange', 'private': 'https://api.india.delta.exchange'}}})
-                order = await exchange.create_order(symbol, 'market', side.lower(), qty)
-                crud.create_log(db, strat_id, f"✅ {reason} {side} Filled! ID: {order.get('id')} @ ${price}", "SUCCESS")
-                await exchange.close()
-                return True
-            
-            elif broker == "COINDCX":
-                cdcx_sym = symbol
-                clean_sym = symbol.replace("/", "").replace("-", "")
-                if clean_sym.endswith("USDT") and not clean_sym.startswith("B-"): cdcx_sym = f"B-{clean_sym[:-4]}_USDT"
-                
-                url = "https://api.coindcx.com/exchange/v1/derivatives/futures/orders/create"
-                payload = {"market": cdcx_sym, "side": side.lower(), "order_type": "market_order", "total_quantity": qty, "timestamp": int(time.time() * 1000)}
-                json_payload = json.dumps(payload, separators=(',', ':'))
-                signature = hmac.new(bytes(secret, 'utf-8'), bytes(json_payload, 'utf-8'), hashlib.sha256).hexdigest()
-                headers = {'Content-Type': 'application/json', 'X-AUTH-APIKEY': api_key, 'X-AUTH-SIGNATURE': signature}
-                
-                response = await asyncio.to_thread(requests.post, url, data=json_payload, headers=headers)
-                res_data = response.json()
-                
-                if response.status_code == 200:
-                    crud.create_log(db, strat_id, f"✅ {reason} {side} Filled! ID: {res_data.get('id')} @ ${price}", "SUCCESS")
-                    return True
-                else:
-                    crud.create_log(db, strat_id, f"❌ Order Failed: {res_data.get('message', str(res_data))}", "ERROR")
-                    return False
+            if broker not in ("DELTA", "COINDCX"): return None
+            order_id, error = await self.submit_order(broker, symbol, side, qty, api_key, secret, bracket)
+            if error is not None:
+                crud.create_log(db, strat_id, f"❌ Order Failed: {error}", "ERROR")
+                return False
+            legs = " + exchange SL/TP" if bracket else ""
+            crud.create_log(db, strat_id, f"✅ {reason} {side} Filled{legs}! ID: {order_id} @ ${price}", "SUCCESS")
+            return True
         except Exception as e:
             crud.create_log(db, strat_id, f"❌ Engine Error: {str(e)[:50]}", "ERROR")
             return False
 
+    async def submit_order(self, broker, symbol, side, qty, api_key, secret, bracket=None):
+        # The exchange call of a LIVE market order: (order id, None) once accepted, (None, message) when rejected
+        if broker == "DELTA":
+            exchange = ccxt.delta({'apiKey': api_key, 'secret': secret, 'options': { 'defaultType': 'future' }, 'urls': { 'api': {'public': 'https://api.india.delta.exchange', 'private': 'https://api.india.delta.exchange'}}})
+            try:
+                with order_stage('http', broker, symbol): order = await exchange.create_order(symbol, 'market', side.lower(), qty, None, bracket or {})
+            finally: await exchange.close()
+            return order.get('id'), None
+
+        url = "https://api.coindcx.com/exchange/v1/derivatives/futures/orders/create"
+        with order_stage('sign', broker, symbol):
+            payload = {"market": symbol_registry.get(broker, symbol).order, "side": side.lower(), "order_type": "market_order", "total_quantity": qty, **(bracket or {}), "timestamp": int(time.time() * 1000)}
+            json_payload = json.dumps(payload, separators=(',', ':'))
+            signature = hmac.new(bytes(secret, 'utf-8'), bytes(json_payload, 'utf-8'), hashlib.sha256).hexdigest()
+            headers = {'Content-Type': 'application/json', 'X-AUTH-APIKEY': api_key, 'X-AUTH-SIGNATURE': signature}
+        
+        with order_stage('http', broker, symbol): response = await asyncio.to_thread(requests.post, url, data=json_payload, headers=headers)
+        res_data = response.json()
+        if response.status_code == 200: return res_data.get('id'), None
+        return None, res_data.get('message', str(res_data))
 
-    async def get_balance(self, broker, api_key_enc, secret_enc):
+
+    async def reconcile_bracket(self, db, strat, logic, broker, symbol, side, current_price, api_key_enc, secret_enc):
+        # Exchange-side legs fill without us: once the position is flat, record the exit and wait again
+        if not api_key_enc or not bracket_tracker.due(strat.id): return
+        size = await bracket_tracker.position_size(broker, symbol, security.decrypt_value(api_key_enc), security.decrypt_value(secret_enc))
+        if size is None or size > 0: return
+        entry_price = float(logic.get('entry_price', 0) or 0)
+        sl, tp = brackets.bracket_levels(side, entry_price, float(logic.get('sl', 0)), float(logic.get('tp', 0)))
+        # Which leg: the level the market is closest to now (a manual close on the exchange looks the same)
+        legs = [(abs(current_price - level), name) for level, name in [(sl, "Stop Loss"), (tp, "Take Profit")] if level]
+        reason = min(legs)[1] if legs else "Closed on exchange"
+        crud.create_log(db, strat.id, f"🏁 EXIT ({reason}) filled by the {broker} bracket. Last price ${current_price}", "SUCCESS")
+        logic['state'] = 'WAITING'
+        logic['entry_price'] = 0
+        logic['bracket'] = False
+        strat.logic_configuration = logic
+        flag_modified(strat, "logic_configuration")
+        db.commit()
+        bracket_tracker.forget(strat.id)
+
+    async def get_balance(self, broker, api_key_enc, secret_enc, symbol=""):
         try:
-            api_key = security.decrypt_value(api_key_enc)
-            secret = security.decrypt_value(secret_enc)
+            with order_stage('decrypt', broker, symbol):
+                api_key = security.decrypt_value(api_key_enc)
+                secret = security.decrypt_value(secret_enc)
             if broker == "DELTA":
                 exchange = ccxt.delta({'apiKey': api_key, 'secret': secret, 'options': { 'defaultType': 'future' }, 'urls': { 'api': {'public': 'https://api.india.delta.exchange', 'private': 'https://api.india.delta.exchange'}}})
                 bal = await exchange.fetch_balance()
@@ -280,9 +271,10 @@ class RealTimeEngine:
             elif broker == "COINDCX":
                 url = "https://api.coindcx.com/exchange/v1/users/balances"
                 payload = {"timestamp": int(time.time() * 1000)}
-                json_payload = json.dumps(payload, separators=(',', ':'))
-                signature = hmac.new(bytes(secret, 'utf-8'), bytes(json_payload, 'utf-8'), hashlib.sha256).hexdigest()
-                headers = {'Content-Type': 'application/json', 'X-AUTH-APIKEY': api_key, 'X-AUTH-SIGNATURE': signature}
+                with order_stage('sign', broker, symbol):
+                    json_payload = json.dumps(payload, separators=(',', ':'))
+                    signature = hmac.new(bytes(secret, 'utf-8'), bytes(json_payload, 'utf-8'), hashlib.sha256).hexdigest()
+                    headers = {'Content-Type': 'application/json', 'X-AUTH-APIKEY': api_key, 'X-AUTH-SIGNATURE': signature}
                 resp = await asyncio.to_thread(requests.post, url, data=json_payload, headers=headers)
                 if resp.status_code == 200:
                     balances = resp.json()
@@ -293,11 +285,38 @@ class RealTimeEngine:
             print(f"Balance Fetch Error: {err}")
             return 0.0
 
-    async def execute_trade(self, db: Session, symbol: str, current_price: float, broker: str):
-        if current_price <= 0: return
+    async def execute_trade(self, db: Session, symbol: str, current_price: float, broker: str, tick_ts=None):
+        # tick_ts: perf_counter() when the price arrived, for the tick-to-trade latency
+        if current_price <= 0 or not self.owns(broker, symbol): return
+        self.trading += 1
+        try: await self.trade_symbol(db, symbol, current_price, broker, tick_ts or time.perf_counter())
+        finally: self.trading -= 1
+
+    async def trade_symbol(self, db, symbol, current_price, broker, tick_ts):
 
         strategies = db.query(models.Strategy).filter(models.Strategy.is_running == True, models.Strategy.symbol == symbol, models.Strategy.broker == broker).all()
+        metrics.mark('strategies_evaluated', len(strategies), broker=broker)
 
+        # O(1) per tracked timeframe: fold the tick into the bars in progress
+        now_ms = int(self.now() * 1000)
+        book = self.books.get((broker, symbol))
+        if book: book.on_tick(current_price, now_ms)
+        paper_ledger.mark(broker, symbol, current_price)
+
+        # Exits first and independent of signal evaluation: (re)register open positions (a no-op when
+        # unchanged), then one lookup in the threshold index finds every SL / TP / trailing stop this price hits
+        open_ids = set()
+        for strat in strategies:
+            logic = strat.logic_configuration or {}
+            if logic.get('state') != 'IN_POSITION' or logic.get('bracket'): continue # bracketed: the exchange owns the exits
+            open_ids.add(strat.id)
+            exit_monitor.watch(strat.id, broker, symbol, logic.get('side', 'BUY').upper(), float(logic.get('entry_price', 0) or 0),
+                               float(logic.get('sl', 0)), float(logic.get('tp', 0)), float(logic.get('tsl', 0)), current_price)
+        exit_monitor.retain(broker, symbol, open_ids)
+        exits = exit_monitor.on_price(broker, symbol, current_price)
+
+        frames = {} # strategy timeframe -> LiveFrame, built once per tick
+        paper_ids = set()
         for strat in strategies:
             logic = strat.logic_configuration or {}
             state = logic.get('state', 'WAITING')
@@ -306,22 +325,33 @@ class RealTimeEngine:
             wallet_pct = float(logic.get('walletPct', 10))
             leverage = float(logic.get('leverage', 1))
             trade_mode = logic.get('tradeMode', 'PAPER').upper()
+            if trade_mode == 'PAPER':
+                paper_ledger.load(db, strat.id, broker, symbol)
+                paper_ids.add(strat.id)
 
             user = strat.owner
             api_key_enc = user.coindcx_api_key if broker == "COINDCX" else user.delta_api_key
             secret_enc = user.coindcx_api_secret if broker == "COINDCX" else user.delta_api_secret
 
             if state == 'WAITING':
-                is_trigger = await self.check_conditions(symbol, broker, current_price, logic)
+                plan = plan_cache.for_strategy(strat.id, logic)
+                if plan.conditions:
+                    if plan.timeframe not in frames: frames[plan.timeframe] = await self.load_indicator_frame(symbol, broker, current_price, plan)
+                    else: await self.ensure_plan_series(symbol, broker, plan, current_price)
+                frame = frames.get(plan.timeframe)
+                trace = []
+                is_trigger = frame is not None and await self.check_conditions(symbol, broker, current_price, logic, plan, frame, trace)
+                decision_journal.record(now_ms, strat.id, broker, symbol, current_price, state,
+                                        "ENTRY" if is_trigger else ("WAIT" if frame is not None else "NO_DATA"), trace)
                 if is_trigger:
-                    if not api_key_enc:
+                    if trade_mode == 'LIVE' and not api_key_enc:
                         crud.create_log(db, strat.id, f"❌ No API Keys saved for {broker}.", "ERROR")
                         continue
                     
                     if trade_mode == 'LIVE':
-                        balance = await self.get_balance(broker, api_key_enc, secret_enc)
+                        with order_stage('balance_fetch', broker, symbol): balance = await self.get_balance(broker, api_key_enc, secret_enc, symbol)
                     else:
-                        balance = 1000.0 # Paper trade default balance
+                        balance = paper_ledger.balance(strat.id, broker, symbol) # Simulated wallet, starts at the backtester's 1000
                     
                     if balance <= 0:
                         crud.create_log(db, strat.id, f"❌ Insufficient Balance (Available: ${balance}). Auto-pausing strategy.", "ERROR")
@@ -337,104 +367,125 @@ class RealTimeEngine:
                         db.commit()
                         continue
 
+                    sl_pct, tp_pct, tsl_pct = float(logic.get('sl', 0)), float(logic.get('tp', 0)), float(logic.get('tsl', 0))
+                    bracket = None
+                    if trade_mode == 'LIVE' and logic.get('exchangeBrackets') and (sl_pct or tp_pct or tsl_pct) and brackets.supports(broker, tsl_pct):
+                        bracket = brackets.order_params(broker, side, current_price, sl_pct, tp_pct, tsl_pct)
+
+                    if not self.owns(broker, symbol): return # lease slipped while we awaited: the next owner trades it
                     crud.create_log(db, strat.id, f"🚀 ENTRY {side} {symbol} | Lev: {leverage}x | Qty: {qty}", "INFO")
-                    success = await self.fire_order(db, strat.id, broker, symbol, side, qty, api_key_enc, secret_enc, current_price, "ENTRY", trade_mode)
+                    success = await self.fire_order(db, strat.id, broker, symbol, side, qty, api_key_enc, secret_enc, current_price, "ENTRY", trade_mode, bracket)
                     
                     if success:
+                        metrics.observe('order_path', time.perf_counter() - tick_ts, stage='tick_to_trade', broker=broker, symbol=symbol)
                         logic['state'] = 'IN_POSITION'
                         logic['entry_price'] = current_price
                         logic['entry_qty'] = qty
+                        logic['bracket'] = bool(bracket)
                         strat.logic_configuration = logic
                         flag_modified(strat, "logic_configuration")
-                        db.commit()
+                        with order_stage('db_commit', broker, symbol): db.commit()
+                        if not bracket: exit_monitor.watch(strat.id, broker, symbol, side, current_price, sl_pct, tp_pct, tsl_pct)
                     else:
                         strat.is_running = False
                         db.commit()
 
             elif state == 'IN_POSITION':
                 entry_price = float(logic.get('entry_price', current_price))
-                sl_pct = float(logic.get('sl', 0))
-                tp_pct = float(logic.get('tp', 0))
-
-                exit_triggered, reason = False, ""
-                
-                # Logic to determine if SL or TP is hit based on Long/Short
-                if side == 'BUY':
-                    if sl_pct > 0 and current_price <= entry_price * (1 - (sl_pct/100)): exit_triggered, reason = True, "Stop Loss"
-                    elif tp_pct > 0 and current_price >= entry_price * (1 + (tp_pct/100)): exit_triggered, reason = True, "Take Profit"
-                else: # SELL (Short)
-                    if sl_pct > 0 and current_price >= entry_price * (1 + (sl_pct/100)): exit_triggered, reason = True, "Stop Loss"
-                    elif tp_pct > 0 and current_price <= entry_price * (1 - (tp_pct/100)): exit_triggered, reason = True, "Take Profit"
+                if trade_mode == 'PAPER' and paper_ledger.position(strat.id)[0] == 0:
+                    paper_ledger.restore(strat.id, broker, symbol, side, float(logic.get('entry_qty', 0)), entry_price)
+                if logic.get('bracket'):
+                    decision_journal.record(now_ms, strat.id, broker, symbol, current_price, state, "BRACKET")
+                    await self.reconcile_bracket(db, strat, logic, broker, symbol, side, current_price, api_key_enc, secret_enc)
+                    continue
+                exit_triggered = strat.id in exits
+                reason = exits[strat.id][0] if exit_triggered else ""
+                decision_journal.record(now_ms, strat.id, broker, symbol, current_price, state, f"EXIT:{reason}" if exit_triggered else "HOLD")
 
                 if exit_triggered:
                     exit_side = 'SELL' if side == 'BUY' else 'BUY'
                     qty = float(logic.get('entry_qty', 1))
+                    if not self.owns(broker, symbol): return
                     crud.create_log(db, strat.id, f"🏁 EXIT {reason} hit. Firing {exit_side} {qty}...", "INFO")
                     success = await self.fire_order(db, strat.id, broker, symbol, exit_side, qty, api_key_enc, secret_enc, current_price, f"EXIT ({reason})", trade_mode)
                     
                     if success:
+                        metrics.observe('order_path', time.perf_counter() - tick_ts, stage='tick_to_trade', broker=broker, symbol=symbol)
                         logic['state'] = 'WAITING'
                         logic['entry_price'] = 0
                         strat.logic_configuration = logic
                         flag_modified(strat, "logic_configuration")
-                        db.commit()
+                        with order_stage('db_commit', broker, symbol): db.commit()
                     else:
                         strat.is_running = False
                         db.commit()
 
+        paper_ledger.retain(db, broker, symbol, paper_ids)
+        for frame in frames.values():
+            if frame is None: continue
+            metrics.inc('indicator_cache_total', frame.hits, cache='frame', result='hit')
+            metrics.inc('indicator_cache_total', frame.misses, cache='frame', result='miss')
+
+    async def ticker_prices(self, broker, symbols):
+        # {symbol: price} from the shared price board while a market-data process keeps it fresh,
+        # otherwise from one ticker poll of our own. None when neither produced a snapshot.
+        prices = self.board.prices(broker, symbols) if self.board else None
+        if prices is not None:
+            self.last_tick[broker] = self.board.updated[broker]
+            return prices
+        tickers = await asyncio.to_thread(market_data.FETCHERS[broker])
+        if tickers is None: return None
+        self.last_tick[broker] = time.time()
+        return {sym: market_data.pick_price(tickers, broker, sym) for sym in symbols}
+
     async def run_delta_loop(self):
         print("🌐 Delta World Online (REST Polling).")
-        import urllib3
-        urllib3.disable_warnings()
         while self.is_running:
+            started = time.perf_counter()
             try:
                 db = database.SessionLocal()
                 symbols = await self.get_active_symbols(db, "DELTA")
+                for sym in paper_ledger.idle("DELTA", symbols): paper_ledger.forget(db, "DELTA", sym)
                 db.close()
                 if symbols:
-                    resp = await asyncio.to_thread(requests.get, "https://api.india.delta.exchange/v2/tickers", verify=False, timeout=10)
-                    if resp.status_code == 200:
-                        tickers = resp.json().get('result', [])
-                        ticker_map = {}
-                        for t in tickers:
-                            val = t.get('close') or t.get('mark_price') or 0
-                            ticker_map[t['symbol']] = float(val)
-                        
-                        for sym in symbols:
-                            current_price = ticker_map.get(sym, 0.0)
-                            if current_price > 0:
-                                db_tick = database.SessionLocal()
-                                await self.execute_trade(db_tick, sym, current_price, "DELTA")
-                                db_tick.close()
+                    prices = await self.ticker_prices("DELTA", symbols)
+                    tick_ts = time.perf_counter()
+                    for sym, current_price in (prices or {}).items():
+                        if current_price > 0:
+                            db_tick = database.SessionLocal()
+                            await self.execute_trade(db_tick, sym, current_price, "DELTA", tick_ts)
+                            db_tick.close()
             except Exception as err: pass
-            await asyncio.sleep(2) # Safely check prices every 2 seconds
+            metrics.observe('loop_iteration', time.perf_counter() - started, broker="DELTA")
+            await asyncio.sleep(market_data.POLL_SECONDS["DELTA"]) # Safely check prices every 2 seconds
 
     async def run_coindcx_loop(self):
         print("🌐 CoinDCX World Online.")
         while self.is_running:
+            started = time.perf_counter()
             try:
                 db = database.SessionLocal()
                 symbols = await self.get_active_symbols(db, "COINDCX")
+                for sym in paper_ledger.idle("COINDCX", symbols): paper_ledger.forget(db, "COINDCX", sym)
                 db.close()
                 if symbols:
-                    resp = await asyncio.to_thread(requests.get, "https://api.coindcx.com/exchange/ticker", timeout=10)
-                    ticker_map = {t['market']: float(t.get('last_price', 0)) for t in resp.json()}
-                    for sym in symbols:
-                        clean_sym = sym.replace('/', '').replace('-', '')
-                        base = clean_sym.replace('USDT', '').replace('USD', '')
-                        target_spot, target_future = f"{base}USDT", f"B-{base}_USDT"
-                        current_price = ticker_map.get(target_future) or ticker_map.get(target_spot) or ticker_map.get(sym) or 0.0
-                        
+                    prices = await self.ticker_prices("COINDCX", symbols)
+                    tick_ts = time.perf_counter()
+                    for sym, current_price in (prices or {}).items():
                         if current_price > 0:
                             db_tick = database.SessionLocal()
-                            await self.execute_trade(db_tick, sym, current_price, "COINDCX")
+                            await self.execute_trade(db_tick, sym, current_price, "COINDCX", tick_ts)
                             db_tick.close()
             except: pass
-            await asyncio.sleep(5)
+            metrics.observe('loop_iteration', time.perf_counter() - started, broker="COINDCX")
+            await asyncio.sleep(market_data.POLL_SECONDS["COINDCX"])
 
-    async def start(self):
+    async def start(self, shards=None, max_shards=None):
         self.is_running = True
-        print("✅ DUAL-CORE STATE ENGINE STARTED")
-        await asyncio.gather(self.run_delta_loop(), self.run_coindcx_loop())
+        self.leases = ShardLeases(database.SessionLocal, **({'shards': shards} if shards else {}), max_shards=max_shards)
+        await asyncio.to_thread(symbol_registry.load) # market names once, before any tick / order needs them
+        await asyncio.to_thread(self.leases.sync) # own our shards before the first tick
+        print(f"✅ DUAL-CORE STATE ENGINE STARTED (shards {sorted(self.leases.owned)} of {self.leases.shards})")
+        await asyncio.gather(self.run_lease_loop(), self.run_delta_loop(), self.run_coindcx_loop(), decision_journal.run(lambda: self.is_running))
 
 engine = RealTimeEngine()
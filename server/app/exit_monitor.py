@@ -0,0 +1,166 @@
+import bisect
+
+# Price-threshold index of every open position's SL / TP / trailing stop, per (broker, symbol).
+#
+# Fixed levels sit in two sorted arrays ("fire at or below" / "fire at or above"), so one price
+# finds all triggered stops with a single bisect. Trailing stops are grouped by anchor (best price
+# since entry): a new extreme merges every group it passes into one, which is how the trailing
+# levels follow the price without touching each position, and a price is then checked with one
+# bisect per group. Exit reasons and precedence match the backtester (SL, then TP, then trailing).
+
+PRIORITY = {"Stop Loss": 0, "Take Profit": 1, "Trailing Stop": 2}
+
+class LevelBook:
+    def __init__(self, fire_below):
+        self.fire_below = fire_below
+        self.levels, self.items = [], []  # parallel, sorted by level; item = (strat_id, reason, level)
+
+    def add(self, level, item):
+        i = bisect.bisect_right(self.levels, level)
+        self.levels.insert(i, level)
+        self.items.insert(i, item)
+
+    def remove(self, level, strat_id):
+        i = bisect.bisect_left(self.levels, level)
+        while i < len(self.levels) and self.levels[i] == level:
+            if self.items[i][0] == strat_id:
+                del self.levels[i], self.items[i]
+                return
+            i += 1
+
+    def pop_triggered(self, price):
+        if self.fire_below:
+            i = bisect.bisect_left(self.levels, price)  # every level >= price
+            hit = self.items[i:]
+            del self.levels[i:], self.items[i:]
+        else:
+            i = bisect.bisect_right(self.levels, price) # every level <= price
+            hit = self.items[:i]
+            del self.levels[:i], self.items[:i]
+        return hit
+
+class TrailGroup:
+    __slots__ = ('anchor', 'ratios', 'ids')
+
+    def __init__(self, anchor):
+        self.anchor, self.ratios, self.ids = anchor, [], []
+
+    def add(self, ratio, strat_id):
+        i = bisect.bisect_right(self.ratios, ratio)
+        self.ratios.insert(i, ratio)
+        self.ids.insert(i, strat_id)
+
+class TrailingBook:
+    # Longs: anchor = highest price since entry, fire when price <= anchor * (1 - tsl).
+    # Shorts: anchor = lowest price since entry, fire when price >= anchor * (1 + tsl).
+    def __init__(self, long):
+        self.long = long
+        self.groups = []  # sorted by anchor
+        self.where = {}   # strat_id -> group
+
+    def add(self, strat_id, anchor, pct):
+        ratio = 1 - pct / 100 if self.long else 1 + pct / 100
+        anchors = [g.anchor for g in self.groups]
+        i = bisect.bisect_left(anchors, anchor)
+        if i < len(anchors) and anchors[i] == anchor: group = self.groups[i]
+        else:
+            group = TrailGroup(anchor)
+            self.groups.insert(i, group)
+        group.add(ratio, strat_id)
+        self.where[strat_id] = group
+
+    def remove(self, strat_id):
+        group = self.where.pop(strat_id, None)
+        if group is None: return
+        k = group.ids.index(strat_id)
+        del group.ratios[k], group.ids[k]
+        if not group.ids: self.groups.remove(group)
+
+    def merge(self, groups, anchor):
+        merged = TrailGroup(anchor)
+        pairs = sorted((r, s) for g in groups for r, s in zip(g.ratios, g.ids))
+        merged.ratios, merged.ids = [r for r, _ in pairs], [s for _, s in pairs]
+        for s in merged.ids: self.where[s] = merged
+        return merged
+
+    def pop_triggered(self, price):
+        if not self.groups: return []
+        anchors = [g.anchor for g in self.groups]
+        # 1. Trail: every group the price has moved past now shares the new extreme as its anchor
+        if self.long:
+            k = bisect.bisect_left(anchors, price)
+            if k: self.groups[:k] = [self.merge(self.groups[:k], price)]
+        else:
+            k = bisect.bisect_right(anchors, price)
+            if k < len(anchors): self.groups[k:] = [self.merge(self.groups[k:], price)]
+        # 2. Trigger: within a group, fire when ratio >= price / anchor (long) or <= (short)
+        hit = []
+        for group in list(self.groups):
+            threshold = price / group.anchor
+            if self.long:
+                i = bisect.bisect_left(group.ratios, threshold)
+                fired = list(zip(group.ids[i:], group.ratios[i:]))
+                del group.ratios[i:], group.ids[i:]
+            else:
+                i = bisect.bisect_right(group.ratios, threshold)
+                fired = list(zip(group.ids[:i], group.ratios[:i]))
+                del group.ratios[:i], group.ids[:i]
+            for strat_id, ratio in fired:
+                self.where.pop(strat_id, None)
+                hit.append((strat_id, "Trailing Stop", group.anchor * ratio))
+            if not group.ids: self.groups.remove(group)
+        return hit
+
+class MarketExits:
+    def __init__(self):
+        self.below, self.above = LevelBook(True), LevelBook(False)
+        self.trail_long, self.trail_short = TrailingBook(True), TrailingBook(False)
+
+class ExitMonitor:
+    def __init__(self):
+        self.markets = {}    # (broker, symbol) -> MarketExits
+        self.positions = {}  # strat_id -> (market key, version, [(LevelBook, level)], TrailingBook or None)
+
+    def watch(self, strat_id, broker, symbol, side, entry_price, sl_pct=0, tp_pct=0, tsl_pct=0, anchor=None):
+        # No-op while the position and its settings are unchanged, so it can be called every tick
+        key, version = (broker, symbol), (side, entry_price, sl_pct, tp_pct, tsl_pct)
+        current = self.positions.get(strat_id)
+        if current and current[0] == key and current[1] == version: return
+        self.unwatch(strat_id)
+        if entry_price <= 0: return
+        m = self.markets.setdefault(key, MarketExits())
+        levels, trail = [], None
+        if side == 'BUY':
+            if sl_pct > 0: levels.append((m.below, entry_price * (1 - sl_pct / 100), "Stop Loss"))
+            if tp_pct > 0: levels.append((m.above, entry_price * (1 + tp_pct / 100), "Take Profit"))
+            if tsl_pct > 0: trail = m.trail_long; trail.add(strat_id, max(entry_price, anchor or entry_price), tsl_pct)
+        else:
+            if sl_pct > 0: levels.append((m.above, entry_price * (1 + sl_pct / 100), "Stop Loss"))
+            if tp_pct > 0: levels.append((m.below, entry_price * (1 - tp_pct / 100), "Take Profit"))
+            if tsl_pct > 0: trail = m.trail_short; trail.add(strat_id, min(entry_price, anchor or entry_price), tsl_pct)
+        for book, level, reason in levels: book.add(level, (strat_id, reason, level))
+        self.positions[strat_id] = (key, version, [(book, level) for book, level, _ in levels], trail)
+
+    def unwatch(self, strat_id):
+        current = self.positions.pop(strat_id, None)
+        if current is None: return
+        for book, level in current[2]: book.remove(level, strat_id)
+        if current[3] is not None: current[3].remove(strat_id)
+
+    def retain(self, broker, symbol, strat_ids):
+        # Drop positions of this market that are no longer open / running
+        stale = [s for s, (key, *_) in self.positions.items() if key == (broker, symbol) and s not in strat_ids]
+        for s in stale: self.unwatch(s)
+
+    def on_price(self, broker, symbol, price):
+        # {strat_id: (reason, trigger level)} of every position this price closes, each reported once
+        m = self.markets.get((broker, symbol))
+        if m is None or price <= 0: return {}
+        hits = {}
+        for book in (m.below, m.above, m.trail_long, m.trail_short):
+            for strat_id, reason, level in book.pop_triggered(price):
+                if strat_id not in hits or PRIORITY[reason] < PRIORITY[hits[strat_id][0]]: hits[strat_id] = (reason, level)
+        for strat_id in hits: self.unwatch(strat_id)
+        return hits
+
+exit_monitor = ExitMonitor()
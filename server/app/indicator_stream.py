@@ -0,0 +1,794 @@
+import abc
+import math
+import bisect
+import itertools
+from collections import deque
+from .indicators import normalize_params, indicator_key, PRICE_SOURCES
+
+# Incremental versions of the indicators in indicators.py for live ticks.
+#
+# update(bar) commits a CLOSED bar and returns the new value, peek(bar) returns what the value
+# would be if the in-progress bar closed right now without touching the state. Both cost O(1)
+# (amortized; CCI a bisect and a prefix sum) whatever the length: peek reads the running sums, the previous smoothed
+# value and the monotonic deques against the current bar, it never copies them. A bar is a dict
+# with open/high/low/close/volume. Values are NaN until the indicator is warm, exactly where the
+# vectorized kernel is NaN; indicator_doctor.py checks both against reference values.
+#
+# SeriesStreams runs them over a live CandleSeries (app/timeframes.py): every closed bar is fed once,
+# the bar in progress is only peeked, so a tick costs the same however much history the series holds.
+
+NAN = float('nan')
+
+class Window:
+    # Last `length` values with a running sum, and a sum / sum of squares of deviations from a shift
+    # for the variance. All are re-summed every `length` pushes so float drift can't build up.
+    # Like pandas rolling, any NaN inside makes it NaN. The *_with(x) forms answer as if x had been
+    # pushed, without pushing it.
+    def __init__(self, length):
+        self.length, self.values, self.nans, self.pushed = length, deque(), 0, 0
+        self.total, self.shift, self.lin, self.sq = 0.0, None, 0.0, 0.0
+
+    def _after(self, x):
+        # (count, nans, total, lin, sq) once x is pushed
+        n, nans, total, lin, sq = len(self.values) + 1, self.nans, self.total, self.lin, self.sq
+        shift = x if self.shift is None else self.shift
+        if math.isnan(x): nans += 1
+        else:
+            d = x - shift
+            total, lin, sq = total + x, lin + d, sq + d * d
+        if n > self.length:
+            n, old = n - 1, self.values[0]
+            if math.isnan(old): nans -= 1
+            else:
+                d = old - shift
+                total, lin, sq = total - old, lin - d, sq - d * d
+        return n, nans, total, lin, sq
+
+    def push(self, x):
+        if self.shift is None and not math.isnan(x): self.shift = x
+        _, self.nans, self.total, self.lin, self.sq = self._after(x)
+        self.values.append(x)
+        if len(self.values) > self.length: self.values.popleft()
+        self.pushed += 1
+        if self.pushed % self.length == 0: self._resum()
+
+    def _resum(self):
+        finite = [v for v in self.values if not math.isnan(v)]
+        if not finite: return
+        self.total = math.fsum(finite)
+        self.shift = self.total / len(finite)
+        self.lin = math.fsum(v - self.shift for v in finite)
+        self.sq = math.fsum((v - self.shift) ** 2 for v in finite)
+
+    @property
+    def full(self): return len(self.values) == self.length and not self.nans
+
+    def full_with(self, x):
+        n, nans, _, _, _ = self._after(x)
+        return n == self.length and not nans
+
+    def total_with(self, x): return self._after(x)[2]
+
+    def mean(self): return self.total / self.length if self.full else NAN
+
+    def mean_with(self, x):
+        n, nans, total, _, _ = self._after(x)
+        return total / self.length if n == self.length and not nans else NAN
+
+    def sum(self): return self.total if self.full else NAN
+
+    def sum_with(self, x):
+        n, nans, total, _, _ = self._after(x)
+        return total if n == self.length and not nans else NAN
+
+    def stdev(self, ddof=0):
+        return self._stdev(len(self.values), self.nans, self.lin, self.sq, ddof)
+
+    def stdev_with(self, x, ddof=0):
+        n, nans, _, lin, sq = self._after(x)
+        return self._stdev(n, nans, lin, sq, ddof)
+
+    def _stdev(self, n, nans, lin, sq, ddof):
+        if n != self.length or nans or n <= ddof: return NAN
+        return math.sqrt(max(0.0, sq - lin * lin / n) / (n - ddof))
+
+class Extreme:
+    # Rolling max (or min) over `length` bars, monotonic deque -> amortized O(1).
+    # Equal values keep the latest at the front, or the earliest with first=True (argmax semantics).
+    def __init__(self, length, highest=True, first=False):
+        self.length, self.highest, self.first, self.items, self.count = length, highest, first, deque(), 0
+
+    def _beaten(self, a, x):
+        # a leaves the deque when x arrives
+        if self.highest: return a < x if self.first else a <= x
+        return a > x if self.first else a >= x
+
+    def push(self, x):
+        while self.items and self._beaten(self.items[-1][1], x): self.items.pop()
+        self.items.append((self.count, x))
+        self.count += 1
+        if self.items[0][0] <= self.count - 1 - self.length: self.items.popleft()
+
+    def value(self): return self.items[0][1] if self.count >= self.length else NAN
+
+    def front_with(self, x):
+        # (bar index, value) of the extreme once x is pushed: the oldest item still inside, unless x beats it
+        start = self.count + 1 - self.length
+        for i, v in itertools.islice(self.items, 2):
+            if i >= start: return (self.count, x) if self._beaten(v, x) else (i, v)
+        return self.count, x
+
+    def value_with(self, x): return self.front_with(x)[1] if self.count + 1 >= self.length else NAN
+
+class Smoother:
+    # TradingView ema / rma: SMA of the first `length` values, then x * alpha + prev * (1 - alpha)
+    def __init__(self, length, alpha):
+        self.length, self.alpha, self.seeded, self.seed_total, self.value = length, alpha, 0, 0.0, NAN
+
+    def value_with(self, x):
+        if math.isnan(x): return self.value
+        if self.seeded < self.length: return (self.seed_total + x) / self.length if self.seeded + 1 == self.length else NAN
+        return self.alpha * x + (1 - self.alpha) * self.value
+
+    def push(self, x):
+        if math.isnan(x): return self.value
+        self.value = self.value_with(x)
+        if self.seeded < self.length: self.seeded, self.seed_total = self.seeded + 1, self.seed_total + x
+        return self.value
+
+def oldest_after(d, x):
+    # d[0] once x is appended to the bounded deque d, NaN while that doesn't fill it
+    if len(d) + 1 < d.maxlen: return NAN
+    if len(d) < d.maxlen: return d[0] if d else x
+    return d[1] if d.maxlen > 1 else x
+
+class StreamIndicator(abc.ABC):
+    def __init__(self, params):
+        self.p = params
+
+    @abc.abstractmethod
+    def update(self, bar): ...
+
+    @abc.abstractmethod
+    def peek(self, bar): ...
+
+class WMAStream(StreamIndicator):
+    def __init__(self, params):
+        super().__init__(params)
+        self.window = Window(params['length'])
+        self.weighted = None  # sum(weight * x), kept incrementally once the window is full
+
+    def _weighted(self, x):
+        # sum(weight * x) once x is pushed; O(1) while the window stays full
+        w, n = self.window, self.p['length']
+        if w.full and self.weighted is not None: return self.weighted + n * x - w.total # every older weight drops by one, the oldest falls out
+        tail = itertools.chain(itertools.islice(w.values, max(0, len(w.values) + 1 - n), None), (x,))
+        return sum((i + 1) * v for i, v in enumerate(tail))
+
+    def update(self, bar):
+        x, n = bar[self.p['source']], self.p['length']
+        full = self.window.full_with(x)
+        weighted = self._weighted(x) if full else None
+        self.window.push(x)
+        self.weighted = weighted
+        return weighted / (n * (n + 1) / 2) if full else NAN
+
+    def peek(self, bar):
+        x, n = bar[self.p['source']], self.p['length']
+        return self._weighted(x) / (n * (n + 1) / 2) if self.window.full_with(x) else NAN
+
+class StdevStream(StreamIndicator):
+    def __init__(self, params):
+        super().__init__(params)
+        self.window = Window(params['length'])
+
+    def update(self, bar):
+        self.window.push(bar[self.p['source']])
+        return self.window.stdev()
+
+    def peek(self, bar): return self.window.stdev_with(bar[self.p['source']])
+
+class ROCStream(StreamIndicator):
+    def __init__(self, params):
+        super().__init__(params)
+        self.history = deque(maxlen=params['length'] + 1)
+
+    def _roc(self, x, prev):
+        return 100 * (x - prev) / prev if prev else NAN
+
+    def update(self, bar):
+        x = bar[self.p['source']]
+        prev = oldest_after(self.history, x)
+        self.history.append(x)
+        return self._roc(x, prev)
+
+    def peek(self, bar):
+        x = bar[self.p['source']]
+        return self._roc(x, oldest_after(self.history, x))
+
+def mean_deviation(ordered, total, n, m, drop=None, add=None):
+    # mean(|v - m|) of the sorted values, optionally without `drop` and with `add`: the values below m
+    # come from one prefix sum, so no per-value Python loop
+    k = bisect.bisect_left(ordered, m)
+    below = sum(ordered[:k])
+    if drop is not None and drop < m: k, below = k - 1, below - drop
+    if add is not None and add < m: k, below = k + 1, below + add
+    return (m * k - below + (total - below) - m * (n - k)) / n
+
+class CCIStream(StreamIndicator):
+    def __init__(self, params):
+        super().__init__(params)
+        self.window = Window(params['length'])
+        self.ordered = [] # the window's (non-NaN) values, sorted
+
+    def _evicted(self):
+        w = self.window
+        old = w.values[0] if len(w.values) == w.length else NAN
+        return None if math.isnan(old) else old
+
+    def _cci(self, tp, m, md):
+        return (tp - m) / (0.015 * md) if md else NAN
+
+    def update(self, bar):
+        tp = (bar['high'] + bar['low'] + bar['close']) / 3
+        old = self._evicted()
+        self.window.push(tp)
+        if old is not None: del self.ordered[bisect.bisect_left(self.ordered, old)]
+        if not math.isnan(tp): bisect.insort(self.ordered, tp)
+        if not self.window.full: return NAN
+        m = self.window.mean()
+        return self._cci(tp, m, mean_deviation(self.ordered, self.window.total, self.window.length, m))
+
+    def peek(self, bar):
+        tp = (bar['high'] + bar['low'] + bar['close']) / 3
+        w = self.window
+        if not w.full_with(tp): return NAN
+        m = w.mean_with(tp)
+        return self._cci(tp, m, mean_deviation(self.ordered, w.total_with(tp), w.length, m, self._evicted(), tp))
+
+class ADXStream(StreamIndicator):
+    def __init__(self, params):
+        super().__init__(params)
+        n, a = params['length'], 1.0 / params['length']
+        self.tr, self.plus, self.minus, self.adx = Smoother(n, a), Smoother(n, a), Smoother(n, a), Smoother(n, a)
+        self.prev = None
+
+    def _moves(self, bar):
+        # (true range, +DM, -DM) of the bar against the previous one
+        h, l = bar['high'], bar['low']
+        if self.prev is None: tr, up, down = h - l, NAN, NAN
+        else:
+            ph, pl, pc = self.prev
+            tr, up, down = max(h - l, abs(h - pc), abs(l - pc)), h - ph, pl - l
+        plus_dm = up if (up > down and up > 0) else 0.0
+        minus_dm = down if (down > up and down > 0) else 0.0
+        return tr, plus_dm, minus_dm
+
+    def _adx(self, atr, plus, minus, smooth):
+        if math.isnan(atr) or not atr: return self.adx.value
+        plus_di, minus_di = 100 * plus / atr, 100 * minus / atr
+        if not (plus_di + minus_di): return self.adx.value
+        return smooth(100 * abs(plus_di - minus_di) / (plus_di + minus_di))
+
+    def update(self, bar):
+        tr, plus_dm, minus_dm = self._moves(bar)
+        self.prev = (bar['high'], bar['low'], bar['close'])
+        return self._adx(self.tr.push(tr), self.plus.push(plus_dm), self.minus.push(minus_dm), self.adx.push)
+
+    def peek(self, bar):
+        tr, plus_dm, minus_dm = self._moves(bar)
+        return self._adx(self.tr.value_with(tr), self.plus.value_with(plus_dm), self.minus.value_with(minus_dm), self.adx.value_with)
+
+def stoch_raw(close, hh, ll): return 100 * (close - ll) / (hh - ll) if hh > ll else NAN
+
+class StochStream(StreamIndicator):
+    def __init__(self, params, d_line=False):
+        super().__init__(params)
+        self.hh, self.ll = Extreme(params['window'], True), Extreme(params['window'], False)
+        self.k, self.d = Window(params['smooth']), Window(params.get('d_smooth', 3))
+        self.d_line = d_line
+
+    def update(self, bar):
+        self.hh.push(bar['high'])
+        self.ll.push(bar['low'])
+        self.k.push(stoch_raw(bar['close'], self.hh.value(), self.ll.value()))
+        k = self.k.mean()
+        if not self.d_line: return k
+        self.d.push(k)
+        return self.d.mean()
+
+    def peek(self, bar):
+        k = self.k.mean_with(stoch_raw(bar['close'], self.hh.value_with(bar['high']), self.ll.value_with(bar['low'])))
+        return self.d.mean_with(k) if self.d_line else k
+
+class IchimokuStream(StreamIndicator):
+    def __init__(self, params, span='a'):
+        super().__init__(params)
+        self.span = span
+        lengths = [params['conversion'], params['base']] if span == 'a' else [params['span_b']]
+        self.ranges = [(Extreme(n, True), Extreme(n, False)) for n in lengths]
+        self.delay = deque(maxlen=params['displacement'] + 1)
+
+    def update(self, bar):
+        mids = []
+        for hh, ll in self.ranges:
+            hh.push(bar['high'])
+            ll.push(bar['low'])
+            mids.append((hh.value() + ll.value()) / 2)
+        self.delay.append(sum(mids) / len(mids))
+        return self.delay[0] if len(self.delay) == self.delay.maxlen else NAN
+
+    def peek(self, bar):
+        mids = [(hh.value_with(bar['high']) + ll.value_with(bar['low'])) / 2 for hh, ll in self.ranges]
+        return oldest_after(self.delay, sum(mids) / len(mids))
+
+def money_flow_volume(bar):
+    rng = bar['high'] - bar['low']
+    mfm = ((bar['close'] - bar['low']) - (bar['high'] - bar['close'])) / rng if rng > 0 else 0.0
+    return mfm * bar['volume']
+
+class OBVStream(StreamIndicator):
+    def __init__(self, params):
+        super().__init__(params)
+        self.total, self.prev_close = 0.0, None
+
+    def _flow(self, bar):
+        c = bar['close']
+        if self.prev_close is None or c == self.prev_close: return 0.0
+        return bar['volume'] if c > self.prev_close else -bar['volume']
+
+    def update(self, bar):
+        flow = self._flow(bar)
+        if flow: self.total += flow
+        self.prev_close = bar['close']
+        return self.total
+
+    def peek(self, bar):
+        flow = self._flow(bar)
+        return self.total + flow if flow else self.total
+
+class ADLStream(StreamIndicator):
+    def __init__(self, params):
+        super().__init__(params)
+        self.total = 0.0
+
+    def update(self, bar):
+        self.total += money_flow_volume(bar)
+        return self.total
+
+    def peek(self, bar): return self.total + money_flow_volume(bar)
+
+class CMFStream(StreamIndicator):
+    def __init__(self, params):
+        super().__init__(params)
+        self.mfv, self.vol = Window(params['length']), Window(params['length'])
+
+    def update(self, bar):
+        self.mfv.push(money_flow_volume(bar))
+        self.vol.push(bar['volume'])
+        if not self.vol.full or not self.vol.total: return NAN
+        return self.mfv.total / self.vol.total
+
+    def peek(self, bar):
+        vol = self.vol.total_with(bar['volume'])
+        if not self.vol.full_with(bar['volume']) or not vol: return NAN
+        return self.mfv.total_with(money_flow_volume(bar)) / vol
+
+def ppo(fast, slow):
+    if math.isnan(fast) or math.isnan(slow) or not slow: return NAN
+    return 100 * (fast - slow) / slow
+
+class PPOStream(StreamIndicator):
+    def __init__(self, params):
+        super().__init__(params)
+        self.fast = Smoother(params['fast'], 2.0 / (params['fast'] + 1))
+        self.slow = Smoother(params['slow'], 2.0 / (params['slow'] + 1))
+
+    def update(self, bar): return ppo(self.fast.push(bar['close']), self.slow.push(bar['close']))
+
+    def peek(self, bar): return ppo(self.fast.value_with(bar['close']), self.slow.value_with(bar['close']))
+
+def ratio(num, den):
+    # num / den with NumPy semantics: 0/0 is NaN, x/0 is +-inf
+    if den: return num / den
+    if num == 0 or math.isnan(num): return NAN
+    return math.copysign(math.inf, num)
+
+class PriceStream(StreamIndicator):
+    # A price field of another timeframe (a "1h close" condition)
+    def __init__(self, params, field):
+        super().__init__(params)
+        self.field = field
+
+    def update(self, bar): return float(bar[self.field])
+
+    def peek(self, bar): return float(bar[self.field])
+
+class SMAStream(StreamIndicator):
+    def __init__(self, params):
+        super().__init__(params)
+        self.window = Window(params['length'])
+
+    def update(self, bar):
+        self.window.push(bar[self.p['source']])
+        return self.window.mean()
+
+    def peek(self, bar): return self.window.mean_with(bar[self.p['source']])
+
+class EMAStream(StreamIndicator):
+    def __init__(self, params):
+        super().__init__(params)
+        self.ema = Smoother(params['length'], 2.0 / (params['length'] + 1))
+
+    def update(self, bar): return self.ema.push(bar[self.p['source']])
+
+    def peek(self, bar): return self.ema.value_with(bar[self.p['source']])
+
+def rsi(gain, loss):
+    if math.isnan(gain) or math.isnan(loss): return NAN
+    return 100 - 100 / (1 + ratio(gain, loss))
+
+class RSIStream(StreamIndicator):
+    def __init__(self, params):
+        super().__init__(params)
+        self.gain, self.loss = Window(params['length']), Window(params['length'])
+        self.prev = None
+
+    def _moves(self, x):
+        # (gain, loss) against the previous value; the first bar has no delta and counts as 0, like delta.where()
+        delta = NAN if self.prev is None else x - self.prev
+        return (delta if delta > 0 else 0.0), (-delta if delta < 0 else 0.0)
+
+    def update(self, bar):
+        x = bar[self.p['source']]
+        gain, loss = self._moves(x)
+        self.prev = x
+        self.gain.push(gain)
+        self.loss.push(loss)
+        return rsi(self.gain.mean(), self.loss.mean())
+
+    def peek(self, bar):
+        gain, loss = self._moves(bar[self.p['source']])
+        return rsi(self.gain.mean_with(gain), self.loss.mean_with(loss))
+
+class MACDStream(StreamIndicator):
+    def __init__(self, params):
+        super().__init__(params)
+        self.fast = Smoother(params['fast'], 2.0 / (params['fast'] + 1))
+        self.slow = Smoother(params['slow'], 2.0 / (params['slow'] + 1))
+
+    def update(self, bar): return self.fast.push(bar['close']) - self.slow.push(bar['close'])
+
+    def peek(self, bar): return self.fast.value_with(bar['close']) - self.slow.value_with(bar['close'])
+
+class BollingerStream(StreamIndicator):
+    def __init__(self, params, sign):
+        super().__init__(params)
+        self.window, self.sign = Window(params['length']), sign
+
+    def update(self, bar):
+        self.window.push(bar['close'])
+        return self.window.mean() + self.sign * self.window.stdev(ddof=1) * self.p['std']
+
+    def peek(self, bar):
+        c = bar['close']
+        return self.window.mean_with(c) + self.sign * self.window.stdev_with(c, ddof=1) * self.p['std']
+
+class TrueRange:
+    def __init__(self): self.prev_close = None
+
+    def peek(self, bar):
+        h, l, pc = bar['high'], bar['low'], self.prev_close
+        return h - l if pc is None else max(h - l, abs(h - pc), abs(l - pc))
+
+    def push(self, bar):
+        tr = self.peek(bar)
+        self.prev_close = bar['close']
+        return tr
+
+class ATRStream(StreamIndicator):
+    def __init__(self, params):
+        super().__init__(params)
+        self.tr, self.window = TrueRange(), Window(params['length'])
+
+    def update(self, bar):
+        self.window.push(self.tr.push(bar))
+        return self.window.mean()
+
+    def peek(self, bar): return self.window.mean_with(self.tr.peek(bar))
+
+class VWAPStream(StreamIndicator):
+    def __init__(self, params):
+        super().__init__(params)
+        self.pv, self.vol = Window(params['length']), Window(params['length'])
+
+    def update(self, bar):
+        tp = (bar['high'] + bar['low'] + bar['close']) / 3
+        self.pv.push(tp * bar['volume'])
+        self.vol.push(bar['volume'])
+        return ratio(self.pv.sum(), self.vol.sum()) if self.vol.full else NAN
+
+    def peek(self, bar):
+        tp, v = (bar['high'] + bar['low'] + bar['close']) / 3, bar['volume']
+        return ratio(self.pv.sum_with(tp * v), self.vol.sum_with(v)) if self.vol.full_with(v) else NAN
+
+class DonchianStream(StreamIndicator):
+    def __init__(self, params, upper):
+        super().__init__(params)
+        self.field, self.extreme = ('high', Extreme(params['length'], True)) if upper else ('low', Extreme(params['length'], False))
+
+    def update(self, bar):
+        self.extreme.push(bar[self.field])
+        return self.extreme.value()
+
+    def peek(self, bar): return self.extreme.value_with(bar[self.field])
+
+class KeltnerStream(StreamIndicator):
+    def __init__(self, params, sign):
+        super().__init__(params)
+        self.mid, self.atr, self.sign = EMAStream({'length': params['length'], 'source': 'close'}), ATRStream(params), sign
+
+    def update(self, bar): return self.mid.update(bar) + self.sign * self.p['multiplier'] * self.atr.update(bar)
+
+    def peek(self, bar): return self.mid.peek(bar) + self.sign * self.p['multiplier'] * self.atr.peek(bar)
+
+class SuperTrendStream(StreamIndicator):
+    def __init__(self, params):
+        super().__init__(params)
+        self.atr = ATRStream(params)
+        self.upper = self.lower = None # previous bar's (possibly ratcheted) bands
+        self.in_up = True
+
+    def _next(self, bar, atr):
+        # (value, upper, lower, in_up) after this bar
+        hl2, mult = (bar['high'] + bar['low']) / 2, self.p['multiplier']
+        upper, lower = hl2 + mult * atr, hl2 - mult * atr
+        if self.upper is None: return 0.0, upper, lower, self.in_up
+        c, in_up = bar['close'], self.in_up
+        if c > self.upper: in_up = True
+        elif c < self.lower: in_up = False
+        else:
+            if in_up and lower < self.lower: lower = self.lower
+            if not in_up and upper > self.upper: upper = self.upper
+        return (lower if in_up else upper), upper, lower, in_up
+
+    def update(self, bar):
+        value, self.upper, self.lower, self.in_up = self._next(bar, self.atr.update(bar))
+        return value
+
+    def peek(self, bar): return self._next(bar, self.atr.peek(bar))[0]
+
+class PSARStream(StreamIndicator):
+    def __init__(self, params):
+        super().__init__(params)
+        self.highs, self.lows = deque(maxlen=2), deque(maxlen=2) # the two bars before this one
+        self.sar, self.count = None, 0
+
+    def _next(self, h, l):
+        # (bull, af, hp, lp, ep, sar) after a bar with this high / low
+        step, max_step = self.p['step'], self.p['max_step']
+        if self.sar is None: return True, step, h, l, h, l
+        bull, af, hp, lp, ep = self.bull, self.af, self.hp, self.lp, self.ep
+        sar = self.sar + af * (ep - self.sar)
+        if bull:
+            if l < sar: bull, sar, af, ep, lp = False, hp, step, l, l
+            else:
+                if h > hp: hp, ep, af = h, h, min(af + step, max_step)
+                for prev in self.clamps(self.lows): sar = min(sar, prev)
+        else:
+            if h > sar: bull, sar, af, ep, hp = True, lp, step, h, h
+            else:
+                if l < lp: lp, ep, af = l, l, min(af + step, max_step)
+                for prev in self.clamps(self.highs): sar = max(sar, prev)
+        return bull, af, hp, lp, ep, sar
+
+    def update(self, bar):
+        h, l = bar['high'], bar['low']
+        self.bull, self.af, self.hp, self.lp, self.ep, self.sar = self._next(h, l)
+        self.highs.append(h)
+        self.lows.append(l)
+        self.count += 1
+        return self.sar
+
+    def peek(self, bar): return self._next(bar['high'], bar['low'])[5]
+
+    def clamps(self, prev):
+        # Like the kernel: the previous bar from the third bar on, the one before it from the fourth on
+        return list(prev)[-1:] if self.count == 2 else (list(prev) if self.count > 2 else [])
+
+class AroonStream(StreamIndicator):
+    def __init__(self, params, up):
+        super().__init__(params)
+        self.field = 'high' if up else 'low'
+        self.extreme = Extreme(params['length'] + 1, up, first=True) # first occurrence, like argmax
+
+    def _aroon(self, index, count):
+        # index of the extreme in a window whose oldest bar is count - (length + 1)
+        n = self.p['length']
+        return 100 * (index - (count - n - 1)) / n if count > n else NAN
+
+    def update(self, bar):
+        self.extreme.push(bar[self.field])
+        return self._aroon(self.extreme.items[0][0], self.extreme.count)
+
+    def peek(self, bar):
+        return self._aroon(self.extreme.front_with(bar[self.field])[0], self.extreme.count + 1)
+
+class WilliamsRStream(StreamIndicator):
+    def __init__(self, params):
+        super().__init__(params)
+        self.hh, self.ll = Extreme(params['length'], True), Extreme(params['length'], False)
+
+    def update(self, bar):
+        self.hh.push(bar['high'])
+        self.ll.push(bar['low'])
+        hh, ll = self.hh.value(), self.ll.value()
+        return ratio(hh - bar['close'], hh - ll) * -100
+
+    def peek(self, bar):
+        hh, ll = self.hh.value_with(bar['high']), self.ll.value_with(bar['low'])
+        return ratio(hh - bar['close'], hh - ll) * -100
+
+class MomentumStream(StreamIndicator):
+    def __init__(self, params):
+        super().__init__(params)
+        self.history = deque(maxlen=params['length'] + 1)
+
+    def update(self, bar):
+        self.history.append(bar['close'])
+        return self.history[-1] - self.history[0] if len(self.history) == self.history.maxlen else NAN
+
+    def peek(self, bar): return bar['close'] - oldest_after(self.history, bar['close'])
+
+class HMAStream(StreamIndicator):
+    def __init__(self, params):
+        super().__init__(params)
+        n = params['length']
+        self.half, self.full = int(n / 2), n
+        self.sqrt = int(math.sqrt(n))
+        if min(self.half, self.sqrt) < 1: return
+        self.wma_half = WMAStream({'length': self.half, 'source': 'close'})
+        self.wma_full = WMAStream({'length': n, 'source': 'close'})
+        self.wma_diff = WMAStream({'length': self.sqrt, 'source': 'close'})
+
+    def update(self, bar):
+        if min(self.half, self.sqrt) < 1: return NAN
+        diff = 2 * self.wma_half.update(bar) - self.wma_full.update(bar)
+        return self.wma_diff.update({'close': diff})
+
+    def peek(self, bar):
+        if min(self.half, self.sqrt) < 1: return NAN
+        diff = 2 * self.wma_half.peek(bar) - self.wma_full.peek(bar)
+        return self.wma_diff.peek({'close': diff})
+
+class TSIStream(StreamIndicator):
+    def __init__(self, params):
+        super().__init__(params)
+        lng, sht = params['long_length'], params['short_length']
+        self.num = (Smoother(lng, 2.0 / (lng + 1)), Smoother(sht, 2.0 / (sht + 1)))
+        self.den = (Smoother(lng, 2.0 / (lng + 1)), Smoother(sht, 2.0 / (sht + 1)))
+        self.prev = None
+
+    def _tsi(self, num, den):
+        if math.isnan(num) or math.isnan(den): return NAN
+        return 100 * ratio(num, den)
+
+    def update(self, bar):
+        c = bar['close']
+        diff = NAN if self.prev is None else c - self.prev
+        self.prev = c
+        return self._tsi(self.num[1].push(self.num[0].push(diff)), self.den[1].push(self.den[0].push(abs(diff))))
+
+    def peek(self, bar):
+        diff = NAN if self.prev is None else bar['close'] - self.prev
+        return self._tsi(self.num[1].value_with(self.num[0].value_with(diff)), self.den[1].value_with(self.den[0].value_with(abs(diff))))
+
+class UltimateStream(StreamIndicator):
+    def __init__(self, params):
+        super().__init__(params)
+        self.windows = [(Window(params[k]), Window(params[k])) for k in ('fast', 'mid', 'slow')]
+        self.prev_close = None
+
+    def _pressure(self, bar):
+        # (buying pressure, true range) against the previous close
+        c, pc = bar['close'], self.prev_close
+        low, high = (bar['low'], bar['high']) if pc is None else (min(bar['low'], pc), max(bar['high'], pc))
+        return c - low, high - low
+
+    def _uo(self, avgs): return 100 * (4 * avgs[0] + 2 * avgs[1] + avgs[2]) / 7
+
+    def update(self, bar):
+        bp, tr = self._pressure(bar)
+        self.prev_close = bar['close']
+        avgs = []
+        for bps, trs in self.windows:
+            bps.push(bp)
+            trs.push(tr)
+            avgs.append(ratio(bps.sum(), trs.sum()) if trs.full else NAN)
+        return self._uo(avgs)
+
+    def peek(self, bar):
+        bp, tr = self._pressure(bar)
+        return self._uo([ratio(bps.sum_with(bp), trs.sum_with(tr)) if trs.full_with(tr) else NAN for bps, trs in self.windows])
+
+STREAMS = {
+    'sma': SMAStream,
+    'ema': EMAStream,
+    'rsi': RSIStream,
+    'macd': MACDStream,
+    'bb_upper': lambda p: BollingerStream(p, 1),
+    'bb_lower': lambda p: BollingerStream(p, -1),
+    'atr': ATRStream,
+    'vwap': VWAPStream,
+    'donchian_upper': lambda p: DonchianStream(p, True),
+    'donchian_lower': lambda p: DonchianStream(p, False),
+    'keltner_upper': lambda p: KeltnerStream(p, 1),
+    'keltner_lower': lambda p: KeltnerStream(p, -1),
+    'supertrend': SuperTrendStream,
+    'psar': PSARStream,
+    'aroon_up': lambda p: AroonStream(p, True),
+    'aroon_down': lambda p: AroonStream(p, False),
+    'williams_r': WilliamsRStream,
+    'mom': MomentumStream,
+    'hma': HMAStream,
+    'tsi': TSIStream,
+    'uo': UltimateStream,
+    'wma': WMAStream,
+    'stdev': StdevStream,
+    'roc': ROCStream,
+    'cci': CCIStream,
+    'adx': ADXStream,
+    'stoch_k': lambda p: StochStream(p),
+    'stoch_d': lambda p: StochStream(p, d_line=True),
+    'ichimoku_a': lambda p: IchimokuStream(p, 'a'),
+    'ichimoku_b': lambda p: IchimokuStream(p, 'b'),
+    'obv': OBVStream,
+    'adl': ADLStream,
+    'cmf': CMFStream,
+    'ppo': PPOStream,
+}
+
+def make_stream(name, params):
+    # None when the indicator has no incremental version (callers fall back to the frame)
+    if name in PRICE_SOURCES: return PriceStream({}, name)
+    factory = STREAMS.get(name)
+    return factory(normalize_params(name, params)) if factory else None
+
+BAR_FIELDS = ('timestamp', 'open', 'high', 'low', 'close', 'volume') # CandleSeries row layout
+
+class SeriesStreams:
+    # Streaming indicators over one CandleSeries. Each keeps its committed value for every closed bar
+    # the series still holds; a reseed starts them over, a bar close feeds only the new bars.
+    def __init__(self, series):
+        self.series = series
+        self.entries = {} # indicator_key -> [stream, values per closed bar, generation, closed bars fed]
+        self.fed = 0      # bars fed since start, for the metrics
+
+    def entry(self, name, params):
+        s = self.series
+        key = indicator_key(name, params)
+        e = self.entries.get(key)
+        if e is None or e[2] != s.generation or s.closed_total - e[3] > len(s.bars):
+            stream = make_stream(name, params)
+            if stream is None: return None
+            e = self.entries[key] = [stream, deque(maxlen=s.bars.maxlen), s.generation, s.closed_total - len(s.bars)]
+        new = s.closed_total - e[3]
+        if new:
+            for row in itertools.islice(s.bars, len(s.bars) - new, None):
+                e[1].append(e[0].update(dict(zip(BAR_FIELDS, row))))
+            e[3] = s.closed_total
+            self.fed += new
+        return e
+
+    def closed(self, name, params, idx):
+        # Committed values at closed-bar indices (-1: before the first bar). None without a stream.
+        e = self.entry(name, params)
+        if e is None: return None
+        values, n = e[1], len(e[1])
+        return [values[i] if 0 <= i < n else NAN for i in idx]
+
+    def current(self, name, params):
+        # Value if the bar in progress closed at the current price; the state is not touched
+        e = self.entry(name, params)
+        if e is None or self.series.current is None: return None
+        return e[0].peek(dict(zip(BAR_FIELDS, self.series.current)))
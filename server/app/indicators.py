@@ -0,0 +1,291 @@
+import numpy as np
+import pandas as pd
+
+# Shared indicator math for the live engine and the backtester.
+#
+# Every indicator is identified by indicator_key(name, params): the name plus EVERY parameter that
+# changes its output, with defaults filled in. Two MACDs with different fast/slow (or two Bollinger
+# bands with different std) never share a value, and {'length': '14'} / {} / {'length': 14.0}
+# resolve to the same key instead of forcing a recompute.
+
+PRICE_SOURCES = ['close', 'open', 'high', 'low', 'volume']
+
+INDICATOR_PARAMS = {
+    'sma': {'length': 14, 'source': 'close'},
+    'ema': {'length': 14, 'source': 'close'},
+    'rsi': {'length': 14, 'source': 'close'},
+    'macd': {'fast': 12, 'slow': 26},
+    'bb_upper': {'length': 14, 'std': 2.0},
+    'bb_lower': {'length': 14, 'std': 2.0},
+    'atr': {'length': 14},
+    'vwap': {'length': 14},
+    'donchian_upper': {'length': 14},
+    'donchian_lower': {'length': 14},
+    'keltner_upper': {'length': 14, 'multiplier': 2.0},
+    'keltner_lower': {'length': 14, 'multiplier': 2.0},
+    'supertrend': {'length': 14, 'multiplier': 3.0},
+    'psar': {'step': 0.02, 'max_step': 0.2},
+    'aroon_up': {'length': 14},
+    'aroon_down': {'length': 14},
+    'williams_r': {'length': 14},
+    'mom': {'length': 14},
+    'hma': {'length': 14},
+    'tsi': {'long_length': 25, 'short_length': 13},
+    'uo': {'fast': 7, 'mid': 14, 'slow': 28},
+    'wma': {'length': 14, 'source': 'close'},
+    'stdev': {'length': 14, 'source': 'close'},
+    'roc': {'length': 12, 'source': 'close'},
+    'cci': {'length': 20},
+    'adx': {'length': 14},
+    'stoch_k': {'window': 14, 'smooth': 3},
+    'stoch_d': {'window': 14, 'smooth': 3, 'd_smooth': 3},
+    'ichimoku_a': {'conversion': 9, 'base': 26, 'displacement': 26},
+    'ichimoku_b': {'span_b': 52, 'displacement': 26},
+    'obv': {},
+    'adl': {},
+    'cmf': {'length': 20},
+    'ppo': {'fast': 12, 'slow': 26},
+}
+
+def normalize_params(name, params):
+    params = params or {}
+    spec = INDICATOR_PARAMS.get(name)
+    # Unknown indicator: keep whatever was sent so distinct settings still get distinct keys
+    if spec is None: return {str(k): v for k, v in params.items()}
+    norm = {}
+    for p, default in spec.items():
+        val = params.get(p)
+        if val in (None, '') or (p == 'length' and not val): val = default
+        try:
+            if isinstance(default, str): val = str(val) if str(val) in PRICE_SOURCES else default
+            elif isinstance(default, int): val = int(float(val))
+            else: val = float(val)
+        except (TypeError, ValueError): val = default
+        norm[p] = val
+    return norm
+
+def indicator_key(name, params):
+    return (name, tuple(sorted(normalize_params(name, params).items(), key=lambda kv: kv[0])))
+
+def indicator_column(name, params, tf=None):
+    # DataFrame column for an indicator key, e.g. macd_fast12_slow26 or 1h_ema_length50_sourceclose
+    _, items = indicator_key(name, params)
+    return "_".join(([tf] if tf else []) + [name] + [f"{k}{v}" for k, v in items])
+
+def seeded_ewm(values, length, alpha):
+    # TradingView ema / rma: SMA of the first `length` valid values, then strict compounding
+    # (NaN bars keep the previous value). ewm(adjust=False) runs the same recursion in C.
+    vals = np.asarray(values, dtype=np.float64)
+    out = np.full(len(vals), np.nan)
+    valid_mask = ~np.isnan(vals)
+    if not valid_mask.any(): return out
+
+    first_valid = np.argmax(valid_mask)
+    start_idx = first_valid + length - 1
+    if start_idx >= len(vals): return out
+
+    seeded = vals.copy()
+    seeded[:start_idx] = np.nan
+    seeded[start_idx] = np.mean(vals[first_valid : start_idx + 1])
+    return pd.Series(seeded).ewm(alpha=alpha, adjust=False, ignore_na=True).mean().values
+
+def tv_ema(series, length):
+    return pd.Series(seeded_ewm(series.values, length, 2.0 / (length + 1)), index=series.index)
+
+def rma(values, length):
+    # Wilder smoothing (ADX), alpha = 1/length
+    return seeded_ewm(values, length, 1.0 / length)
+
+def wma_kernel(vals, length):
+    # Linear weights, newest bar = length. One C-level convolution instead of rolling().apply()
+    out = np.full(len(vals), np.nan)
+    if length < 1 or len(vals) < length: return out
+    weights = np.arange(length, 0, -1, dtype=np.float64)
+    out[length - 1:] = np.convolve(np.asarray(vals, dtype=np.float64), weights, mode='valid') / weights.sum()
+    return out
+
+def mean_deviation(vals, length, chunk=250000):
+    # Mean |x - window mean| over a sliding window, chunked so 5M-row frames don't build a (n, length) temp
+    vals = np.asarray(vals, dtype=np.float64)
+    out = np.full(len(vals), np.nan)
+    if len(vals) < length: return out
+    windows = np.lib.stride_tricks.sliding_window_view(vals, length)
+    for s in range(0, len(windows), chunk):
+        w = windows[s:s + chunk]
+        out[length - 1 + s:length - 1 + s + len(w)] = np.abs(w - w.mean(axis=1, keepdims=True)).mean(axis=1)
+    return out
+
+def money_flow_volume(df):
+    h, l, c, v = df['high'].values, df['low'].values, df['close'].values, df['volume'].values
+    rng = h - l
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mfm = np.where(rng > 0, ((c - l) - (h - c)) / rng, 0.0)
+    return mfm * v
+
+def midpoint(df, length):
+    return (df['high'].rolling(window=length).max() + df['low'].rolling(window=length).min()) / 2
+
+def true_range(df):
+    return pd.concat([df['high'] - df['low'], (df['high'] - df['close'].shift()).abs(), (df['low'] - df['close'].shift()).abs()], axis=1).max(axis=1)
+
+def calculate_indicator(df, name, params, cache=None):
+    # cache (IndicatorCache) lets composite indicators reuse the EMA / ATR another condition already built
+    def sub(sub_name, sub_params):
+        if cache is not None: return pd.Series(cache.get(sub_name, sub_params), index=df.index)
+        return pd.Series(calculate_indicator(df, sub_name, sub_params), index=df.index)
+
+    try:
+        if name in PRICE_SOURCES: return df[name].astype(np.float64) # price fields of another timeframe
+        p = normalize_params(name, params)
+        length = p.get('length', 14)
+        src = df[p.get('source', 'close')]
+        if name == 'rsi':
+            delta = src.diff()
+            gain = (delta.where(delta > 0, 0)).rolling(window=length).mean()
+            loss = (-delta.where(delta < 0, 0)).rolling(window=length).mean()
+            return 100 - (100 / (1 + (gain / loss)))
+        elif name == 'ema': return tv_ema(src, length)
+        elif name == 'sma': return src.rolling(window=length).mean()
+        elif name == 'macd':
+            return sub('ema', {'length': p['fast']}) - sub('ema', {'length': p['slow']})
+        elif name == 'bb_upper':
+            return df['close'].rolling(window=length).mean() + (df['close'].rolling(window=length).std() * p['std'])
+        elif name == 'bb_lower':
+            return df['close'].rolling(window=length).mean() - (df['close'].rolling(window=length).std() * p['std'])
+        elif name == 'atr':
+            return true_range(df).rolling(window=length).mean()
+        elif name == 'vwap':
+            tp = (df['high'] + df['low'] + df['close']) / 3
+            return (tp * df['volume']).rolling(window=length).sum() / df['volume'].rolling(window=length).sum()
+        elif name == 'donchian_upper': return df['high'].rolling(window=length).max()
+        elif name == 'donchian_lower': return df['low'].rolling(window=length).min()
+        elif name == 'keltner_upper' or name == 'keltner_lower':
+            mult = p['multiplier']
+            mid = sub('ema', {'length': length})
+            atr = sub('atr', {'length': length})
+            if name == 'keltner_upper': return mid + (mult * atr)
+            else: return mid - (mult * atr)
+        elif name == 'supertrend':
+            mult = p['multiplier']
+            hl2 = (df['high'] + df['low']) / 2
+            atr = sub('atr', {'length': length}).values
+            c_val, u_val, l_val = df['close'].values, (hl2 + mult * atr).to_numpy(copy=True), (hl2 - mult * atr).to_numpy(copy=True) # bands are edited in place
+            st = np.zeros(len(c_val))
+            in_up = True
+            for i in range(1, len(c_val)):
+                if c_val[i] > u_val[i-1]: in_up = True
+                elif c_val[i] < l_val[i-1]: in_up = False
+                else:
+                    if in_up and l_val[i] < l_val[i-1]: l_val[i] = l_val[i-1]
+                    if not in_up and u_val[i] > u_val[i-1]: u_val[i] = u_val[i-1]
+                st[i] = l_val[i] if in_up else u_val[i]
+            return pd.Series(st, index=df.index)
+        elif name == 'psar':
+            step, max_step = p['step'], p['max_step']
+            h_val, l_val = df['high'].values, df['low'].values
+            psar = np.zeros(len(h_val))
+            bull = True
+            af = step
+            hp, lp, ep = h_val[0], l_val[0], h_val[0]
+            psar[0] = l_val[0]
+            for i in range(1, len(h_val)):
+                psar[i] = psar[i-1] + af * (ep - psar[i-1])
+                if bull:
+                    if l_val[i] < psar[i]: bull, psar[i], af, ep, lp = False, hp, step, l_val[i], l_val[i]
+                    else:
+                        if h_val[i] > hp: hp, ep, af = h_val[i], h_val[i], min(af + step, max_step)
+                        if i > 1 and l_val[i-1] < psar[i]: psar[i] = l_val[i-1]
+                        if i > 2 and l_val[i-2] < psar[i]: psar[i] = l_val[i-2]
+                else:
+                    if h_val[i] > psar[i]: bull, psar[i], af, ep, hp = True, lp, step, h_val[i], h_val[i]
+                    else:
+                        if l_val[i] < lp: lp, ep, af = l_val[i], l_val[i], min(af + step, max_step)
+                        if i > 1 and h_val[i-1] > psar[i]: psar[i] = h_val[i-1]
+                        if i > 2 and h_val[i-2] > psar[i]: psar[i] = h_val[i-2]
+            return pd.Series(psar, index=df.index)
+        elif name == 'aroon_up': return df['high'].rolling(window=length+1).apply(lambda x: 100 * np.argmax(x) / length, raw=True)
+        elif name == 'aroon_down': return df['low'].rolling(window=length+1).apply(lambda x: 100 * np.argmin(x) / length, raw=True)
+        elif name == 'williams_r':
+            hh = df['high'].rolling(window=length).max()
+            ll = df['low'].rolling(window=length).min()
+            return (hh - df['close']) / (hh - ll) * -100
+        elif name == 'mom': return df['close'] - df['close'].shift(length)
+        elif name == 'hma':
+            half_l, sqrt_l = int(length / 2), int(np.sqrt(length))
+            diff = 2 * wma_kernel(df['close'].values, half_l) - wma_kernel(df['close'].values, length)
+            return pd.Series(wma_kernel(diff, sqrt_l), index=df.index)
+        elif name == 'tsi':
+            long_l, short_l = p['long_length'], p['short_length']
+            diff = df['close'].diff()
+            num = tv_ema(tv_ema(diff, long_l), short_l)
+            den = tv_ema(tv_ema(diff.abs(), long_l), short_l)
+            return 100 * (num / den)
+        elif name == 'uo':
+            fast, mid, slow = p['fast'], p['mid'], p['slow']
+            prev_close = df['close'].shift(1)
+            bp = df['close'] - pd.concat([df['low'], prev_close], axis=1).min(axis=1)
+            tr = pd.concat([df['high'], prev_close], axis=1).max(axis=1) - pd.concat([df['low'], prev_close], axis=1).min(axis=1)
+            a1 = bp.rolling(fast).sum() / tr.rolling(fast).sum()
+            a2 = bp.rolling(mid).sum() / tr.rolling(mid).sum()
+            a3 = bp.rolling(slow).sum() / tr.rolling(slow).sum()
+            return 100 * (4 * a1 + 2 * a2 + a3) / 7
+        elif name == 'wma': return pd.Series(wma_kernel(src.values, length), index=df.index)
+        elif name == 'stdev': return src.rolling(window=length).std(ddof=0) # population, like ta.stdev
+        elif name == 'roc':
+            prev = src.shift(length)
+            return 100 * (src - prev) / prev
+        elif name == 'cci':
+            tp = ((df['high'] + df['low'] + df['close']) / 3).values
+            sma = pd.Series(tp).rolling(window=length).mean().values
+            with np.errstate(invalid='ignore', divide='ignore'):
+                return pd.Series((tp - sma) / (0.015 * mean_deviation(tp, length)), index=df.index)
+        elif name == 'adx':
+            up, down = df['high'].diff().values, -df['low'].diff().values
+            with np.errstate(invalid='ignore'):
+                plus_dm = np.where((up > down) & (up > 0), up, 0.0)
+                minus_dm = np.where((down > up) & (down > 0), down, 0.0)
+            tr = rma(true_range(df).values, length)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                plus_di, minus_di = 100 * rma(plus_dm, length) / tr, 100 * rma(minus_dm, length) / tr
+                dx = 100 * np.abs(plus_di - minus_di) / (plus_di + minus_di)
+            return pd.Series(rma(dx, length), index=df.index)
+        elif name == 'stoch_k':
+            hh, ll = df['high'].rolling(window=p['window']).max(), df['low'].rolling(window=p['window']).min()
+            return (100 * (df['close'] - ll) / (hh - ll)).rolling(window=p['smooth']).mean()
+        elif name == 'stoch_d':
+            return sub('stoch_k', {'window': p['window'], 'smooth': p['smooth']}).rolling(window=p['d_smooth']).mean()
+        elif name == 'ichimoku_a':
+            # Plotted displacement bars ahead, i.e. the value at t was built from bars up to t - displacement
+            return ((midpoint(df, p['conversion']) + midpoint(df, p['base'])) / 2).shift(p['displacement'])
+        elif name == 'ichimoku_b': return midpoint(df, p['span_b']).shift(p['displacement'])
+        elif name == 'obv':
+            c = df['close'].values
+            direction = np.sign(np.diff(c, prepend=c[0]))
+            return pd.Series(np.cumsum(np.nan_to_num(direction * df['volume'].values)), index=df.index)
+        elif name == 'adl': return pd.Series(np.cumsum(np.nan_to_num(money_flow_volume(df))), index=df.index)
+        elif name == 'cmf':
+            return pd.Series(money_flow_volume(df), index=df.index).rolling(window=length).sum() / df['volume'].rolling(window=length).sum()
+        elif name == 'ppo':
+            fast, slow = sub('ema', {'length': p['fast']}), sub('ema', {'length': p['slow']})
+            return 100 * (fast - slow) / slow
+        return pd.Series(0, index=df.index)
+    except Exception as e:
+        print(f"Indicator Math Error: {e}")
+        return pd.Series(0, index=df.index)
+
+class IndicatorCache:
+    # Per-frame memo keyed by indicator_key: each distinct (name, params) is computed once per frame,
+    # no matter how many conditions or strategies ask for it.
+    def __init__(self, df):
+        self.df = df
+        self.values = {}
+        self.hits, self.misses = 0, 0
+
+    def get(self, name, params):
+        key = indicator_key(name, params)
+        if key in self.values:
+            self.hits += 1
+        else:
+            self.misses += 1
+            self.values[key] = np.asarray(calculate_indicator(self.df, name, params, self), dtype=np.float64)
+        return self.values[key]
@@ -0,0 +1,101 @@
+import time
+import asyncio
+import requests
+import urllib3
+from .price_board import PriceBoard
+from .symbols import symbol_registry
+
+urllib3.disable_warnings()
+
+# One ticker poll per broker for the whole deployment: market_data_worker.py runs run_publisher()
+# for each broker and writes every ticker into the shared price board. Engine processes read the
+# board through BoardReader and only poll the exchange themselves while no fresh board exists.
+POLL_SECONDS = {"DELTA": 2, "COINDCX": 5}
+STALE_SECONDS = 15 # heartbeat older than this: treat the publisher as down
+
+def fetch_delta_tickers():
+    resp = requests.get("https://api.india.delta.exchange/v2/tickers", verify=False, timeout=10)
+    if resp.status_code != 200: return None
+    return {t['symbol']: float(t.get('close') or t.get('mark_price') or 0) for t in resp.json().get('result', [])}
+
+def fetch_coindcx_tickers():
+    resp = requests.get("https://api.coindcx.com/exchange/ticker", timeout=10)
+    if resp.status_code != 200: return None
+    return {t['market']: float(t.get('last_price', 0)) for t in resp.json()}
+
+FETCHERS = {"DELTA": fetch_delta_tickers, "COINDCX": fetch_coindcx_tickers}
+
+def ticker_keys(broker, symbol):
+    # Ticker names a strategy symbol may be quoted under, preferred first
+    return symbol_registry.get(broker, symbol).tickers
+
+def pick_price(tickers, broker, symbol):
+    for key in ticker_keys(broker, symbol):
+        price = tickers.get(key)
+        if price: return price
+    return 0.0
+
+def board_key(broker, ticker): return f"{broker}:{ticker}"
+def heartbeat_key(broker): return f"{broker}:*" # price = tickers in the last snapshot
+
+class BoardReader:
+    # Per-process view of the board. Hands each symbol's snapshot out once, so a loop that wakes
+    # up faster than the publisher never evaluates the same price twice.
+    def __init__(self):
+        self.board = None
+        self.seen = {}    # (broker, symbol) -> slot seq already handed out
+        self.updated = {} # broker -> time.time() of the snapshot last read
+
+    def fresh(self, broker):
+        # True when the publisher wrote this broker's tickers within STALE_SECONDS. Staleness is per
+        # broker: one quiet feed leaves the board, and what the other brokers handed out, alone.
+        if self.board is None:
+            self.board = PriceBoard.attach()
+            if self.board is None: return False
+        beat = self.board.read(heartbeat_key(broker))
+        if beat is None or time.time() - beat[1] / 1000 > STALE_SECONDS:
+            if self.board.age() > STALE_SECONDS:
+                # Nobody writes this board any more. A restarted publisher creates a new one:
+                # drop ours so the next call attaches to it (slot seqs start over there)
+                self.board.close()
+                self.board, self.seen = None, {}
+            return False
+        self.updated[broker] = beat[1] / 1000
+        return True
+
+    def lookup(self, broker, symbol):
+        # (price, ts_ms, seq) under the first ticker name the symbol is quoted as, or None
+        for key in ticker_keys(broker, symbol):
+            hit = self.board.read(board_key(broker, key))
+            if hit is not None and hit[0] > 0: return hit
+        return None
+
+    def prices(self, broker, symbols):
+        # {symbol: price} of the snapshots not seen yet, or None while there is no fresh board
+        if not self.fresh(broker): return None
+        out = {}
+        for sym in symbols:
+            hit = self.lookup(broker, sym)
+            if hit is not None and self.seen.get((broker, sym)) != hit[2]:
+                self.seen[(broker, sym)] = hit[2]
+                out[sym] = hit[0]
+        return out
+
+    def latest(self, broker, symbols):
+        # {symbol: {price, ts}} regardless of what was handed out before (API reads)
+        if not self.fresh(broker): return {}
+        hits = {sym: self.lookup(broker, sym) for sym in symbols}
+        return {sym: {"price": hit[0], "ts": hit[1]} for sym, hit in hits.items() if hit}
+
+async def run_publisher(board, broker, is_running=lambda: True):
+    print(f"📡 {broker} ticker feed publishing to the price board.")
+    while is_running():
+        started = time.monotonic()
+        try:
+            tickers = await asyncio.to_thread(FETCHERS[broker])
+            if tickers:
+                snapshot = {board_key(broker, t): p for t, p in tickers.items() if p > 0}
+                snapshot[heartbeat_key(broker)] = float(len(snapshot)) # last, so it is only fresh once the prices are
+                board.publish(snapshot)
+        except Exception as e: print(f"{broker} Ticker Feed Error: {e}")
+        await asyncio.sleep(max(0.0, POLL_SECONDS[broker] - (time.monotonic() - started)))
@@ -0,0 +1,208 @@
+import time
+import threading
+from contextlib import contextmanager
+
+# In-process metrics, rendered as Prometheus text at /system/metrics.
+# Everything is updated where it happens (or read at scrape time by a collector), so a scrape
+# never pings an exchange or the database.
+#
+# Latencies go into HDR-style histograms: log-linear buckets (2**SUB_BITS linear steps per power of
+# two of microseconds, ~3% relative error) stored sparsely, so recording is O(1) and a histogram
+# only costs memory for the buckets it actually hit. Quantiles are computed at scrape time.
+SUB_BITS = 5
+SUB = 1 << SUB_BITS
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+PREFIX = "algo_"
+METER_WINDOW = 60 # seconds a meter's per-second rate is averaged over
+
+def bucket_index(us):
+    if us < SUB: return us
+    shift = us.bit_length() - 1 - SUB_BITS
+    return (shift + 1) * SUB + (us >> shift) - SUB
+
+def bucket_value(idx):
+    # Midpoint of a bucket, in microseconds
+    if idx < SUB: return float(idx)
+    shift, sub = divmod(idx, SUB)
+    shift -= 1
+    low = (sub + SUB) << shift
+    return low + ((1 << shift) - 1) / 2
+
+class HdrHistogram:
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts, self.count, self.total, self.max = {}, 0, 0.0, 0.0
+
+    def record(self, seconds):
+        seconds = max(seconds, 0.0)
+        idx = bucket_index(int(seconds * 1e6))
+        self.counts[idx] = self.counts.get(idx, 0) + 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max: self.max = seconds
+
+    def quantiles(self, qs=QUANTILES):
+        if not self.count: return {q: 0.0 for q in qs}
+        out, seen, keys = {}, 0, sorted(self.counts)
+        targets = sorted((max(1, int(q * self.count + 0.5)), q) for q in qs)
+        t = 0
+        for idx in keys:
+            seen += self.counts[idx]
+            while t < len(targets) and seen >= targets[t][0]:
+                out[targets[t][1]] = min(bucket_value(idx) / 1e6, self.max)
+                t += 1
+        for _, q in targets[t:]: out[q] = self.max
+        return out
+
+class Meter:
+    # Monotonic total plus a per-second rate over the last METER_WINDOW seconds (one bucket per second)
+    __slots__ = ('total', 'slots', 'started')
+
+    def __init__(self):
+        self.total, self.slots, self.started = 0, [(0, 0)] * METER_WINDOW, time.time()
+
+    def mark(self, n=1):
+        sec = int(time.time())
+        i = sec % METER_WINDOW
+        at, count = self.slots[i]
+        self.slots[i] = (sec, count + n if at == sec else n)
+        self.total += n
+
+    def per_second(self):
+        now = time.time()
+        recent = sum(c for at, c in self.slots if now - at < METER_WINDOW)
+        return recent / max(1.0, min(METER_WINDOW, now - self.started))
+
+def label_text(labels):
+    if not labels: return ""
+    return "{" + ",".join(f'{k}="{str(v)}"' for k, v in labels) + "}"
+
+def label_key(labels):
+    return tuple(sorted(labels.items()))
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.RLock() # backtests record from the backtest pool threads
+        self.histograms = {}         # name -> {labels tuple: HdrHistogram}
+        self.counters = {}           # name -> {labels tuple: float}
+        self.gauges = {}             # name -> {labels tuple: float}
+        self.meters = {}             # name -> {labels tuple: Meter}
+        self.collectors = []         # called at scrape time -> [(name, 'counter' | 'gauge', value, labels)]
+        self.help = {}
+
+    def describe(self, name, text):
+        self.help[name] = text
+
+    def observe(self, name, seconds, **labels):
+        key = label_key(labels)
+        with self.lock:
+            series = self.histograms.setdefault(name, {})
+            hist = series.get(key)
+            if hist is None: hist = series[key] = HdrHistogram()
+            hist.record(seconds)
+
+    def inc(self, name, value=1, **labels):
+        key = label_key(labels)
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self.lock: self.gauges.setdefault(name, {})[label_key(labels)] = value
+
+    def add(self, name, value, **labels):
+        key = label_key(labels)
+        with self.lock:
+            series = self.gauges.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def mark(self, name, n=1, **labels):
+        key = label_key(labels)
+        with self.lock:
+            series = self.meters.setdefault(name, {})
+            meter = series.get(key)
+            if meter is None: meter = series[key] = Meter()
+            meter.mark(n)
+
+    def collect(self, fn):
+        self.collectors.append(fn)
+        return fn
+
+    @contextmanager
+    def span(self, name, **labels):
+        # with metrics.span('http', broker=..., symbol=...): works the same inside coroutines
+        start = time.perf_counter()
+        try: yield
+        finally: self.observe(name, time.perf_counter() - start, **labels)
+
+    def _scalars(self):
+        # {(kind, name): {labels tuple: value}} of counters, gauges, meters and collector readings
+        out = {}
+        for kind, source in (('counter', self.counters), ('gauge', self.gauges)):
+            for name, series in source.items(): out[(kind, name)] = dict(series)
+        for name, series in self.meters.items():
+            out[('counter', name + '_total')] = {k: m.total for k, m in series.items()}
+            out[('gauge', name + '_per_second')] = {k: m.per_second() for k, m in series.items()}
+        for fn in self.collectors:
+            try: readings = fn()
+            except Exception as e:
+                print(f"Metrics Collector Error: {e}")
+                continue
+            for name, kind, value, labels in readings:
+                out.setdefault((kind, name), {})[label_key(labels)] = value
+        return out
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for name, series in sorted(self.histograms.items()):
+                full = PREFIX + name + "_seconds"
+                lines.append(f"# HELP {full} {self.help.get(name, name)}")
+                lines.append(f"# TYPE {full} summary")
+                for labels, hist in sorted(series.items()):
+                    for q, v in hist.quantiles().items():
+                        lines.append(f"{full}{label_text(labels + (('quantile', q),))} {v:.6f}")
+                    lines.append(f"{full}_sum{label_text(labels)} {hist.total:.6f}")
+                    lines.append(f"{full}_count{label_text(labels)} {hist.count}")
+            scalars = self._scalars()
+        for (kind, name), series in sorted(scalars.items(), key=lambda kv: kv[0][1]):
+            full = PREFIX + name
+            lines.append(f"# HELP {full} {self.help.get(name, name)}")
+            lines.append(f"# TYPE {full} {kind}")
+            for labels, value in sorted(series.items()): lines.append(f"{full}{label_text(labels)} {float(value):.6g}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        # Same readings as render(), as JSON for /system/diagnostics; histograms reduced to p50 / p99
+        def name_of(labels): return ",".join(f"{k}={v}" for k, v in labels) or "all"
+        out = {}
+        with self.lock:
+            for name, series in self.histograms.items():
+                out[name] = {}
+                for labels, hist in series.items():
+                    q = hist.quantiles((0.5, 0.99))
+                    out[name][name_of(labels)] = {"count": hist.count, "p50_ms": round(q[0.5] * 1000, 3), "p99_ms": round(q[0.99] * 1000, 3), "max_ms": round(hist.max * 1000, 3)}
+            scalars = self._scalars()
+        for (_, name), series in scalars.items():
+            out[name] = {name_of(labels): round(float(v), 4) for labels, v in series.items()}
+        return out
+
+metrics = Registry()
+metrics.describe("order_path", "Live order path, per stage: history_fetch, indicators, balance_fetch, decrypt, sign, http, db_commit, tick_to_trade")
+metrics.describe("loop_iteration", "One pass of a broker polling loop (tickers + every symbol)")
+metrics.describe("tick_lag_seconds", "Age of the newest ticker snapshot per broker")
+metrics.describe("strategies_evaluated_total", "Running strategies evaluated against a tick")
+metrics.describe("strategies_evaluated_per_second", "Strategies evaluated per second, last minute")
+metrics.describe("indicator_cache_total", "Indicator lookups by cache (frame: values shared by the strategies of one tick) and result")
+metrics.describe("result_cache_total", "Backtest result cache lookups by result")
+metrics.describe("result_cache_hit_ratio", "Backtest result cache hits / lookups since start")
+metrics.describe("db_pool_connections", "Database pool connections by state")
+metrics.describe("vault_sync", "Vault sync + load for a backtest, per timeframe")
+metrics.describe("backtests_queued", "Backtest requests waiting for a backtest pool worker")
+metrics.describe("backtests_running", "Backtests running on the backtest pool (at most BACKTEST_WORKERS)")
+metrics.describe("engine_shards_owned", "Live engine shards this process holds a lease on")
+metrics.describe("journal_rows_total", "Strategy evaluations written to the decision journal")
+
+def order_stage(stage, broker, symbol):
+    return metrics.span("order_path", stage=stage, broker=broker, symbol=symbol)
@@ -1,4 +1,4 @@
-﻿from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, JSON, DateTime, Text
+﻿from sqlalchemy import Boolean, Column, ForeignKey, Integer, BigInteger, Float, String, JSON, DateTime, Text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .database import Base
@@ -31,6 +31,8 @@ class Strategy(Base):
     owner_id = Column(Integer, ForeignKey("users.id"))
     owner = relationship("User", back_populates="strategies")
     logs = relationship("StrategyLog", back_populates="strategy", cascade="all, delete-orphan")
+    paper_account = relationship("PaperAccount", uselist=False, cascade="all, delete-orphan")
+    paper_fills = relationship("PaperFill", cascade="all, delete-orphan")
 
 class StrategyLog(Base):
     __tablename__ = "strategy_logs"
@@ -46,3 +48,44 @@ class Whitelist(Base):
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String, unique=True, index=True)
     added_at = Column(DateTime, default=datetime.utcnow)
+
+# Live engine sharding (see sharding.py): a worker may only trade the shards it holds an unexpired lease on
+class EngineWorker(Base):
+    __tablename__ = "engine_workers"
+    worker_id = Column(String, primary_key=True)
+    heartbeat_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class EngineLease(Base):
+    __tablename__ = "engine_leases"
+    shard = Column(Integer, primary_key=True)
+    owner = Column(String, nullable=True, index=True)
+    expires_at = Column(DateTime, nullable=True)
+
+# PAPER strategy accounts (see paper_ledger.py): the engine that trades a strategy writes them on every
+# fill, so a restart or a shard moving to another worker continues the account, and the API can read it
+class PaperAccount(Base):
+    __tablename__ = "paper_accounts"
+    strategy_id = Column(Integer, ForeignKey("strategies.id"), primary_key=True)
+    balance = Column(Float)
+    qty = Column(Float, default=0)
+    entry_price = Column(Float, default=0)
+    realized = Column(Float, default=0)
+    fees = Column(Float, default=0)
+    peak = Column(Float)
+    max_dd = Column(Float, default=0)
+    trades = Column(Integer, default=0)
+    wins = Column(Integer, default=0)
+    mark_price = Column(Float, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class PaperFill(Base):
+    __tablename__ = "paper_fills"
+    id = Column(Integer, primary_key=True, index=True)
+    strategy_id = Column(Integer, ForeignKey("strategies.id"), index=True)
+    time = Column(BigInteger)  # ms
+    side = Column(String)
+    qty = Column(Float)
+    price = Column(Float)
+    fee = Column(Float)
+    pnl = Column(Float, nullable=True)
+    reason = Column(String)
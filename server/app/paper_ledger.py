@@ -0,0 +1,224 @@
+import os
+import time
+import numpy as np
+from collections import deque
+from datetime import datetime
+from . import models
+from .backtester import FEE_RATE, STARTING_BALANCE
+
+# In-memory ledger for PAPER strategies, filled against the live tick stream with the
+# backtester's fee model. State is struct-of-arrays: one fixed-size row per strategy
+# (~90 bytes), so memory grows with the number of strategies and never with their
+# trade count. Marking every paper position of a symbol to market is one NumPy pass.
+# The engine that trades a strategy persists its account on every fill (PaperAccount /
+# PaperFill) and loads it on first use, so restarts and shard moves continue the account;
+# drawdown marked between fills is written with the next fill or when the shard moves away.
+PAPER_SLIPPAGE_BPS = float(os.getenv("PAPER_SLIPPAGE_BPS", "0"))
+RECENT_FILLS = 10000 # shared ring of the latest fills, across all strategies
+
+FIELDS = {
+    'balance': np.float64,      # cash incl. realized PnL and every fee paid
+    'qty': np.float64,          # signed: > 0 long, < 0 short
+    'entry_price': np.float64,
+    'realized': np.float64,     # net PnL of closed trades (after exit fees, like the backtester)
+    'fees': np.float64,
+    'peak': np.float64,         # highest marked equity
+    'max_dd': np.float64,       # worst drawdown from peak, in %
+    'trades': np.int32,
+    'wins': np.int32,
+    'market': np.int32,
+}
+ACCOUNT_FIELDS = [name for name in FIELDS if name != 'market'] # the columns of models.PaperAccount
+
+class PaperLedger:
+    def __init__(self, capacity=1024, starting_balance=STARTING_BALANCE, fee_rate=FEE_RATE, slippage_bps=PAPER_SLIPPAGE_BPS):
+        self.starting_balance, self.fee_rate, self.slippage = starting_balance, fee_rate, slippage_bps / 10000.0
+        self.cols = {name: np.zeros(capacity, dtype=dtype) for name, dtype in FIELDS.items()}
+        self.rows = {}         # strategy id -> row
+        self.free = []         # rows released by the engine: strategy stopped, deleted, not PAPER any more, or its shard moved
+        self.markets = {}      # (broker, symbol) -> market id
+        self.members = {}      # market id -> set of rows
+        self.market_rows = {}  # market id -> np.array of those rows, rebuilt only when a strategy joins / leaves
+        self.last_price = {}   # market id -> last marked price
+        self.fills = deque(maxlen=RECENT_FILLS)
+
+    def _grow(self):
+        for name, col in self.cols.items():
+            self.cols[name] = np.concatenate((col, np.zeros(len(col), dtype=col.dtype)))
+
+    def _market(self, broker, symbol):
+        return self.markets.setdefault((broker, symbol), len(self.markets))
+
+    def _reindex(self, market, row, joined):
+        members = self.members.setdefault(market, set())
+        if joined: members.add(row)
+        else: members.discard(row)
+        self.market_rows[market] = np.fromiter(members, dtype=np.int64, count=len(members))
+
+    def account(self, strat_id, broker, symbol):
+        row = self.rows.get(strat_id)
+        if row is not None: return row
+        if self.free: row = self.free.pop()
+        else:
+            row = len(self.rows)
+            if row >= len(self.cols['balance']): self._grow()
+        c = self.cols
+        for name in FIELDS: c[name][row] = 0
+        c['balance'][row] = c['peak'][row] = self.starting_balance
+        c['market'][row] = self._market(broker, symbol)
+        self.rows[strat_id] = row
+        self._reindex(int(c['market'][row]), row, True)
+        return row
+
+    def release(self, strat_id):
+        row = self.rows.pop(strat_id, None)
+        if row is None: return
+        self.free.append(row)
+        self._reindex(int(self.cols['market'][row]), row, False)
+
+    def load(self, db, strat_id, broker, symbol):
+        # First use in this process: pick up where the previous owner of the strategy left off
+        row = self.rows.get(strat_id)
+        if row is not None: return row
+        saved = db.get(models.PaperAccount, strat_id)
+        row = self.account(strat_id, broker, symbol)
+        if saved is not None:
+            for name in ACCOUNT_FIELDS:
+                value = getattr(saved, name)
+                if value is not None: self.cols[name][row] = value
+        return row
+
+    def save(self, db, strat_id, fill=None):
+        # Upsert the account (and append the fill that changed it); commits. A deleted strategy has nothing to save.
+        row = self.rows.get(strat_id)
+        if row is None: return
+        c = self.cols
+        try:
+            if db.get(models.Strategy, strat_id) is None: return
+            account = db.get(models.PaperAccount, strat_id) or models.PaperAccount(strategy_id=strat_id)
+            for name in ACCOUNT_FIELDS: setattr(account, name, c[name][row].item())
+            account.mark_price = self.last_price.get(int(c['market'][row]))
+            account.updated_at = datetime.utcnow()
+            db.merge(account)
+            if fill is not None:
+                t, _, side, qty, price, fee, pnl, reason = fill
+                db.add(models.PaperFill(strategy_id=strat_id, time=t, side=side, qty=qty, price=price, fee=fee, pnl=pnl, reason=reason))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"Paper Ledger Save Error ({strat_id}): {e}")
+
+    def retain(self, db, broker, symbol, strat_ids):
+        # Once per tick with the running PAPER strategies of the market: save and drop every other row,
+        # so stopped / deleted strategies leave the mark-to-market and memory follows what is running.
+        # Every running one was loaded this tick, so only a surplus of rows needs the lookup.
+        market = self.markets.get((broker, symbol))
+        members = self.members.get(market)
+        if not members or len(members) <= len(strat_ids): return
+        for strat_id in [sid for sid, row in self.rows.items() if row in members and sid not in strat_ids]:
+            self.save(db, strat_id)
+            self.release(strat_id)
+
+    def forget(self, db, broker, symbol):
+        # No running strategy left on the market here (all stopped, or its shard moved to another
+        # engine): save what was marked since the last fill, then drop its rows
+        self.retain(db, broker, symbol, set())
+
+    def idle(self, broker, symbols):
+        # Markets of the broker that still hold rows but are not among the symbols traded now
+        active = set(symbols)
+        return [sym for (b, sym), market in self.markets.items() if b == broker and sym not in active and self.members.get(market)]
+
+    def balance(self, strat_id, broker, symbol):
+        return float(self.cols['balance'][self.account(strat_id, broker, symbol)])
+
+    def position(self, strat_id):
+        row = self.rows.get(strat_id)
+        if row is None: return 0.0, 0.0
+        return float(self.cols['qty'][row]), float(self.cols['entry_price'][row])
+
+    def restore(self, strat_id, broker, symbol, side, qty, entry_price):
+        # Engine restarted mid-trade: the DB row still says IN_POSITION, re-open it without charging a fee
+        row = self.account(strat_id, broker, symbol)
+        if self.cols['qty'][row] == 0:
+            self.cols['qty'][row] = qty if side == 'BUY' else -qty
+            self.cols['entry_price'][row] = entry_price
+
+    def fill(self, strat_id, broker, symbol, side, qty, price, reason="", ts_ms=None):
+        if qty <= 0 or price <= 0: return None
+        c, row = self.cols, self.account(strat_id, broker, symbol)
+        signed = qty if side == 'BUY' else -qty
+        px = price * (1 + self.slippage) if signed > 0 else price * (1 - self.slippage) # slippage always hurts
+        fee = abs(qty) * px * self.fee_rate
+        pos, entry, net = c['qty'][row], c['entry_price'][row], None
+
+        if pos != 0 and np.sign(pos) != np.sign(signed):
+            closing = min(abs(signed), abs(pos))
+            net = (px - entry) * closing * np.sign(pos) - fee
+            c['realized'][row] += net
+            c['balance'][row] += net
+            c['trades'][row] += 1
+            c['wins'][row] += int(net > 0)
+            new_pos = pos + signed
+            c['entry_price'][row] = 0.0 if new_pos == 0 else (entry if np.sign(new_pos) == np.sign(pos) else px)
+        else:
+            new_pos = pos + signed
+            c['entry_price'][row] = (entry * abs(pos) + px * abs(signed)) / abs(new_pos)
+            c['balance'][row] -= fee
+        c['qty'][row] = new_pos
+        c['fees'][row] += fee
+
+        record = (int(ts_ms or time.time() * 1000), strat_id, side, float(qty), float(px), float(fee), None if net is None else float(net), reason)
+        self.fills.append(record)
+        return {'record': record, 'price': float(px), 'fee': float(fee), 'pnl': None if net is None else float(net)}
+
+    def mark(self, broker, symbol, price):
+        # Once per tick per symbol: equity / peak / drawdown of every paper strategy on it
+        market = self.markets.get((broker, symbol))
+        if market is None: return
+        self.last_price[market] = price
+        rows = self.market_rows.get(market)
+        if rows is None or not len(rows): return
+        c = self.cols
+        equity = c['balance'][rows] + (price - c['entry_price'][rows]) * c['qty'][rows]
+        peak = np.maximum(c['peak'][rows], equity)
+        c['peak'][rows] = peak
+        c['max_dd'][rows] = np.maximum(c['max_dd'][rows], (peak - equity) / peak * 100)
+
+    def snapshot(self, strat_id, recent=20):
+        row = self.rows.get(strat_id)
+        if row is None: return None
+        c = self.cols
+        account = {name: c[name][row].item() for name in ACCOUNT_FIELDS}
+        price = self.last_price.get(int(c['market'][row]), account['entry_price'])
+        fills = [f[:1] + f[2:] for f in reversed(self.fills) if f[1] == strat_id][:recent]
+        return summarize(account, price, fills)
+
+def stored_snapshot(db, strat_id, price=None, recent=20):
+    # The persisted account, for processes that don't trade the strategy (the API when the engine runs in workers)
+    saved = db.get(models.PaperAccount, strat_id)
+    if saved is None: return None
+    account = {name: getattr(saved, name) or 0 for name in ACCOUNT_FIELDS}
+    F = models.PaperFill
+    fills = [(f.time, f.side, f.qty, f.price, f.fee, f.pnl, f.reason)
+             for f in db.query(F).filter(F.strategy_id == strat_id).order_by(F.id.desc()).limit(recent)]
+    return summarize(account, price or saved.mark_price or account['entry_price'], fills)
+
+def summarize(account, price, fills):
+    unrealized = (price - account['entry_price']) * account['qty'] if account['qty'] else 0.0
+    trades = int(account['trades'])
+    return {
+        "balance": round(float(account['balance']), 2),
+        "equity": round(float(account['balance'] + unrealized), 2),
+        "position_qty": float(account['qty']),
+        "entry_price": float(account['entry_price']),
+        "unrealized_pnl": round(float(unrealized), 2),
+        "realized_pnl": round(float(account['realized']), 2),
+        "fees_paid": round(float(account['fees']), 4),
+        "total_trades": trades,
+        "win_rate": round(int(account['wins']) / trades * 100, 1) if trades else 0,
+        "max_drawdown": round(float(account['max_dd']), 2),
+        "recent_fills": [{"time": t, "side": s, "qty": q, "price": p, "fee": f, "pnl": n, "reason": r} for t, s, q, p, f, n, r in fills]
+    }
+
+paper_ledger = PaperLedger()
@@ -0,0 +1,114 @@
+import os
+import time
+import numpy as np
+from multiprocessing import shared_memory, resource_tracker
+
+# Latest ticker price per "BROKER:ticker" in one shared-memory block, written by the market-data
+# process (market_data_worker.py) and read in place by every engine worker and the API.
+#
+# Layout: header | slots[capacity] (seq, price, ts_ms) | names[capacity] (fixed-width bytes).
+# A slot id is assigned once and never moves. Each slot is a seqlock: the writer makes seq odd,
+# writes, makes it even again; a reader retries while seq is odd or changed under it, at most
+# READ_RETRIES times (a writer that died mid-write leaves seq odd for good), then reports no
+# price. Readers also use seq to tell a new snapshot from one they've already evaluated.
+BOARD_NAME = os.getenv("PRICE_BOARD_NAME", "algo_price_board")
+BOARD_SLOTS = int(os.getenv("PRICE_BOARD_SLOTS", "8192"))
+NAME_BYTES = 40
+READ_RETRIES = 1000 # a write takes microseconds; past this the slot is torn or stuck
+MAGIC = 0x414C474F42524401 # layout version in the low byte
+HEADER = np.dtype([('magic', '<u8'), ('capacity', '<i8'), ('count', '<i8'), ('seq', '<u8')])
+SLOT = np.dtype([('seq', '<u8'), ('price', '<f8'), ('ts_ms', '<i8')])
+
+def board_bytes(capacity):
+    return HEADER.itemsize + capacity * (SLOT.itemsize + NAME_BYTES)
+
+class PriceBoard:
+    def __init__(self, shm, owner):
+        self.shm, self.owner = shm, owner
+        self.header = np.ndarray((), HEADER, shm.buf, 0)
+        cap = int(self.header['capacity'])
+        self.slots = np.ndarray(cap, SLOT, shm.buf, HEADER.itemsize)
+        self.names = np.ndarray(cap, f'S{NAME_BYTES}', shm.buf, HEADER.itemsize + cap * SLOT.itemsize)
+        self.seq, self.price, self.ts = self.slots['seq'], self.slots['price'], self.slots['ts_ms']
+        self.ids, self.known = {}, 0
+
+    @classmethod
+    def create(cls, name=BOARD_NAME, capacity=BOARD_SLOTS):
+        try: # left behind by a publisher that crashed
+            old = shared_memory.SharedMemory(name)
+            old.close()
+            old.unlink()
+        except FileNotFoundError: pass
+        shm = shared_memory.SharedMemory(name, create=True, size=board_bytes(capacity))
+        header = np.ndarray((), HEADER, shm.buf, 0)
+        header['capacity'], header['count'], header['seq'] = capacity, 0, 0
+        header['magic'] = MAGIC # last: readers only trust a fully initialised board
+        return cls(shm, True)
+
+    @classmethod
+    def attach(cls, name=BOARD_NAME):
+        try: shm = shared_memory.SharedMemory(name)
+        except (FileNotFoundError, OSError): return None
+        # The resource tracker would unlink the publisher's board when this reader exits
+        try: resource_tracker.unregister(shm._name, 'shared_memory')
+        except Exception: pass
+        if shm.size < HEADER.itemsize or int(np.ndarray((), HEADER, shm.buf, 0)['magic']) != MAGIC:
+            shm.close()
+            return None
+        return cls(shm, False)
+
+    def close(self):
+        self.header = self.slots = self.names = self.seq = self.price = self.ts = None # views pin the buffer
+        self.shm.close()
+        if self.owner: self.shm.unlink()
+
+    def slot(self, key):
+        i = self.ids.get(key)
+        if i is None and self.known < int(self.header['count']):
+            count = int(self.header['count'])
+            for k in range(self.known, count): self.ids[self.names[k].decode()] = k
+            self.known = count
+            i = self.ids.get(key)
+        return i
+
+    # --- writer (one process) ---
+    def publish(self, prices, ts_ms=None):
+        # prices: {"BROKER:ticker": price}. New keys get the next free slot.
+        ts_ms = int(time.time() * 1000) if ts_ms is None else ts_ms
+        ids, vals = [], []
+        for key, price in prices.items():
+            i = self.ids.get(key)
+            if i is None:
+                count = int(self.header['count'])
+                if count >= len(self.slots): continue # full: raise PRICE_BOARD_SLOTS
+                self.names[count] = key.encode()[:NAME_BYTES]
+                self.ids[key] = i = count
+                self.header['count'] = count + 1 # after the name, so readers never see a blank one
+            ids.append(i)
+            vals.append(price)
+        if not ids: return 0
+        idx = np.asarray(ids, dtype=np.int64)
+        self.seq[idx] += 1 # odd: being written
+        self.price[idx] = vals
+        self.ts[idx] = ts_ms
+        self.seq[idx] += 1
+        self.header['seq'] += 1
+        return len(ids)
+
+    # --- readers ---
+    def read(self, key):
+        # (price, ts_ms, seq) of the last snapshot, None if the key was never published or no
+        # consistent read came through (callers then treat the board as stale and poll themselves)
+        i = self.slot(key)
+        if i is None: return None
+        for _ in range(READ_RETRIES):
+            s1 = int(self.seq[i])
+            if s1 & 1: continue
+            price, ts_ms = float(self.price[i]), int(self.ts[i])
+            if int(self.seq[i]) == s1: return price, ts_ms, s1
+        return None
+
+    def age(self):
+        # Seconds since the newest publish, inf when nothing was published yet
+        count = int(self.header['count'])
+        return (time.time() * 1000 - int(self.ts[:count].max())) / 1000 if count else float('inf')
@@ -0,0 +1,77 @@
+import os
+import time
+from contextlib import contextmanager, nullcontext
+
+# Opt-in wall-time breakdown of one backtest (/strategy/backtest?profile=true), returned with the
+# results under metrics.profile. Stages opened inside another (indicator:<col> within indicators) are
+# reported under nested_ms, so stages_ms never counts the same time twice. With dump=cprofile | pyinstrument the whole request also runs
+# under that profiler and the report is written to PROFILE_DIR for offline digging.
+PROFILE_DIR = os.getenv("BACKTEST_PROFILE_DIR", "/app/cache/profiles")
+DUMP_KINDS = ("cprofile", "pyinstrument")
+
+class BacktestProfile:
+    def __init__(self, dump=None, label="backtest"):
+        self.stages = {}  # top-level name -> seconds, in first-seen order; these add up to at most total_ms
+        self.nested = {}  # parent stage -> {name -> seconds} for stages opened inside another one
+        self.open = []
+        self.label = label
+        self.started = time.perf_counter()
+        self.dump, self.profiler, self.report_path, self.note = None, None, None, None
+        if dump: self._start_profiler(dump.lower())
+
+    def _start_profiler(self, kind):
+        if kind not in DUMP_KINDS:
+            self.note = f"Unknown dump '{kind}', expected one of {', '.join(DUMP_KINDS)}"
+            return
+        if kind == "pyinstrument":
+            try:
+                from pyinstrument import Profiler
+                self.dump, self.profiler = kind, Profiler()
+                self.profiler.start()
+                return
+            except ImportError: self.note = "pyinstrument is not installed, dumped with cProfile instead"
+        import cProfile
+        self.dump, self.profiler = "cprofile", cProfile.Profile()
+        self.profiler.enable()
+
+    @contextmanager
+    def stage(self, name):
+        parent = self.open[-1] if self.open else None
+        self.open.append(name)
+        start = time.perf_counter()
+        try: yield
+        finally:
+            self.open.pop()
+            into = self.stages if parent is None else self.nested.setdefault(parent, {})
+            into[name] = into.get(name, 0.0) + time.perf_counter() - start
+
+    def _write_dump(self):
+        if self.profiler is None: return
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        stem = os.path.join(PROFILE_DIR, f"{self.label}_{int(time.time() * 1000)}")
+        if self.dump == "pyinstrument":
+            self.profiler.stop()
+            self.report_path = f"{stem}.html"
+            with open(self.report_path, "w") as f: f.write(self.profiler.output_html())
+        else:
+            self.profiler.disable()
+            self.report_path = f"{stem}.prof" # python -m pstats <file>, or snakeviz
+            self.profiler.dump_stats(self.report_path)
+        self.profiler = None
+
+    def report(self):
+        # Stops the profiler (if any) on the first call; stage times are milliseconds
+        try: self._write_dump()
+        except OSError as e: self.note = f"Profile dump failed: {e}"
+        out = {"total_ms": round((time.perf_counter() - self.started) * 1000, 3),
+               "stages_ms": {name: round(sec * 1000, 3) for name, sec in self.stages.items()}}
+        if self.nested: out["nested_ms"] = {parent: {name: round(sec * 1000, 3) for name, sec in children.items()} for parent, children in self.nested.items()}
+        if self.report_path: out["report_path"] = self.report_path
+        if self.note: out["note"] = self.note
+        return out
+
+class NullProfile:
+    # Stand-in when profiling is off, so the backtester can time its stages unconditionally
+    def stage(self, name): return nullcontext()
+
+NULL_PROFILE = NullProfile()
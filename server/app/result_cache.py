@@ -0,0 +1,104 @@
+import os
+import json
+import gzip
+import hashlib
+import threading
+import pandas as pd
+from .backtester import to_ms
+from .streaming import to_builtin
+from .metrics import metrics
+
+# Content-addressed store for finished backtests.
+# Key = canonical hash of (symbol, timeframe, logic, vault version), so the same
+# payload re-opened later (or shared with a teammate) is served straight from disk.
+CACHE_DIR = os.getenv("BACKTEST_CACHE_DIR", "/app/cache/backtests")
+CACHE_MAX_BYTES = int(os.getenv("BACKTEST_CACHE_MAX_MB", "512")) * 1024 * 1024
+
+# Bump whenever the backtester output changes so stale results are never served
+CACHE_VERSION = 8
+
+# Written into logic_configuration by the live engine, irrelevant to a backtest
+LIVE_STATE_KEYS = ('state', 'entry_price', 'entry_qty', 'tradeMode', 'bracket', 'exchangeBrackets')
+
+def canonicalize(obj):
+    if isinstance(obj, dict): return {str(k): canonicalize(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)): return [canonicalize(v) for v in obj]
+    if isinstance(obj, float) and obj.is_integer(): return int(obj)
+    return obj
+
+def canonical_hash(obj):
+    raw = json.dumps(canonicalize(obj), sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+def vault_version(df, logic, frames=None):
+    # Last candle the query can actually see, plus the row count so a repaired gap inside the
+    # window changes it too. A fixed endDate in the past keeps the same version even while the
+    # vault keeps syncing newer candles. frames: the other timeframes' vault frames the run reads.
+    if df is None or df.empty: return None
+    last = df['timestamp'].iloc[-1]
+    last_ms = int(last) if df['timestamp'].dtype.kind in 'iu' else int(pd.Timestamp(last).value // 1_000_000)
+    e_date = logic.get('endDate')
+    if logic.get('startDate') and e_date:
+        last_ms = min(last_ms, to_ms(e_date) + 86400000)
+    version = [last_ms, len(df)]
+    for tf in sorted(frames or {}): version.append([tf, vault_version(frames[tf], logic)])
+    return version
+
+class ResultCache:
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits, self.misses = 0, 0
+
+    def make_key(self, symbol, timeframe, logic, version):
+        clean_logic = {k: v for k, v in logic.items() if k not in LIVE_STATE_KEYS}
+        return canonical_hash({"v": CACHE_VERSION, "symbol": symbol, "tf": timeframe, "logic": clean_logic, "vault": version})
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json.gz")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with gzip.open(path, 'rt') as f: res = json.load(f)
+            os.utime(path, None) # Mark as recently used for LRU eviction
+            self.hits += 1
+            return res
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+
+    def put(self, key, result):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._path(key)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp" # two pool threads may finish the same key
+            with gzip.open(tmp, 'wt', compresslevel=5) as f: json.dump(result, f, separators=(',', ':'), default=to_builtin)
+            os.replace(tmp, path) # Atomic, readers never see half a file
+            self.evict()
+        except OSError as e: print(f"Backtest Cache Write Error: {e}")
+
+    def evict(self):
+        entries, total = [], 0
+        with os.scandir(self.cache_dir) as it:
+            for e in it:
+                if not e.name.endswith('.json.gz'): continue
+                st = e.stat()
+                entries.append((st.st_mtime, st.st_size, e.path))
+                total += st.st_size
+        if total <= self.max_bytes: return
+        # Least recently used first
+        for _, size, path in sorted(entries):
+            try: os.remove(path)
+            except OSError: continue
+            total -= size
+            if total <= self.max_bytes: break
+
+result_cache = ResultCache()
+
+@metrics.collect
+def cache_readings():
+    lookups = result_cache.hits + result_cache.misses
+    return [("result_cache_total", "counter", result_cache.hits, {"result": "hit"}),
+            ("result_cache_total", "counter", result_cache.misses, {"result": "miss"}),
+            ("result_cache_hit_ratio", "gauge", result_cache.hits / lookups if lookups else 0.0, {})]
@@ -0,0 +1,114 @@
+import os
+import math
+import time
+import uuid
+import zlib
+import socket
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import or_, select, func
+from sqlalchemy.exc import IntegrityError
+from . import models
+
+# Live strategies are partitioned by a stable hash of (broker, symbol) into ENGINE_SHARDS shards.
+# Every engine process (the API's own, or standalone engine_worker.py processes) holds a lease row
+# per shard it trades, renewed every RENEW_SECONDS. A shard whose lease lapsed is taken over by the
+# next process that syncs, and processes rebalance to ceil(shards / live workers) each, so running
+# several uvicorn workers or worker replicas never fires the same strategy twice.
+ENGINE_SHARDS = int(os.getenv("ENGINE_SHARDS", "1"))
+LEASE_SECONDS = int(os.getenv("ENGINE_LEASE_SECONDS", "30"))
+RENEW_SECONDS = LEASE_SECONDS / 3
+SAFETY_SECONDS = 2       # stop trading a shard this long before our lease would lapse
+FORGET_WORKER_AFTER = 10 # lease periods without a heartbeat before a worker row is deleted
+
+def shard_of(broker, symbol, shards=ENGINE_SHARDS):
+    return zlib.crc32(f"{broker}:{symbol}".encode()) % shards
+
+def db_now(db):
+    # Leases are stamped and compared on the database's clock, never the host's, so skewed hosts agree on expiry
+    now = db.execute(select(func.now())).scalar()
+    if isinstance(now, str): now = datetime.fromisoformat(now)
+    if now.tzinfo is not None: now = now.astimezone(timezone.utc).replace(tzinfo=None)
+    return now
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+class ShardLeases:
+    def __init__(self, session_factory, shards=ENGINE_SHARDS, lease_seconds=LEASE_SECONDS, worker_id=None, max_shards=None):
+        self.session_factory, self.shards, self.lease_seconds = session_factory, max(1, shards), lease_seconds
+        self.worker_id = worker_id or default_worker_id()
+        self.max_shards = max_shards
+        self.owned = {}  # shard -> local time.monotonic() after which we must assume the lease is gone
+
+    def owns(self, broker, symbol):
+        expiry = self.owned.get(shard_of(broker, symbol, self.shards))
+        return expiry is not None and time.monotonic() < expiry - SAFETY_SECONDS
+
+    def _ensure_rows(self, db):
+        existing = {k for (k,) in db.query(models.EngineLease.shard)}
+        missing = [models.EngineLease(shard=k) for k in range(self.shards) if k not in existing]
+        if not missing: return
+        db.add_all(missing)
+        try: db.commit()
+        except IntegrityError: db.rollback() # another worker created them first
+
+    def sync(self):
+        # Heartbeat, renew, rebalance, acquire. Blocking DB work: the engine runs it in a thread.
+        # Returns (gained, lost) shard sets.
+        # Our local expiry counts from before the round trip, so it always ends ahead of the row's
+        started = time.monotonic()
+        L = models.EngineLease
+        before = set(self.owned)
+        db = self.session_factory()
+        try:
+            now = db_now(db)
+            until = now + timedelta(seconds=self.lease_seconds)
+            stale = now - timedelta(seconds=self.lease_seconds)
+            self._ensure_rows(db)
+            worker = db.get(models.EngineWorker, self.worker_id)
+            if worker is None: db.add(models.EngineWorker(worker_id=self.worker_id, heartbeat_at=now))
+            else: worker.heartbeat_at = now
+            db.query(models.EngineWorker).filter(models.EngineWorker.heartbeat_at < now - timedelta(seconds=self.lease_seconds * FORGET_WORKER_AFTER)).delete()
+            db.commit()
+
+            live = db.query(models.EngineWorker).filter(models.EngineWorker.heartbeat_at >= stale).count()
+            fair = math.ceil(self.shards / max(1, live))
+            if self.max_shards is not None: fair = min(fair, self.max_shards)
+
+            # Hand back anything above our share by no longer renewing it: the row keeps its expiry, so nobody
+            # else can claim it while an order of ours might still be in flight. Renew the rest as long as we still own it.
+            held = sorted(self.owned)
+            for k in held[fair:]: self.owned.pop(k, None)
+            kept = {}
+            for k in held[:fair]:
+                if db.query(L).filter(L.shard == k, L.owner == self.worker_id).update({L.expires_at: until}, synchronize_session=False):
+                    kept[k] = started + self.lease_seconds
+            db.commit()
+
+            # Take free or lapsed shards up to our share; the conditional UPDATE makes each claim atomic
+            if len(kept) < fair:
+                free = [k for (k,) in db.query(L.shard).filter(L.shard < self.shards, or_(L.owner == None, L.expires_at == None, L.expires_at < now)).order_by(L.shard)]
+                for k in free:
+                    if len(kept) >= fair: break
+                    claimed = db.query(L).filter(L.shard == k, or_(L.owner == None, L.expires_at == None, L.expires_at < now)).update(
+                        {L.owner: self.worker_id, L.expires_at: until}, synchronize_session=False)
+                    db.commit()
+                    if claimed: kept[k] = started + self.lease_seconds
+            self.owned = kept
+        except Exception as e:
+            db.rollback()
+            print(f"Shard Lease Error: {e}") # keep the current (locally expiring) leases, retry next round
+        finally: db.close()
+        return set(self.owned) - before, before - set(self.owned)
+
+    def release(self):
+        # Shutdown only, once the engine has no order in flight (RealTimeEngine.stop): the shards are free at once
+        L = models.EngineLease
+        self.owned = {}
+        db = self.session_factory()
+        try:
+            db.query(L).filter(L.owner == self.worker_id).update({L.owner: None, L.expires_at: db_now(db)}, synchronize_session=False)
+            db.query(models.EngineWorker).filter(models.EngineWorker.worker_id == self.worker_id).delete()
+            db.commit()
+        except Exception as e: print(f"Shard Lease Release Error: {e}")
+        finally: db.close()
@@ -0,0 +1,151 @@
+import json
+import copy
+import threading
+import numpy as np
+from collections import OrderedDict
+from .indicators import indicator_key
+from .timeframes import TF_SECONDS, DEFAULT_TIMEFRAME
+
+# Strategy JSON -> expression plan, compiled once and reused by the backtester (whole NumPy arrays)
+# and the live engine (last two bars only).
+#
+# The plan is a small DAG: leaf nodes (numbers, price fields, indicators) are shared by every
+# condition that references them, and identical comparisons / shifted series are evaluated once.
+# A leaf may name its own "timeframe"; leaves on the strategy's timeframe have tf None.
+
+EPS = 0.00000001
+PRICE_FIELDS = ['close', 'open', 'high', 'low', 'volume']
+
+class StrategyPlan:
+    def __init__(self, timeframe=DEFAULT_TIMEFRAME):
+        self.timeframe = timeframe
+        self.nodes = []       # (kind, key, name, params, tf), kind = number | price | indicator
+        self.node_ids = {}
+        self.conditions = []  # (operator, left node id, right node id), duplicates removed
+        self.has_event = False
+
+    @property
+    def indicators(self):
+        # (key, name, params, tf) of every distinct indicator the plan needs
+        return [(key, name, params, tf) for kind, key, name, params, tf in self.nodes if kind == 'indicator']
+
+    @property
+    def timeframes(self):
+        # Extra timeframes referenced besides the strategy's own
+        return sorted({tf for kind, key, name, params, tf in self.nodes if tf}, key=TF_SECONDS.get)
+
+    def add_node(self, item):
+        name, params = item.get('type'), item.get('params') or {}
+        tf = item.get('timeframe')
+        if tf == self.timeframe or tf not in TF_SECONDS: tf = None
+        if name == 'number': kind, key, tf = 'number', float(params.get('value', 0)), None
+        elif name in PRICE_FIELDS and tf is None: kind, key = 'price', name
+        else: kind, key = 'indicator', (indicator_key(name, params), tf) # a 1h close is an indicator too
+        if (kind, key) not in self.node_ids:
+            self.node_ids[(kind, key)] = len(self.nodes)
+            self.nodes.append((kind, key, name, params, tf))
+        return self.node_ids[(kind, key)]
+
+    def add_condition(self, cond):
+        op = cond.get('operator')
+        if not cond.get('left') or not cond.get('right'): return
+        entry = (op, self.add_node(cond['left']), self.add_node(cond['right']))
+        if entry in self.conditions: return
+        self.conditions.append(entry)
+        if op in ['CROSSES_ABOVE', 'CROSSES_BELOW']: self.has_event = True
+
+    def node_values(self, df, compute):
+        # compute(df, name, params, tf) -> indicator values aligned with df (at least the last two bars live)
+        vals = []
+        for kind, key, name, params, tf in self.nodes:
+            if kind == 'number': vals.append(key)
+            elif kind == 'price': vals.append(df[name].values.astype(np.float64, copy=False))
+            else: vals.append(np.asarray(compute(df, name, params, tf), dtype=np.float64))
+        return vals
+
+    def evaluate(self, df, compute):
+        # Vectorized: boolean entry signal for every bar of df
+        vals = self.node_values(df, compute)
+        shifted, compared = {}, {}
+
+        def value(i, prev):
+            if not prev or np.ndim(vals[i]) == 0: return vals[i]
+            if i not in shifted: shifted[i] = np.concatenate(([np.nan], vals[i][:-1]))
+            return shifted[i]
+
+        def cmp(kind, l, r, prev=False):
+            k = (kind, l, r, prev)
+            if k not in compared:
+                a, b = value(l, prev), value(r, prev)
+                if kind == 'gt': compared[k] = a > b + EPS
+                elif kind == 'lt': compared[k] = a < b - EPS
+                elif kind == 'le': compared[k] = a <= b + EPS
+                elif kind == 'ge': compared[k] = a >= b - EPS
+                else: compared[k] = np.abs(a - b) < EPS
+            return compared[k]
+
+        state, event = np.ones(len(df), dtype=bool), np.zeros(len(df), dtype=bool)
+        for op, l, r in self.conditions:
+            if op == 'CROSSES_ABOVE': event |= cmp('gt', l, r) & cmp('le', l, r, True)
+            elif op == 'CROSSES_BELOW': event |= cmp('lt', l, r) & cmp('ge', l, r, True)
+            elif op == 'GREATER_THAN': state &= cmp('gt', l, r)
+            elif op == 'LESS_THAN': state &= cmp('lt', l, r)
+            elif op == 'EQUALS': state &= cmp('eq', l, r)
+        return state & event if self.has_event else state
+
+    def evaluate_last(self, df, compute, trace=None):
+        # Live tick: only the last bar (and the one before it for crosses) as plain floats.
+        # trace: list that receives (left, right) of every condition, for the decision journal
+        vals = self.node_values(df, compute)
+        def at(i, k): return float(vals[i]) if np.ndim(vals[i]) == 0 else float(vals[i][k])
+
+        has_event, event_triggered, all_states_true = False, False, True
+        for op, l, r in self.conditions:
+            v_l, v_r = at(l, -1), at(r, -1)
+            if trace is not None: trace.append((v_l, v_r))
+            if op == 'CROSSES_ABOVE':
+                has_event = True
+                if (v_l > v_r + EPS) and (at(l, -2) <= at(r, -2) + EPS): event_triggered = True
+            elif op == 'CROSSES_BELOW':
+                has_event = True
+                if (v_l < v_r - EPS) and (at(l, -2) >= at(r, -2) - EPS): event_triggered = True
+            elif op == 'GREATER_THAN':
+                if not (v_l > v_r + EPS): all_states_true = False
+            elif op == 'LESS_THAN':
+                if not (v_l < v_r - EPS): all_states_true = False
+            elif op == 'EQUALS':
+                if not (abs(v_l - v_r) < EPS): all_states_true = False
+        return (event_triggered and all_states_true) if has_event else all_states_true
+
+def compile_logic(logic):
+    plan = StrategyPlan(logic.get('timeframe') or DEFAULT_TIMEFRAME)
+    for cond in logic.get('conditions', []): plan.add_condition(cond)
+    return plan
+
+class PlanCache:
+    def __init__(self, max_plans=4096):
+        self.max_plans = max_plans
+        self.plans = OrderedDict()  # canonical timeframe + conditions JSON -> plan, shared by identical strategies
+        self.by_strategy = {}       # strategy id -> (conditions it was compiled from, plan)
+        self.lock = threading.Lock() # the engine's event loop and the backtest pool threads share it
+
+    def get(self, logic):
+        key = json.dumps([logic.get('timeframe') or DEFAULT_TIMEFRAME, logic.get('conditions', [])], sort_keys=True, default=str)
+        with self.lock:
+            plan = self.plans.get(key)
+            if plan is None:
+                plan = self.plans[key] = compile_logic(logic)
+                if len(self.plans) > self.max_plans: self.plans.popitem(last=False)
+            else: self.plans.move_to_end(key)
+        return plan
+
+    def for_strategy(self, strat_id, logic):
+        # The row's conditions + timeframe are its version: editing them recompiles, state updates don't
+        version = (logic.get('timeframe') or DEFAULT_TIMEFRAME, logic.get('conditions', []))
+        hit = self.by_strategy.get(strat_id)
+        if hit and hit[0] == version: return hit[1]
+        plan = self.get(logic)
+        self.by_strategy[strat_id] = (copy.deepcopy(version), plan)
+        return plan
+
+plan_cache = PlanCache()
@@ -0,0 +1,84 @@
+import io
+import json
+import numpy as np
+from .backtester import backtester
+
+# Encoders for large backtest results. Trades arrive columnar (see run_simulation(columnar=True))
+# and are only turned into rows / batches one page at a time, nothing is truncated.
+TRADE_COLUMNS = ['entry_time', 'exit_time', 'entry_price', 'exit_price', 'qty', 'pnl', 'reason']
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "msgpack": "application/msgpack"
+}
+
+def to_builtin(obj):
+    # json.dump hook for the numpy columns
+    if isinstance(obj, np.ndarray): return obj.tolist()
+    if isinstance(obj, np.generic): return obj.item()
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+def trade_count(res):
+    return len(res['trades']['pnl'])
+
+def iter_ndjson(res, page_size=5000):
+    # Line 1: metrics (enough to render the summary), then trade pages, then the equity curve
+    yield json.dumps({"type": "metrics", **res['metrics']}, default=to_builtin) + "\n"
+    total = trade_count(res)
+    for page, start in enumerate(range(0, total, page_size)):
+        rows = backtester.trades_to_rows(res['trades'], start, start + page_size)
+        yield json.dumps({"type": "trades", "page": page, "rows": rows}) + "\n"
+    yield json.dumps({"type": "equity", "rows": res['equity']}) + "\n"
+
+def iter_arrow(res, page_size=50000):
+    import pyarrow as pa
+    # Metrics + equity ride along in the schema metadata, trades are record batches
+    schema = pa.schema([
+        ('entry_time', pa.timestamp('ms')), ('exit_time', pa.timestamp('ms')),
+        ('entry_price', pa.float64()), ('exit_price', pa.float64()), ('qty', pa.float64()),
+        ('pnl', pa.float64()), ('reason', pa.string())
+    ], metadata={"metrics": json.dumps(res['metrics'], default=to_builtin), "equity": json.dumps(res['equity'])})
+    sink = io.BytesIO()
+    writer = pa.ipc.new_stream(sink, schema)
+
+    def drain():
+        chunk = sink.getvalue()
+        sink.seek(0); sink.truncate(0)
+        return chunk
+
+    yield drain()
+    cols = {c: np.asarray(res['trades'][c]) for c in TRADE_COLUMNS}
+    for start in range(0, trade_count(res), page_size):
+        arrays = [pa.array(cols[c][start:start + page_size], type=schema.field(c).type) for c in TRADE_COLUMNS]
+        writer.write_batch(pa.record_batch(arrays, schema=schema))
+        yield drain()
+    writer.close()
+    yield drain()
+
+class EncodedBody:
+    # A json / msgpack body with the trades + equity encoded up front and the (small) metrics object
+    # added by finish(), so the encode that is actually sent can be timed and still report its time
+    # inside metrics.profile.
+    def __init__(self, res, fmt="json"):
+        self.fmt = "msgpack" if fmt == "msgpack" else "json"
+        if self.fmt == "msgpack":
+            import msgpack
+            self.packer = msgpack.Packer(default=to_builtin)
+            trades = {c: np.asarray(res['trades'][c]).tolist() for c in TRADE_COLUMNS}
+            self.rest = self.packer.pack("trades") + self.packer.pack(trades) + self.packer.pack("equity") + self.packer.pack(res['equity'])
+        else:
+            # Same separators / NaN policy as FastAPI's JSONResponse
+            self.rest = json.dumps({"trades": backtester.trades_to_rows(res['trades']), "equity": res['equity']},
+                                   ensure_ascii=False, allow_nan=False, separators=(',', ':'), default=to_builtin).encode()
+
+    @property
+    def media_type(self): return MEDIA_TYPES["msgpack"] if self.fmt == "msgpack" else "application/json"
+
+    def finish(self, metrics):
+        if self.fmt == "msgpack":
+            return self.packer.pack_map_header(3) + self.packer.pack("metrics") + self.packer.pack(metrics) + self.rest
+        head = json.dumps(metrics, ensure_ascii=False, allow_nan=False, separators=(',', ':'), default=to_builtin).encode()
+        return b'{"metrics":' + head + b',' + self.rest[1:]
+
+def encode_msgpack(res):
+    return EncodedBody(res, "msgpack").finish(res['metrics'])
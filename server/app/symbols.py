@@ -0,0 +1,113 @@
+import requests
+import urllib3
+
+urllib3.disable_warnings()
+
+# Every name one market goes by, resolved once instead of re-munged per tick / order / fetch:
+#   canonical   BTCUSDT        separators and exchange prefixes stripped
+#   tickers     ticker-endpoint keys to read the price under, preferred first
+#   order       market id orders and positions use (CoinDCX futures: B-BTC_USDT)
+#   candles     pair / symbol the candle endpoint takes
+#   vault_key   Parquet vault file stem (USD-quoted symbols share the USDT vault)
+# load() reads the brokers' markets endpoints; symbols it doesn't list (or every symbol, before
+# load or when the endpoints are down) get the same names derived by rule, memoised just the same.
+DELTA_PRODUCTS_URL = "https://api.india.delta.exchange/v2/products"
+COINDCX_MARKETS_URL = "https://api.coindcx.com/exchange/v1/markets_details"
+COINDCX_FUTURES_URL = "https://api.coindcx.com/exchange/v1/derivatives/futures/data/active_instruments"
+
+def canonical(symbol):
+    s = symbol.upper()
+    if s[:2] in ("B-", "I-"): s = s[2:]
+    return s.replace("/", "").replace("-", "").replace("_", "")
+
+def split_quote(sym):
+    for quote in ("USDT", "USD", "INR"):
+        if sym.endswith(quote) and len(sym) > len(quote): return sym[:-len(quote)], quote
+    return sym, ""
+
+def vault_key(sym):
+    base, quote = split_quote(sym)
+    return f"{base}USDT" if quote == "USD" else sym
+
+class Market:
+    __slots__ = ("broker", "canonical", "tickers", "order", "candles", "vault_key")
+
+    def __init__(self, broker, canonical, tickers, order, candles):
+        self.broker, self.canonical, self.tickers, self.order, self.candles = broker, canonical, tuple(tickers), order, candles
+        self.vault_key = vault_key(canonical)
+
+    def __repr__(self):
+        return f"Market({self.broker} {self.canonical}: tickers={self.tickers} order={self.order} candles={self.candles} vault={self.vault_key})"
+
+def derive(broker, symbol):
+    # Naming rules the engine applied per call before the registry existed
+    sym = canonical(symbol)
+    if broker == "COINDCX":
+        base, quote = split_quote(sym)
+        usdt = quote in ("USDT", "USD") # USD-quoted names trade as the USDT market
+        tickers = (f"B-{base}_USDT", f"{base}USDT", symbol) if usdt else (symbol, sym)
+        future = f"B-{base}_USDT" if quote == "USDT" else symbol
+        return Market(broker, sym, dict.fromkeys(tickers), future, future if quote == "USDT" else sym)
+    history = symbol.replace('-', '') if 'USDT' not in symbol else symbol
+    return Market(broker, sym, (symbol,), symbol, history)
+
+class SymbolRegistry:
+    def __init__(self):
+        self.known = {}   # (broker, canonical) -> Market, from the markets endpoints
+        self.markets = {} # (broker, symbol as stored / typed) -> Market, every lookup so far
+        self.loaded = set()
+
+    def get(self, broker, symbol):
+        market = self.markets.get((broker, symbol))
+        if market is None:
+            market = self.known.get((broker, canonical(symbol))) or derive(broker, symbol)
+            self.markets[(broker, symbol)] = market
+        return market
+
+    def symbols(self, broker):
+        return sorted(m.canonical for (b, _), m in self.known.items() if b == broker)
+
+    def load(self):
+        # Blocking (the engine runs it in a thread). A broker whose endpoints fail keeps derived names.
+        known = dict(self.known)
+        for broker, fetch in (("DELTA", self._delta_markets), ("COINDCX", self._coindcx_markets)):
+            try:
+                found = fetch()
+                known.update({(broker, m.canonical): m for m in found})
+                self.loaded.add(broker)
+                print(f"🗂️ Symbol registry: {len(found)} {broker} markets.")
+            except Exception as e: print(f"Symbol Registry Error ({broker}): {e}")
+        self.known, self.markets = known, {}
+
+    def _delta_markets(self):
+        resp = requests.get(DELTA_PRODUCTS_URL, verify=False, timeout=15)
+        resp.raise_for_status()
+        out = []
+        for p in resp.json().get("result", []):
+            sym = p.get("symbol")
+            if not sym or p.get("state", "live") != "live": continue
+            out.append(Market("DELTA", canonical(sym), (sym,), sym, sym))
+        return out
+
+    def _coindcx_markets(self):
+        resp = requests.get(COINDCX_MARKETS_URL, timeout=15)
+        resp.raise_for_status()
+        spot = {}
+        for m in resp.json():
+            name = m.get("coindcx_name") or m.get("symbol")
+            if name and m.get("status", "active") == "active": spot[canonical(name)] = (name, m.get("pair") or name)
+        futures = {}
+        try:
+            f = requests.get(COINDCX_FUTURES_URL, params={"margin_currency_short_name[]": "USDT"}, timeout=15)
+            if f.status_code == 200: futures = {canonical(p): p for p in f.json() if isinstance(p, str)}
+        except requests.RequestException: pass # spot only
+        out = []
+        for sym in set(spot) | set(futures):
+            future = futures.get(sym)
+            name, pair = spot.get(sym, (None, None))
+            tickers = [t for t in (future, name) if t]
+            order = future or derive("COINDCX", sym).order
+            out.append(Market("COINDCX", sym, tickers, order, pair or future))
+        return out
+
+symbol_registry = SymbolRegistry()
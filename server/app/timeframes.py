@@ -0,0 +1,119 @@
+import time
+import numpy as np
+import pandas as pd
+from collections import deque
+
+# Multi-timeframe support shared by the backtester and the live engine.
+#
+# A condition item may carry its own "timeframe" (e.g. a 1h EMA filter on a 5m strategy). Its values
+# are always those of the last bar of that timeframe that had CLOSED when the strategy's bar closed,
+# in backtests and live alike, so a higher-timeframe filter never sees the future.
+
+TF_SECONDS = {'1m': 60, '5m': 300, '15m': 900, '1h': 3600, '4h': 14400, '1d': 86400}
+TF_MS = {tf: sec * 1000 for tf, sec in TF_SECONDS.items()}
+DEFAULT_TIMEFRAME = '1h'
+OHLCV = ['open', 'high', 'low', 'close', 'volume']
+
+def frame_ms(df):
+    # Epoch-ms int64 bar open times of a candle frame (ccxt / compact int64, or datetime64)
+    if 'time' in df.columns: return pd.to_numeric(df['time']).values.astype(np.int64)
+    ts = df['timestamp'].values
+    return ts.astype(np.int64) if ts.dtype.kind in 'iuf' else ts.astype('datetime64[ms]').astype(np.int64)
+
+def resample(ts, df, span_ms):
+    # Bars of df (open times ts, sorted) rolled up into span_ms buckets. Vectorized, no groupby.
+    bucket = ts - ts % span_ms
+    starts = np.flatnonzero(np.concatenate(([True], bucket[1:] != bucket[:-1])))
+    ends = np.concatenate((starts[1:], [len(ts)])) - 1
+    cols = {c: df[c].values.astype(np.float64) for c in OHLCV}
+    return pd.DataFrame({
+        'timestamp': bucket[starts],
+        'open': cols['open'][starts],
+        'high': np.maximum.reduceat(cols['high'], starts),
+        'low': np.minimum.reduceat(cols['low'], starts),
+        'close': cols['close'][ends],
+        'volume': np.add.reduceat(cols['volume'], starts)
+    })
+
+def align(base_ts, base_span, tf_ts, tf_span):
+    # Index of the last tf bar that had closed when each base bar closed (-1: none yet).
+    # A bucket that is still filling closes after the base bar, so it is never picked.
+    return np.searchsorted(np.asarray(tf_ts, dtype=np.int64) + tf_span, np.asarray(base_ts, dtype=np.int64) + base_span, side='right') - 1
+
+def take(values, idx):
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0: return np.full(len(idx), np.nan)
+    return np.where(idx >= 0, values[np.clip(idx, 0, None)], np.nan)
+
+class CandleSeries:
+    # One timeframe of one symbol for the live engine: bounded closed bars + the bar in progress.
+    # Each tick is folded in O(1); the closed-bar arrays are rebuilt only when a bar closes.
+    def __init__(self, tf, capacity):
+        self.tf, self.span = tf, TF_MS[tf]
+        self.bars = deque(maxlen=capacity)  # [open_ms, open, high, low, close, volume]
+        self.current = None
+        self.version = 0                     # bumps whenever a bar closes
+        self.generation = 0                  # bumps on every (re)seed: the closed history was replaced
+        self.closed_total = 0                # bars closed since the last seed, including the seeded ones
+        self.seeded_at = 0.0
+        self.closed_cache = (None, None)     # (version, ndarray)
+
+    def seed(self, df):
+        ts = frame_ms(df)
+        rows = np.column_stack([ts.astype(np.float64)] + [df[c].values.astype(np.float64) for c in OHLCV]).tolist()
+        if not rows: return
+        self.bars.clear()
+        self.bars.extend(rows[:-1])
+        self.current = rows[-1]
+        self.version += 1
+        self.generation += 1
+        self.closed_total = len(self.bars)
+        self.seeded_at = time.time()
+
+    def fold(self, ts_ms, price, volume=0.0):
+        bucket = ts_ms - ts_ms % self.span
+        cur = self.current
+        if cur is None:
+            self.current = [bucket, price, price, price, price, volume]
+        elif bucket == cur[0]:
+            cur[2], cur[3], cur[4], cur[5] = max(cur[2], price), min(cur[3], price), price, cur[5] + volume
+        elif bucket > cur[0]:
+            self.bars.append(cur)
+            # Buckets without a single tick become flat bars so bar counts keep following the clock
+            missing = min(int((bucket - cur[0]) // self.span) - 1, self.bars.maxlen)
+            for k in range(missing, 0, -1):
+                self.bars.append([bucket - k * self.span, cur[4], cur[4], cur[4], cur[4], 0.0])
+            self.closed_total += 1 + missing
+            self.current = [bucket, price, price, price, price, volume]
+            self.version += 1
+        # Older bucket: a late tick for a bar that already closed, ignored
+
+    def closed(self):
+        version, arr = self.closed_cache
+        if version != self.version:
+            arr = np.array(self.bars, dtype=np.float64).reshape(-1, 6)
+            self.closed_cache = (self.version, arr)
+        return arr
+
+    def frame(self, with_current=True):
+        arr = self.closed()
+        if with_current and self.current is not None: arr = np.vstack([arr, np.array(self.current, dtype=np.float64)])
+        df = pd.DataFrame(arr[:, 1:], columns=OHLCV)
+        df.insert(0, 'timestamp', arr[:, 0].astype(np.int64))
+        return df
+
+class CandleBook:
+    # All timeframes the running strategies of one (broker, symbol) need, fed by the same tick stream
+    def __init__(self):
+        self.series = {}
+
+    def track(self, tf, capacity):
+        s = self.series.get(tf)
+        if s is None or s.bars.maxlen < capacity:
+            s = self.series[tf] = CandleSeries(tf, capacity)
+        return s
+
+    def on_tick(self, price, ts_ms=None, volume=0.0):
+        ts_ms = int(time.time() * 1000) if ts_ms is None else ts_ms
+        for s in self.series.values():
+            if s.current is not None: s.fold(ts_ms, price, volume)
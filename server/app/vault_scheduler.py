@@ -0,0 +1,234 @@
+import os
+import re
+import json
+import time
+import fcntl
+import asyncio
+import threading
+import fast_vault
+
+# Keeps vault files fresh in the background so backtests read from disk instead of downloading.
+#
+# Every process that serves backtests records demand per (source, symbol, tf). The records are merged
+# into VAULT_DIR/_demand.json and decay with a DEMAND_HALF_LIFE. Exactly one process per vault (an
+# API worker, or vault_worker.py) holds the scheduler lock and runs run(). It syncs any vault whose
+# newest candle is older than half of VAULT_MAX_STALE_MINUTES, most demanded first, with page
+# requests drawn from a shared VAULT_REQUESTS_PER_MINUTE budget. When nothing is due it verifies one
+# file at a time and refetches only its missing ranges (vault_integrity.py).
+#
+# VAULT_SCHEDULER=api (run it in the API), sidecar (vault_worker.py runs it), off (sync inside the
+# backtest request, the old behaviour).
+SCHEDULER_MODE = os.getenv("VAULT_SCHEDULER", "api")
+MAX_STALE_MINUTES = float(os.getenv("VAULT_MAX_STALE_MINUTES", "15"))
+REQUESTS_PER_MINUTE = float(os.getenv("VAULT_REQUESTS_PER_MINUTE", "240"))
+DEMAND_HALF_LIFE = 6 * 3600
+FLUSH_SECONDS = 30
+IDLE_SECONDS = 20
+REPAIR_HOURS = float(os.getenv("VAULT_REPAIR_HOURS", "24"))
+PROBE_SECONDS = 5 # how long `scheduled` trusts its last look at the scheduler lock
+VAULT_FILE = re.compile(r"^(.+)_(\d+[mhd])\.parquet$")
+
+class RequestBudget:
+    # Token bucket shared by the fetch threads of a sync: at most `per_minute` page requests a minute
+    def __init__(self, per_minute, burst=None):
+        self.rate = per_minute / 60
+        self.capacity = burst or max(1.0, per_minute / 6)
+        self.tokens, self.at = self.capacity, time.monotonic()
+        self.lock = threading.Lock()
+        self.spent = 0
+
+    def take(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.at) * self.rate)
+                self.at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    self.spent += 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+def decayed(score, at, now):
+    return score * 0.5 ** ((now - at) / DEMAND_HALF_LIFE)
+
+def entry_key(source, symbol, tf): return f"{source}|{symbol}|{tf}"
+
+async def pause(seconds, stop=None):
+    # Sleep, cut short when the stop event is set
+    if stop is None: return await asyncio.sleep(seconds)
+    try: await asyncio.wait_for(stop.wait(), seconds)
+    except asyncio.TimeoutError: pass
+
+class VaultScheduler:
+    def __init__(self, vault_dir=None, max_stale_minutes=MAX_STALE_MINUTES, requests_per_minute=REQUESTS_PER_MINUTE):
+        self.vault_dir = vault_dir or fast_vault.VAULT_DIR
+        self.demand_path = os.path.join(self.vault_dir, "_demand.json")
+        self.max_stale = max_stale_minutes * 60
+        self.budget = RequestBudget(requests_per_minute)
+        self.pending = {}  # entry key -> demand recorded here since the last flush
+        self.remotes = {}  # entry key -> candle API name, for venue vaults
+        self.lock = threading.Lock()
+        self.flushed_at = 0.0
+        self.attempted = {} # entry key -> time.time() of the last sync, so dead markets aren't hammered
+        self.lock_file = None
+        self.held_seen = (0.0, False) # (time.monotonic(), result) of the last scheduler-lock probe
+        self.is_running = False
+        self.synced = 0
+
+    @property
+    def scheduled(self):
+        # Whether some process keeps the vault fresh right now, so requests may skip the inline sync:
+        # someone holds the scheduler lock (VAULT_SCHEDULER only says who is supposed to)
+        if SCHEDULER_MODE == "off": return False
+        if self.lock_file is not None: return True
+        at, held = self.held_seen
+        if time.monotonic() - at > PROBE_SECONDS:
+            held = self.lock_held()
+            self.held_seen = (time.monotonic(), held)
+        return held
+
+    def lock_held(self):
+        # Probe: if we can take the lock nobody has it (give it straight back)
+        try:
+            with open(os.path.join(self.vault_dir, "_scheduler.lock"), "a") as f:
+                try: fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError: return True
+                fcntl.flock(f, fcntl.LOCK_UN)
+                return False
+        except OSError: return False
+
+    # --- demand (any process) ---
+    def note_demand(self, source, symbol, tf, remote=None, weight=1.0):
+        key = entry_key(source, symbol, tf)
+        with self.lock:
+            self.pending[key] = self.pending.get(key, 0.0) + weight
+            if remote: self.remotes[key] = remote
+        if time.time() - self.flushed_at > FLUSH_SECONDS: self.flush()
+
+    def _locked(self, fn):
+        with open(os.path.join(self.vault_dir, "_demand.lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try: return fn()
+            finally: fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def read_demand(self):
+        try:
+            with open(self.demand_path) as f: return json.load(f)
+        except (OSError, ValueError): return {}
+
+    def flush(self):
+        # Merge this process's demand into the shared file (blocking, cheap)
+        with self.lock:
+            pending, remotes, self.pending = self.pending, dict(self.remotes), {}
+        self.flushed_at = time.time()
+        if not pending: return
+
+        def merge():
+            now = time.time()
+            data = self.read_demand()
+            for key, weight in pending.items():
+                e = data.get(key, {"score": 0.0, "at": now})
+                e["score"] = decayed(e["score"], e["at"], now) + weight
+                e["at"] = now
+                if key in remotes: e["remote"] = remotes[key]
+                data[key] = e
+            tmp = f"{self.demand_path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f: json.dump(data, f)
+            os.replace(tmp, self.demand_path)
+        try: self._locked(merge)
+        except OSError as e: print(f"Vault Demand Flush Error: {e}")
+
+    # --- scheduling (the one process holding the lock) ---
+    def try_acquire(self):
+        if self.lock_file is not None: return True
+        f = open(os.path.join(self.vault_dir, "_scheduler.lock"), "w")
+        try: fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        self.lock_file = f # held until the process exits
+        return True
+
+    def candidates(self):
+        # Every vault file on disk plus every demanded one: [(score, age_seconds, source, symbol, tf, remote)]
+        now = time.time()
+        demand = self.read_demand()
+        found = {}
+        for source in fast_vault.VAULT_SOURCES:
+            folder = self.vault_dir if source == "BINANCE" else os.path.join(self.vault_dir, source.lower())
+            try: names = os.listdir(folder)
+            except OSError: continue
+            for name in names:
+                m = VAULT_FILE.match(name)
+                if m: found[entry_key(source, m.group(1), m.group(2))] = os.path.join(folder, name)
+        out = []
+        for key in set(found) | set(demand):
+            source, symbol, tf = key.split("|")
+            if source not in fast_vault.VAULT_SOURCES or tf not in fast_vault.TF_SECONDS: continue
+            e = demand.get(key, {})
+            remote = e.get("remote")
+            if source != "BINANCE" and not remote: continue # venue candle name only known from a demand record
+            path = found.get(key)
+            last_ms = fast_vault.last_timestamp_ms(path) if path else None
+            # Age of the next candle the file is missing (its newest one is still forming for a tf)
+            age = now - last_ms / 1000 - fast_vault.TF_SECONDS[tf] if last_ms else float("inf")
+            out.append((decayed(e.get("score", 0.0), e.get("at", now), now), age, source, symbol, tf, remote))
+        return out
+
+    def due(self):
+        # Sync at half the allowed staleness so nothing drifts past it between rounds; hottest first
+        now = time.time()
+        items = [c for c in self.candidates() if c[1] >= self.max_stale / 2
+                 and now - self.attempted.get(entry_key(*c[2:5]), 0) >= self.max_stale / 2]
+        return sorted(items, key=lambda c: (-c[0], -c[1]))
+
+    def sync_one(self, source, symbol, tf, remote=None):
+        now_ms = int(time.time() * 1000)
+        started = time.monotonic()
+        self.attempted[entry_key(source, symbol, tf)] = time.time()
+        fast_vault.sync_vault(symbol, tf, now_ms, now_ms, source, remote, budget=self.budget)
+        self.synced += 1
+        return time.monotonic() - started
+
+    def repair_next(self):
+        # With nothing due: one integrity pass (vault_integrity.py) on the hottest file not checked
+        # within VAULT_REPAIR_HOURS, refetching its gaps. None when every file is recent.
+        import vault_integrity
+        now = time.time()
+        for score, age, source, symbol, tf, remote in sorted(self.candidates(), key=lambda c: -c[0]):
+            path = fast_vault.vault_path(symbol, tf, source)
+            if not os.path.exists(path): continue
+            index = vault_integrity.load_index(path)
+            if index and now - index.get("checked_at", 0) < REPAIR_HOURS * 3600: continue
+            res = vault_integrity.repair(symbol, tf, source, remote, budget=self.budget)
+            if res.get("candles_filled"): print(f"🔧 Vault repair {source} {symbol} {tf}: {res['candles_filled']} candles filled, {res['gaps_left']} gaps left")
+            return res
+        return None
+
+    async def run(self, is_running=lambda: True, stop=None):
+        # stop: an asyncio.Event that also ends the idle waits, so a shutdown doesn't sit out a 60 s pause
+        self.is_running = True
+        announced = False
+        while is_running():
+            if not await asyncio.to_thread(self.try_acquire):
+                await pause(60, stop) # another process schedules; take over if it dies
+                continue
+            if not announced:
+                print(f"🗄️ Vault scheduler running (fresh within {self.max_stale / 60:g} min, {self.budget.rate * 60:g} requests/min).")
+                announced = True
+            try:
+                await asyncio.to_thread(self.flush)
+                due = await asyncio.to_thread(self.due)
+                for score, age, source, symbol, tf, remote in due:
+                    if not is_running(): break
+                    try: await asyncio.to_thread(self.sync_one, source, symbol, tf, remote)
+                    except Exception as e: print(f"Vault Sync Error ({source} {symbol} {tf}): {e}")
+                if not due and not await asyncio.to_thread(self.repair_next): await pause(IDLE_SECONDS, stop)
+            except Exception as e:
+                print(f"Vault Scheduler Error: {e}")
+                await pause(IDLE_SECONDS, stop)
+        self.is_running = False
+
+vault_scheduler = VaultScheduler()
@@ -0,0 +1,211 @@
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+import numpy as np
+import pandas as pd
+
+# Reproducible, offline benchmarks for the indicator kernels, the backtester, the Parquet vault and
+# the live condition check. Every run uses the same seeded synthetic market, so two JSON reports
+# taken on the same machine at different commits can be compared directly:
+#
+#   python benchmarks/run_benchmarks.py --sizes 10k,100k --out before.json
+#   python benchmarks/run_benchmarks.py --sizes 10k,100k --compare before.json
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+WORK_DIR = tempfile.mkdtemp(prefix="algo_bench_")
+os.environ.setdefault("VAULT_DIR", os.path.join(WORK_DIR, "vault")) # fast_vault creates it on import
+
+from app.indicators import INDICATOR_PARAMS, calculate_indicator
+from app.backtester import backtester
+import fast_vault
+
+SIZES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000, '5m': 5_000_000}
+SEED = 7
+LOGIC = {
+    'timeframe': '1m', 'side': 'BUY', 'sl': 1.5, 'tp': 3, 'tsl': 1, 'walletPct': 10, 'leverage': 1,
+    'conditions': [
+        {'left': {'type': 'ema', 'params': {'length': 9}}, 'operator': 'CROSSES_ABOVE', 'right': {'type': 'sma', 'params': {'length': 21}}},
+        {'left': {'type': 'rsi', 'params': {'length': 14}}, 'operator': 'GREATER_THAN', 'right': {'type': 'number', 'value': 50}},
+        {'left': {'type': 'close'}, 'operator': 'GREATER_THAN', 'right': {'type': 'supertrend', 'params': {'length': 10, 'multiplier': 3}}}
+    ]
+}
+
+def synthetic_ohlcv(rows, seed=SEED):
+    # 1m bars from 2021-01-01, in the vault's layout (datetime64 timestamps, float64 OHLCV)
+    rng = np.random.default_rng(seed)
+    close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.0008, rows)))
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    spread = np.abs(rng.normal(0, 0.0005, rows)) * close
+    return pd.DataFrame({
+        'timestamp': pd.date_range('2021-01-01', periods=rows, freq='1min'),
+        'open': open_, 'high': np.maximum(open_, close) + spread, 'low': np.minimum(open_, close) - spread,
+        'close': close, 'volume': rng.uniform(1, 500, rows)
+    })
+
+def repeats_for(rows, repeats):
+    return repeats if rows <= 100_000 else max(1, repeats // 3)
+
+def timed(fn, repeats, setup=None):
+    times = []
+    for _ in range(repeats):
+        arg = setup() if setup else None
+        start = time.perf_counter()
+        fn(arg) if setup else fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return {"best_ms": round(min(times), 3), "median_ms": round(float(np.median(times)), 3), "repeats": repeats}
+
+def bench_indicators(df, repeats, only=None):
+    out = []
+    for name, params in INDICATOR_PARAMS.items():
+        if only and name not in only: continue
+        out.append({"bench": "indicator", "name": name, **timed(lambda: calculate_indicator(df, name, params), repeats)})
+    return out
+
+def bench_backtester(df, repeats):
+    out = [
+        {"bench": "backtester", "name": "prepare_data", **timed(lambda d: backtester.prepare_data(d, LOGIC), repeats, setup=df.copy)},
+        {"bench": "backtester", "name": "run_simulation", **timed(lambda d: backtester.run_simulation(d, LOGIC, columnar=True), repeats, setup=df.copy)},
+    ]
+    # Audit stats on a fixed synthetic trade list: one 40-bar trade every 100 bars
+    rows = len(df)
+    rng = np.random.default_rng(SEED)
+    entry_idx = np.arange(0, rows - 50, 100, dtype=np.int64)
+    exit_idx = entry_idx + 40
+    pnl = rng.normal(0.5, 10, len(entry_idx))
+    equity = 1000 + np.cumsum(rng.normal(0, 0.5, rows))
+    t_ms = backtester.ts_ms(df)
+    stats = lambda: backtester.calculate_audit_stats(pnl, entry_idx, exit_idx, equity, t_ms, int((exit_idx - entry_idx).sum()))
+    out.append({"bench": "backtester", "name": "calculate_audit_stats", **timed(stats, repeats)})
+    return out
+
+def bench_vault(df, repeats):
+    path = os.path.join(WORK_DIR, f"bench_{len(df)}.parquet")
+    base = os.path.join(WORK_DIR, f"bench_{len(df)}_base.parquet")
+    cut = int(len(df) * 0.99)
+    df.iloc[:cut].to_parquet(base, engine='pyarrow')
+    # A sync's worth of new candles (appended to the file's tail), and a refetch overlapping stored candles (a rewrite)
+    fresh = df.iloc[cut:].reset_index(drop=True)
+    refetch = df.iloc[cut - 10:].reset_index(drop=True)
+    ts = backtester.ts_ms(df)
+    recent = (int(ts[int(len(df) * 0.9)]), int(ts[cut - 1]))
+
+    def restore():
+        shutil.copyfile(base, path)
+        if os.path.exists(fast_vault.tail_path(path)): os.remove(fast_vault.tail_path(path))
+    restore()
+    out = [
+        {"bench": "vault", "name": "load_full", **timed(lambda: fast_vault.load_window(path), repeats)},
+        {"bench": "vault", "name": "load_last_10pct", **timed(lambda: fast_vault.load_window(path, *recent), repeats)},
+        {"bench": "vault", "name": "append_1pct", **timed(lambda _: fast_vault.append_candles(path, fresh), repeats, setup=restore)},
+        {"bench": "vault", "name": "append_replace", **timed(lambda _: fast_vault.append_candles(path, refetch), repeats, setup=restore)},
+        {"bench": "vault", "name": "compact_frame", **timed(lambda: fast_vault.compact_frame(df), repeats)},
+    ]
+    restore()
+    for p in (path, base): os.remove(p)
+    return out
+
+def bench_live(repeats, strategies=200, bars=1000):
+    # Ticks per second of the engine's signal check: one shared frame per tick, `strategies` strategies on it
+    try:
+        from app.engine import engine, LiveFrame
+        from app.indicator_stream import SeriesStreams
+        from app.timeframes import CandleSeries
+        from app.strategy_plan import plan_cache
+    except ImportError as e:
+        return [{"bench": "live", "name": "check_conditions", "skipped": f"engine deps missing: {e}"}]
+    df = synthetic_ohlcv(bars)
+    df['timestamp'] = backtester.ts_ms(df)
+    rng = np.random.default_rng(SEED)
+    logics = []
+    for _ in range(strategies):
+        fast, slow = int(rng.integers(5, 30)), int(rng.integers(31, 120))
+        logic = json.loads(json.dumps(LOGIC))
+        logic['conditions'][0]['left']['params']['length'], logic['conditions'][0]['right']['params']['length'] = fast, slow
+        logics.append(logic)
+    plans = [plan_cache.get(l) for l in logics]
+
+    series = CandleSeries('1m', bars)
+    series.seed(df)
+    streams = SeriesStreams(series)
+
+    async def tick():
+        frame = LiveFrame(streams, '1m', lambda tf: None)
+        for logic, plan in zip(logics, plans): await engine.check_conditions("BENCH", "DELTA", float(df['close'].iloc[-1]), logic, plan, frame)
+
+    asyncio.run(tick()) # feeds the closed bars into the streams once, as the first live tick would
+    res = timed(lambda: asyncio.run(tick()), repeats)
+    res["evaluations_per_sec"] = round(strategies / (res["median_ms"] / 1000), 1)
+    return [{"bench": "live", "name": "check_conditions", "strategies": strategies, "bars": bars, **res}]
+
+def git_commit():
+    try: return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=SERVER_DIR, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError): return None
+
+def compare(report, baseline, threshold):
+    # Median time ratio per benchmark (> 1 is slower than the baseline); returns the regressions
+    old = {(r["bench"], r["name"], r.get("rows")): r for r in baseline["results"] if "median_ms" in r}
+    regressions = []
+    print(f"{'benchmark':<48}{'rows':>10}{'base ms':>12}{'now ms':>12}{'ratio':>8}")
+    for r in report["results"]:
+        prev = old.get((r["bench"], r["name"], r.get("rows")))
+        if prev is None or "median_ms" not in r: continue
+        ratio = r["median_ms"] / max(prev["median_ms"], 1e-9)
+        flag = "  <-- slower" if ratio > threshold else ""
+        if flag: regressions.append(r)
+        print(f"{r['bench'] + ':' + r['name']:<48}{str(r.get('rows', '')):>10}{prev['median_ms']:>12.3f}{r['median_ms']:>12.3f}{ratio:>8.2f}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks on a seeded synthetic market")
+    parser.add_argument("--sizes", default="10k,100k,1m,5m", help=f"comma list of {', '.join(SIZES)}")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--only", default="", help="comma list of suites: indicators,backtester,vault,live")
+    parser.add_argument("--indicators", default="", help="comma list of indicator names (default: all)")
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="baseline JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=1.2, help="ratio that counts as a regression")
+    args = parser.parse_args()
+
+    suites = set(filter(None, args.only.split(","))) or {"indicators", "backtester", "vault", "live"}
+    only = set(filter(None, args.indicators.split(",")))
+    results = []
+    try:
+        for label in filter(None, args.sizes.lower().split(",")):
+            rows = SIZES[label]
+            df = synthetic_ohlcv(rows)
+            reps = repeats_for(rows, args.repeats)
+            batch = []
+            if "indicators" in suites: batch += bench_indicators(df, reps, only)
+            if "backtester" in suites: batch += bench_backtester(df, reps)
+            if "vault" in suites: batch += bench_vault(df, reps)
+            for r in batch: r["rows"] = rows
+            results += batch
+            print(f"{label}: {len(batch)} benchmarks done", file=sys.stderr)
+        if "live" in suites: results += bench_live(args.repeats)
+    finally:
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+    report = {
+        "commit": git_commit(), "created": int(time.time()), "seed": SEED,
+        "python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__,
+        "machine": f"{platform.system()} {platform.machine()} ({os.cpu_count()} cpus)",
+        "results": results
+    }
+    text = json.dumps(report, indent=1)
+    if args.out:
+        with open(args.out, "w") as f: f.write(text)
+    elif not args.compare: print(text)
+    if args.compare:
+        with open(args.compare) as f: baseline = json.load(f)
+        if compare(report, baseline, args.threshold): sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,7 @@ async def diagnose_pair(broker, symbol, timeframe="1h"):
     df = None
     if broker.upper() == "COINDCX":
         df = await coindcx_manager.fetch_history(symbol, timeframe, limit=1000)
+        await coindcx_manager.close()
     else:
         df = await backtester.fetch_historical_data(symbol, timeframe, limit=1000)
         
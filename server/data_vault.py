@@ -3,6 +3,7 @@ import time
 import requests
 import pandas as pd
 from datetime import datetime
+from fast_vault import load_window, append_candles
 
 # Create the ultra-fast storage directory
 VAULT_DIR = "/app/vault"
@@ -55,7 +56,7 @@ def update_vault(symbol, interval, years=5):
     
     if os.path.exists(file_path):
         print(f"📂 Existing Vault file found. Loading into memory...")
-        df = pd.read_parquet(file_path)
+        df = load_window(file_path)
         last_timestamp = int(df['timestamp'].max().timestamp() * 1000)
         print(f"🔄 Syncing missing data from {df['timestamp'].max()} to NOW...")
         start_ms = last_timestamp + 1
@@ -81,12 +82,9 @@ def update_vault(symbol, interval, years=5):
         new_df = new_df[['timestamp', 'open', 'high', 'low', 'close', 'volume']]
         
         print("🧬 Stitching arrays and compressing to Parquet...")
-        # Stitch old data and new data, drop duplicates, sort chronologically
-        combined = pd.concat([df, new_df]).drop_duplicates(subset=['timestamp']).sort_values('timestamp').reset_index(drop=True)
-        
-        # Save to ultra-fast Parquet format
-        combined.to_parquet(file_path, engine='pyarrow')
-        print(f"✅ SUCCESS: Saved {len(combined):,} total rows to Vault -> {file_path}")
+        # Same locked, incremental write as the vault scheduler (new candles go to the file's tail)
+        append_candles(file_path, new_df)
+        print(f"✅ SUCCESS: Saved {len(new_df):,} new rows to Vault -> {file_path}")
     else:
         print("✅ No new data needed.")
     print("="*60)
@@ -0,0 +1,49 @@
+import os
+import signal
+import asyncio
+import argparse
+from aiohttp import web
+from app import models, database
+from app.engine import engine
+from app.metrics import metrics
+from app.sharding import ENGINE_SHARDS
+
+# Standalone live engine, for running the engine outside the API (ENGINE_IN_API=0) and across
+# several processes / hosts. Every process must use the same ENGINE_SHARDS; they split the shards
+# among themselves through leases in the database and take over the shards of one that dies.
+#
+#   ENGINE_SHARDS=8 python engine_worker.py            (start 1..8 of these)
+#   python engine_worker.py --max-shards 2             (cap what this process takes)
+#
+# The API's /system/metrics only sees the API process, so each worker serves its own engine's
+# metrics (tick lag, order path, shards owned, ...) at :ENGINE_METRICS_PORT/system/metrics (0 = off).
+ENGINE_METRICS_PORT = int(os.getenv("ENGINE_METRICS_PORT", "9100"))
+
+async def serve_metrics(port):
+    async def render(request):
+        return web.Response(body=metrics.render().encode(), headers={"Content-Type": "text/plain; version=0.0.4"})
+    app = web.Application()
+    app.router.add_get("/system/metrics", render)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "0.0.0.0", port).start()
+    return runner
+
+async def run(args):
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM): loop.add_signal_handler(sig, stop.set)
+    runner = await serve_metrics(args.metrics_port) if args.metrics_port else None
+    task = asyncio.create_task(engine.start(max_shards=args.max_shards))
+    await stop.wait()
+    print("🛑 Engine worker stopping, handing its shards back...")
+    await engine.stop() # other workers pick them up on their next sync
+    task.cancel()
+    if runner: await runner.cleanup()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the live trading engine as its own process")
+    parser.add_argument("--max-shards", type=int, default=None, help=f"most shards this process may own (of ENGINE_SHARDS={ENGINE_SHARDS})")
+    parser.add_argument("--metrics-port", type=int, default=ENGINE_METRICS_PORT, help="port of this worker's /system/metrics (0 = off)")
+    models.Base.metadata.create_all(bind=database.engine)
+    asyncio.run(run(parser.parse_args()))
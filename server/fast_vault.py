@@ -1,64 +1,265 @@
 import concurrent.futures
+import threading
+import fcntl
 import requests, time, os
+import numpy as np
 import pandas as pd
+import pyarrow.parquet as pq
 
-VAULT_DIR = "/app/vault"
+VAULT_DIR = os.getenv("VAULT_DIR", "/app/vault")
 os.makedirs(VAULT_DIR, exist_ok=True)
 
+# Compact frames: int64 epoch-ms timestamps + float32 OHLCV wherever float32 still holds the quoted tick size
+COMPACT_FRAMES = os.getenv("VAULT_COMPACT", "0") == "1"
+OHLCV = ['open', 'high', 'low', 'close', 'volume']
+
+def quoted_decimals(vals, max_dp=8):
+    # Smallest number of decimals that reproduces the (sampled) values exactly
+    sample = vals[::max(1, len(vals) // 10000)]
+    sample = sample[np.isfinite(sample)]
+    for dp in range(max_dp + 1):
+        if np.all(np.abs(np.round(sample, dp) - sample) < 0.5 * 10.0 ** -(dp + 2)): return dp
+    return None
+
+def compact_frame(df):
+    out = pd.DataFrame({'timestamp': df['timestamp'].values.astype('datetime64[ms]').astype(np.int64)})
+    decimals = {}
+    for col in OHLCV:
+        vals = df[col].values.astype(np.float64, copy=False)
+        dp = quoted_decimals(vals)
+        if dp is not None:
+            f32 = vals.astype(np.float32)
+            # float32 error must stay under half a tick, so rounding restores the exact quote
+            if np.all(np.abs(f32.astype(np.float64) - vals)[np.isfinite(vals)] < 0.5 * 10.0 ** -dp):
+                out[col], decimals[col] = f32, dp
+                continue
+        out[col] = vals
+    out.attrs['decimals'] = decimals
+    return out
+
+# Where backtest candles come from. BINANCE (futures) files keep the original VAULT_DIR/<symbol>_<tf>
+# layout; each venue gets the same files under VAULT_DIR/<venue>/ from its own candle API, so a
+# strategy is backtested on the prices of the broker it trades on (VAULT_VENUES=0: Binance only).
+VENUE_VAULTS = os.getenv("VAULT_VENUES", "1") == "1"
+VAULT_START_MS = 1609459200000 # January 1, 2021 00:00:00 UTC
+TF_SECONDS = {'1m': 60, '5m': 300, '15m': 900, '1h': 3600, '4h': 14400, '1d': 86400}
+DELTA_API = "https://api.india.delta.exchange"
+TAIL_ROWS = int(os.getenv("VAULT_TAIL_ROWS", "20000")) # appended candles kept beside a vault file before it is rewritten
+# Chunk fetchers return the page's [time_ms, o, h, l, c, v] rows, [] when the source answered with no
+# candles, and None when it never answered properly (transport / HTTP errors after their retries)
+NO_DATA_SECONDS = int(os.getenv("VAULT_NO_DATA_SECONDS", "86400")) # how long a market without candles isn't asked again
+
 def fetch_chunk(symbol, tf, start, end):
     url = "https://fapi.binance.com/fapi/v1/klines"
     params = {"symbol": symbol, "interval": tf, "startTime": start, "endTime": end, "limit": 1000}
     for _ in range(3):
         try:
             resp = requests.get(url, params=params, timeout=10)
-            if resp.status_code == 200: return resp.json()
+            if resp.status_code == 200: return [row[:6] for row in resp.json()]
+        except: time.sleep(0.5)
+    return None
+
+_delta = threading.local() # one ccxt client per pool thread, markets loaded once each
+
+def fetch_delta_chunk(symbol, tf, start, end):
+    import ccxt
+    exchange = getattr(_delta, "exchange", None)
+    if exchange is None:
+        exchange = _delta.exchange = ccxt.delta({'options': {'defaultType': 'future'}, 'urls': {'api': {'public': DELTA_API, 'private': DELTA_API}}})
+    limit = min(2000, (end - start) // (TF_SECONDS.get(tf, 3600) * 1000) + 1)
+    for _ in range(3):
+        try: return [row for row in exchange.fetch_ohlcv(symbol, timeframe=tf, since=start, limit=limit) if row[0] <= end]
+        except ccxt.BadSymbol: return [] # the venue answered: no such market
+        except Exception: time.sleep(0.5)
+    return None
+
+def fetch_coindcx_chunk(symbol, tf, start, end):
+    url = "https://public.coindcx.com/market_data/candles"
+    params = {"pair": symbol, "interval": tf, "startTime": start, "endTime": end, "limit": 1000}
+    for _ in range(3):
+        try:
+            resp = requests.get(url, params=params, timeout=10, verify=False)
+            if resp.status_code == 200:
+                return [[c['time'], c['open'], c['high'], c['low'], c['close'], c['volume']] for c in resp.json() if start <= c['time'] <= end]
         except: time.sleep(0.5)
-    return[]
+    return None
+
+# source -> (chunk fetcher, candles per request, parallel requests)
+VAULT_SOURCES = {
+    "BINANCE": (fetch_chunk, 1000, 15),
+    "DELTA": (fetch_delta_chunk, 2000, 4),
+    "COINDCX": (fetch_coindcx_chunk, 1000, 6),
+}
+
+def vault_source(broker):
+    b = (broker or "").upper()
+    return b if VENUE_VAULTS and b in VAULT_SOURCES else "BINANCE"
+
+def vault_path(symbol, tf, source="BINANCE"):
+    if source == "BINANCE": return f"{VAULT_DIR}/{symbol}_{tf}.parquet"
+    folder = f"{VAULT_DIR}/{source.lower()}"
+    os.makedirs(folder, exist_ok=True)
+    return f"{folder}/{symbol}_{tf}.parquet"
+
+def no_data_marker(file_path):
+    # Empty file next to a vault file that was never written: the source had no candles at all for it
+    return file_path + ".nodata"
+
+def known_empty(file_path):
+    try: return time.time() - os.path.getmtime(no_data_marker(file_path)) < NO_DATA_SECONDS
+    except OSError: return False
 
-def ensure_5_years_sync(symbol, tf):
-    file_path = f"{VAULT_DIR}/{symbol}_{tf}.parquet"
+def tail_path(file_path): return file_path[:-len(".parquet")] + ".tail.parquet"
+
+def read_candles(path, start_ms=None, end_ms=None, columns=None):
+    # One Parquet file, the date range pushed down into the reader
+    filters = []
+    if start_ms is not None: filters.append(('timestamp', '>=', pd.Timestamp(start_ms, unit='ms')))
+    if end_ms is not None: filters.append(('timestamp', '<=', pd.Timestamp(end_ms, unit='ms')))
+    return pd.read_parquet(path, engine='pyarrow', columns=columns, filters=filters or None)
+
+def merge_candles(df, new_df):
+    # Sorted union; on equal timestamps new_df wins (a refetched candle replaces one captured while still forming)
+    combined = pd.concat([df, new_df], ignore_index=True) if len(df.columns) else new_df
+    combined = combined.sort_values('timestamp', kind='stable').reset_index(drop=True)
+    ts = combined['timestamp'].values
+    if len(ts) > 1 and (ts[1:] == ts[:-1]).any():
+        combined = combined.drop_duplicates(subset=['timestamp'], keep='last').reset_index(drop=True)
+    return combined
+
+def load_window(file_path, start_ms=None, end_ms=None):
+    # Push the date range down into the Parquet reader instead of loading all 5 years, plus the
+    # candles appended since the last compaction (<stem>.tail.parquet, see append_candles)
+    df = read_candles(file_path, start_ms, end_ms).sort_values('timestamp').reset_index(drop=True)
+    try: tail = read_candles(tail_path(file_path), start_ms, end_ms)
+    except FileNotFoundError: return df
+    return merge_candles(df, tail) if not tail.empty else df
+
+def write_frame(df, path):
+    # Temp file renamed over the old one: readers see either version, never a half-written file
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        df.to_parquet(tmp, engine='pyarrow')
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp): os.remove(tmp)
+
+def epoch_ms(ts): return ts.values.astype('datetime64[ms]').astype(np.int64)
+
+def replaces_stored(file_path, new_df):
+    # Whether any new candle's timestamp is already in the main file. Newer than its last candle (every
+    # scheduled sync) is answered from the footer; a repair's gap fill reads only the overlapping timestamps.
+    new_ts = epoch_ms(new_df['timestamp'])
+    last = file_last_ms(file_path)
+    if last is None or new_ts.min() > last: return False
+    stored = read_candles(file_path, int(new_ts.min()), int(new_ts.max()), columns=['timestamp'])
+    return bool(np.isin(epoch_ms(stored['timestamp']), new_ts).any())
+
+def append_candles(file_path, new_df):
+    # Add freshly fetched candles to a vault file. They go to the small <stem>.tail.parquet next to it;
+    # the main file is only rewritten when a candle it stores is replaced, or to fold the tail in once
+    # it outgrows VAULT_TAIL_ROWS. Writers (scheduler, repair, inline syncs in other processes) hold the
+    # file's flock for the read-merge-write, so none drops another's candles.
+    if new_df.empty: return 0
+    with open(file_path + ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            if not os.path.exists(file_path):
+                write_frame(merge_candles(pd.DataFrame(), new_df), file_path)
+                return len(new_df)
+            tail = tail_path(file_path)
+            stored = pd.read_parquet(tail) if os.path.exists(tail) else pd.DataFrame()
+            merged = merge_candles(stored, new_df)
+            if len(merged) <= TAIL_ROWS and not replaces_stored(file_path, new_df):
+                write_frame(merged, tail)
+            else:
+                write_frame(merge_candles(pd.read_parquet(file_path), merged), file_path)
+                if os.path.exists(tail): os.remove(tail)
+        finally: fcntl.flock(lock, fcntl.LOCK_UN)
+    return len(new_df)
+
+def file_last_ms(path):
+    # Newest candle of one Parquet file from its footer statistics, without reading the column
+    try:
+        meta = pq.ParquetFile(path).metadata
+        col = meta.schema.to_arrow_schema().get_field_index('timestamp')
+        stats = [meta.row_group(i).column(col).statistics for i in range(meta.num_row_groups)]
+        if stats and all(s is not None and s.has_min_max for s in stats):
+            return int(pd.Timestamp(max(s.max for s in stats)).value // 1_000_000)
+    except Exception: pass
+    last_ts = pd.read_parquet(path, columns=['timestamp'])['timestamp'].max()
+    return int(last_ts.timestamp() * 1000) if pd.notna(last_ts) else None
+
+def last_timestamp_ms(file_path):
+    # Newest candle of a vault file, its tail included
+    last = file_last_ms(file_path)
+    if os.path.exists(tail_path(file_path)):
+        try: last = max(filter(None, (last, file_last_ms(tail_path(file_path)))), default=None)
+        except FileNotFoundError: pass # folded into the main file meanwhile
+    return last
+
+def fetch_pages(fetch, pages, workers, budget=None):
+    # Pages are independent (remote, tf, start, end) ranges, fetched concurrently.
+    # Returns (all rows in any order, the pages whose fetch failed).
+    if budget is not None: fetch = lambda *r, _fetch=fetch: (budget.take(), _fetch(*r))[1]
+    all_data, failed = [], []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(fetch, *r): r for r in pages}
+        for f in concurrent.futures.as_completed(futures):
+            try: res = f.result()
+            except Exception: res = None
+            if res is None: failed.append(futures[f])
+            else: all_data.extend(res)
+    return all_data, failed
+
+def candles_frame(rows):
+    # [time_ms, o, h, l, c, v] rows -> the vault's timestamp / OHLCV frame
+    new_df = pd.DataFrame(rows, columns=['time', 'open', 'high', 'low', 'close', 'volume'])
+    new_df['timestamp'] = pd.to_datetime(pd.to_numeric(new_df['time']), unit='ms')
+    new_df[OHLCV] = new_df[OHLCV].apply(pd.to_numeric, errors='coerce')
+    return new_df[['timestamp'] + OHLCV]
+
+def ensure_5_years_sync(symbol, tf, start_ms=None, end_ms=None, compact=COMPACT_FRAMES, source="BINANCE", remote=None, sync=True):
+    df = sync_vault(symbol, tf, start_ms, end_ms, source, remote, sync=sync)
+    return compact_frame(df) if compact and not df.empty else df
+
+def sync_vault(symbol, tf, start_ms=None, end_ms=None, source="BINANCE", remote=None, sync=True, budget=None):
+    # start_ms / end_ms only limit what is returned (and skip the sync for purely historical windows).
+    # symbol names the vault file; remote is what the source's candle API calls the market (default: symbol).
+    # sync=False serves an existing file as is (the vault scheduler keeps it fresh); budget.take() is
+    # called before every page request.
+    window = (start_ms, end_ms)
+    file_path = vault_path(symbol, tf, source)
+    if not sync and os.path.exists(file_path): return load_window(file_path, *window)
+    # A market the source has no candles for would otherwise be paged from 2021 again on every call
+    if not os.path.exists(file_path) and known_empty(file_path): return pd.DataFrame()
+    fetch, per_request, workers = VAULT_SOURCES[source]
     now_ms = int(time.time() * 1000)
-    # Exactly 5 years in milliseconds
-    # Exactly January 1, 2021 00:00:00 UTC
-    start_ms = 1609459200000
+    start_ms = VAULT_START_MS
     
-    df = pd.DataFrame()
     if os.path.exists(file_path):
-        df = pd.read_parquet(file_path)
-        if not df.empty:
-            last_ms = int(df['timestamp'].max().timestamp() * 1000)
+        last_ms = last_timestamp_ms(file_path)
+        if last_ms is not None:
             if last_ms > start_ms: start_ms = last_ms + 1
+        # History is already complete for a window that ends before the sync point
+        if window[1] is not None and window[1] < start_ms: return load_window(file_path, *window)
 
     if start_ms >= now_ms: 
-        return df
+        return load_window(file_path, *window) if os.path.exists(file_path) else pd.DataFrame()
 
-    chunk_size = 1000 * {'1m':60,'5m':300,'15m':900,'1h':3600,'4h':14400,'1d':86400}.get(tf, 3600) * 1000
+    chunk_size = per_request * TF_SECONDS.get(tf, 3600) * 1000
     ranges =[]
     curr = start_ms
     while curr < now_ms:
         nxt = min(curr + chunk_size, now_ms)
-        ranges.append((symbol, tf, int(curr), int(nxt)))
+        ranges.append((remote or symbol, tf, int(curr), int(nxt)))
         curr = nxt + 1
 
-    all_data =[]
-    # 15 concurrent threads for massive speed
-    with concurrent.futures.ThreadPoolExecutor(max_workers=15) as executor:
-        futures = [executor.submit(fetch_chunk, *r) for r in ranges]
-        for f in concurrent.futures.as_completed(futures):
-            res = f.result()
-            if res: all_data.extend(res)
-            
+    all_data, failed = fetch_pages(fetch, ranges, workers, budget)
     if all_data:
-        new_df = pd.DataFrame(all_data, columns=['time', 'open', 'high', 'low', 'close', 'volume', 'close_time', 'qav', 'num_trades', 'taker_base', 'taker_quote', 'ignore'])
-        new_df['timestamp'] = pd.to_datetime(new_df['time'], unit='ms')
-        new_df[['open', 'high', 'low', 'close', 'volume']] = new_df[['open', 'high', 'low', 'close', 'volume']].apply(pd.to_numeric, errors='coerce')
-        new_df = new_df[['timestamp', 'open', 'high', 'low', 'close', 'volume']]
-        
-        if not df.empty:
-            combined = pd.concat([df, new_df]).drop_duplicates(subset=['timestamp']).sort_values('timestamp').reset_index(drop=True)
-        else:
-            combined = new_df.sort_values('timestamp').reset_index(drop=True)
-            
-        combined.to_parquet(file_path, engine='pyarrow')
-        return combined
-    return df
+        append_candles(file_path, candles_frame(all_data))
+        if os.path.exists(no_data_marker(file_path)): os.remove(no_data_marker(file_path))
+        return load_window(file_path, *window)
+    if os.path.exists(file_path): return load_window(file_path, *window)
+    if not failed: open(no_data_marker(file_path), "w").close() # every page answered, all empty
+    return pd.DataFrame()
@@ -35,6 +35,7 @@ async def run_sweep():
 
     # Run all tests
     await asyncio.gather(*(check_pair(sym) for sym in symbols))
+    await coindcx_manager.close()
     
     # Save the healthy ones to a master Verified file
     with open('/app/coindcx_verified.json', 'w') as f:
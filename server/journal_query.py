@@ -0,0 +1,107 @@
+import os
+import sys
+import glob
+import argparse
+from datetime import datetime, timezone
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Scans the live engine's decision journal (app/decision_journal.py) through memory-mapped files.
+# Filters run on whole record batches (dictionary indices for broker / symbol / decision), so a
+# day of every strategy's evaluations scans in well under a second.
+#
+#   python journal_query.py --strategy 42 --since "2026-10-19 09:00" --until "2026-10-19 10:00"
+#   python journal_query.py --symbol BTCUSD --decision ENTRY --days 3
+#   python journal_query.py --summary
+
+JOURNAL_DIR = os.getenv("JOURNAL_DIR", "/app/journal")
+
+def journal_files(directory, days=None):
+    folders = sorted(d for d in os.listdir(directory) if os.path.isdir(os.path.join(directory, d))) if os.path.isdir(directory) else []
+    if days: folders = folders[-days:]
+    return [p for d in folders for p in sorted(glob.glob(os.path.join(directory, d, "*.arrows")))]
+
+def parse_time(text):
+    dt = datetime.fromisoformat(text)
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+def batches(path):
+    # Every complete batch; a file still being written (or cut short by a crash) ends at its last whole batch
+    with pa.memory_map(path) as source:
+        try: reader = pa.ipc.open_stream(source)
+        except pa.ArrowInvalid: return
+        while True:
+            try: yield reader.read_next_batch()
+            except StopIteration: return
+            except (pa.ArrowInvalid, OSError): return
+
+def equals(column, value):
+    # Compare dictionary indices instead of decoding the strings
+    idx = column.dictionary.index(value).as_py()
+    return pc.equal(column.indices, idx) if idx >= 0 else pa.array([False] * len(column))
+
+def select(batch, args, since, until):
+    mask = None
+    def both(m): return m if mask is None else pc.and_(mask, m)
+    if since is not None or until is not None:
+        lo, hi = pc.min_max(batch.column('ts')).values()
+        if (since is not None and hi.value < since) or (until is not None and lo.value > until): return None
+        if since is not None: mask = both(pc.greater_equal(batch.column('ts'), pa.scalar(since, pa.timestamp('ms'))))
+        if until is not None: mask = both(pc.less_equal(batch.column('ts'), pa.scalar(until, pa.timestamp('ms'))))
+    if args.strategy is not None: mask = both(pc.equal(batch.column('strategy_id'), args.strategy))
+    for name in ("broker", "symbol", "decision"):
+        value = getattr(args, name)
+        if value: mask = both(equals(batch.column(name), value))
+    if mask is None: return batch
+    out = batch.filter(mask)
+    return out if out.num_rows else None
+
+def fmt_row(row):
+    values = " ".join(f"{l:.6g}/{r:.6g}" for l, r in zip(row['lhs'] or [], row['rhs'] or []))
+    return f"{row['ts']:%Y-%m-%d %H:%M:%S.%f}"[:-3] + f"  #{row['strategy_id']:<6}{row['broker']:<9}{row['symbol']:<14}{row['price']:>14.6g}  {row['state']:<12}{row['decision']:<18}{values}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the live engine's decision journal")
+    parser.add_argument("--dir", default=JOURNAL_DIR)
+    parser.add_argument("--days", type=int, default=None, help="only the newest N days")
+    parser.add_argument("--since", help="ISO time, UTC unless it carries an offset")
+    parser.add_argument("--until")
+    parser.add_argument("--strategy", type=int)
+    parser.add_argument("--broker")
+    parser.add_argument("--symbol")
+    parser.add_argument("--decision", help="WAIT, ENTRY, NO_DATA, HOLD, BRACKET or EXIT:<reason>")
+    parser.add_argument("--summary", action="store_true", help="counts per strategy and decision instead of rows")
+    parser.add_argument("--limit", type=int, default=200, help="rows to print (0: all)")
+    args = parser.parse_args()
+
+    since = int(parse_time(args.since).timestamp() * 1000) if args.since else None
+    until = int(parse_time(args.until).timestamp() * 1000) if args.until else None
+    files = journal_files(args.dir, args.days)
+    if not files:
+        print(f"No journal files under {args.dir}")
+        sys.exit(1)
+
+    scanned = matched = 0
+    counts = {}
+    printed = 0
+    for path in files:
+        for batch in batches(path):
+            scanned += batch.num_rows
+            hit = select(batch, args, since, until)
+            if hit is None: continue
+            matched += hit.num_rows
+            if args.summary:
+                keys = zip(hit.column('strategy_id').to_pylist(), hit.column('decision').to_pylist())
+                for k in keys: counts[k] = counts.get(k, 0) + 1
+                continue
+            if args.limit and printed >= args.limit: continue
+            for row in hit.to_pylist()[:(args.limit - printed) if args.limit else None]:
+                print(fmt_row(row))
+                printed += 1
+
+    if args.summary:
+        for (sid, decision), n in sorted(counts.items()): print(f"#{sid:<8}{decision:<20}{n}")
+    print(f"— {matched} of {scanned} evaluations matched in {len(files)} files", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,30 @@
-﻿import asyncio
+﻿import os
+import asyncio
+import json
 import traceback
+import threading
 import requests
+from concurrent.futures import ThreadPoolExecutor
 import urllib3
 urllib3.disable_warnings()
 from fastapi import FastAPI, Depends, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 from sqlalchemy.orm import Session
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
-from app import models, database, schemas, crud
+from app import models, database, schemas, crud, streaming
 from app.engine import engine as trading_engine
-from app.backtester import backtester
+from app.backtester import backtester, to_ms
+from app.timeframes import TF_MS
+from app.result_cache import result_cache, vault_version
+from app.paper_ledger import paper_ledger, stored_snapshot
+from app.metrics import metrics
+from app.diagnostics import run_full_diagnostics
+from app.profiling import BacktestProfile, NULL_PROFILE
+from app.market_data import BoardReader
+from app.symbols import symbol_registry
+from app.vault_scheduler import vault_scheduler, SCHEDULER_MODE
 from app.brokers.coindcx import coindcx_manager
 import ccxt.async_support as ccxt
 
@@ -51,9 +64,21 @@ async def refresh_coindcx_symbols():
 async def lifespan(app: FastAPI):
     asyncio.create_task(refresh_delta_symbols())
     asyncio.create_task(refresh_coindcx_symbols())
-    asyncio.create_task(trading_engine.start())
+    # ENGINE_IN_API=0 when the live engine runs as separate engine_worker.py processes instead.
+    # Either way shard leases make sure each strategy is traded by exactly one process.
+    if os.getenv("ENGINE_IN_API", "1") == "1": asyncio.create_task(trading_engine.start())
+    # One API worker wins the scheduler lock and keeps the vault fresh (VAULT_SCHEDULER=sidecar: vault_worker.py does)
+    vault_task = asyncio.create_task(vault_scheduler.run()) if SCHEDULER_MODE == "api" else None
     yield
-    trading_engine.is_running = False
+    if vault_task: vault_task.cancel()
+    backtest_pool.shutdown(wait=False, cancel_futures=True)
+    await asyncio.to_thread(vault_scheduler.flush)
+    await trading_engine.stop() # drains trades in progress before handing the shards back
+    await coindcx_manager.close()
+
+# Backtests at once; the rest queue (backtests_queued). Each holds its candles + results in memory.
+BACKTEST_WORKERS = int(os.getenv("BACKTEST_WORKERS", "2"))
+backtest_pool = ThreadPoolExecutor(max_workers=BACKTEST_WORKERS, thread_name_prefix="backtest")
 
 models.Base.metadata.create_all(bind=database.engine)
 app = FastAPI(title="AlgoTradeIndia Engine", lifespan=lifespan)
@@ -104,12 +129,23 @@ def delete_strategy(id: int, db: Session = Depends(database.get_db)):
     strat = db.query(models.Strategy).filter(models.Strategy.id == id).first()
     if strat: db.delete(strat)
     db.commit()
+    paper_ledger.release(id) # the engine here, if any; engine_worker.py processes drop it on their next tick
     return {"status": "Deleted"}
 
 @app.get("/strategies/{id}/logs")
 def get_logs(id: int, db: Session = Depends(database.get_db)):
     return crud.get_strategy_logs(db, id)
 
+@app.get("/strategies/{id}/paper")
+def get_paper_ledger(id: int, db: Session = Depends(database.get_db)):
+    # Live view when this process trades the strategy; otherwise the account its engine worker persisted
+    # on the last fill, marked at the price board's latest ticker when there is one
+    live = paper_ledger.snapshot(id)
+    if live: return live
+    strat = db.query(models.Strategy).filter(models.Strategy.id == id).first()
+    hit = price_board.latest((strat.broker or "DELTA").upper(), [strat.symbol]).get(strat.symbol) if strat else None
+    return stored_snapshot(db, id, hit["price"] if hit else None) or {"error": "No paper activity yet"}
+
 @app.get("/strategy/{id}")
 def get_strategy_details(id: int, db: Session = Depends(database.get_db)):
     return db.query(models.Strategy).filter(models.Strategy.id == id).first()
@@ -123,7 +159,31 @@ def update_strategy(id: int, strat: schemas.StrategyInput, db: Session = Depends
     return {"status": "Updated", "id": id}
 
 @app.post("/strategy/backtest")
-async def run_backtest(strat: schemas.StrategyInput):
+async def run_backtest(strat: schemas.StrategyInput, format: str = "json", page_size: int = 5000, profile: bool = False, profile_dump: str = None):
+    # format: json (default, one body) | ndjson (metrics line, then trade pages) | arrow (IPC stream) | msgpack (columnar)
+    # profile=true: skip the result cache and return per-stage wall times in metrics.profile
+    # (profile_dump=cprofile | pyinstrument also writes a profiler report to disk)
+    return await on_backtest_pool(execute_backtest, strat, format, page_size, profile, profile_dump)
+
+async def on_backtest_pool(fn, *args):
+    # Vault sync, simulation and encoding block, so they run on the backtest pool and the event loop keeps
+    # serving the live engine and the other endpoints. backtests_queued: waiting for a worker.
+    lock, waiting = threading.Lock(), [True]
+    def dequeue():
+        with lock: was, waiting[0] = waiting[0], False
+        if was: metrics.add('backtests_queued', -1)
+    def job():
+        dequeue()
+        metrics.add('backtests_running', 1)
+        try: return fn(*args)
+        finally: metrics.add('backtests_running', -1)
+    metrics.add('backtests_queued', 1)
+    try: return await asyncio.get_running_loop().run_in_executor(backtest_pool, job)
+    finally: dequeue() # cancelled before a worker picked it up
+
+def execute_backtest(strat, format, page_size, profile, profile_dump):
+    # On a backtest pool thread: the profiler (cProfile / pyinstrument) follows the thread it starts on
+    prof = BacktestProfile(profile_dump, f"backtest_{strat.symbol.replace('/', '')}") if profile or profile_dump else NULL_PROFILE
     try:
         from app.backtester import backtester
         import os
@@ -134,36 +194,97 @@ async def run_backtest(strat: schemas.StrategyInput):
         tf = strat.logic.get('timeframe', '1h')
         
         # Standardize symbol
-        clean_symbol = strat.symbol.replace("/", "").replace("-", "").replace("_", "")
-        if clean_symbol.endswith('USD') and not clean_symbol.endswith('USDT'):
-            clean_symbol = clean_symbol[:-3] + 'USDT'
+        market = symbol_registry.get(strat.broker or "DELTA", strat.symbol)
+        clean_symbol = market.vault_key
             
-        from fast_vault import ensure_5_years_sync
+        from fast_vault import ensure_5_years_sync, vault_source
         
-        # 1. Fetch the FULL 5-Year Dataset from the Vault (No arbitrary candle limits)
-        df = ensure_5_years_sync(clean_symbol, tf)
+        # 1. Fetch [startDate - indicator warm-up, endDate] from the 5-Year Vault (whole vault if no dates),
+        #    the broker's own candles first, Binance futures when the venue has none for the window or
+        #    its history starts after startDate. If no source reaches back that far, the one that starts
+        #    earliest is used and metrics.data_warning says so.
+        #    While the vault scheduler keeps files fresh, only a never-seen market downloads inline.
+        start_ms, end_ms = backtester.data_window(strat.logic, tf)
+        wanted_ms = to_ms(strat.logic['startDate']) + TF_MS.get(tf, 3600000) if start_ms is not None else None
+        inline = not vault_scheduler.scheduled
+        best, data_warning = None, None
+        for source in dict.fromkeys((vault_source(strat.broker), "BINANCE")):
+            remote = market.candles if source != "BINANCE" else None
+            with metrics.span('vault_sync', timeframe=tf), prof.stage(f"vault_load:{tf}"): df = ensure_5_years_sync(clean_symbol, tf, start_ms, end_ms, source=source, remote=remote, sync=inline)
+            if df is None or df.empty: continue
+            first_ms = int(backtester.ts_ms(df)[0])
+            if best is None or first_ms < best[3]: best = (source, remote, df, first_ms)
+            if wanted_ms is None or first_ms <= wanted_ms: break
+        if best is not None:
+            source, remote, df, first_ms = best
+            if wanted_ms is not None and first_ms > wanted_ms:
+                data_warning = f"{source} candles for {strat.symbol} start {pd.Timestamp(first_ms, unit='ms'):%Y-%m-%d %H:%M}, after startDate {strat.logic['startDate']}"
+        vault_scheduler.note_demand(source, clean_symbol, tf, remote)
+        # Conditions on finer timeframes read their own vault over the same window (coarser ones are rolled up)
+        frames = {}
+        for ftf in backtester.vault_timeframes(strat.logic):
+            with metrics.span('vault_sync', timeframe=ftf), prof.stage(f"vault_load:{ftf}"): frames[ftf] = ensure_5_years_sync(clean_symbol, ftf, start_ms, end_ms, source=source, remote=remote, sync=inline)
+            vault_scheduler.note_demand(source, clean_symbol, ftf, remote)
         
 
             
         if df is None or df.empty: 
             return {"error": f"No market data found for {strat.symbol} in the selected date range."}
             
-        # 3. Process the Data (Whether it's 100 candles or 2.6 million candles)
-        res = backtester.run_simulation(df, strat.logic)
+        # 2. Serve identical payloads (same logic + same vault version of every timeframe read) from the result cache
+        cache_key = result_cache.make_key(f"{source}:{clean_symbol}", tf, strat.logic, vault_version(df, strat.logic, frames))
+        res = None if prof is not NULL_PROFILE else result_cache.get(cache_key)
+        if res is None:
+            # 3. Process the Data (Whether it's 100 candles or 2.6 million candles)
+            res = backtester.run_simulation(df, strat.logic, columnar=True, frames=frames, profile=prof)
+            
+            if isinstance(res, dict) and "error" in res:
+                return {"error": res["error"]}
+            res["metrics"]["data_source"] = source
+            if data_warning: res["metrics"]["data_warning"] = data_warning
+            result_cache.put(cache_key, res)
         
-        if isinstance(res, dict) and "error" in res:
-            return {"error": res["error"]}
-        return res
+        # 4. Encode. Trades stay columnar until the chosen encoder pages through them.
+        fmt = format.lower()
+        if fmt in ("ndjson", "arrow"):
+            # Streamed formats encode page by page after the response starts, outside the profile
+            if prof is not NULL_PROFILE: res["metrics"] = {**res["metrics"], "profile": prof.report()}
+            pages = streaming.iter_ndjson(res, max(1, page_size)) if fmt == "ndjson" else streaming.iter_arrow(res)
+            return StreamingResponse(pages, media_type=streaming.MEDIA_TYPES[fmt])
+        # json / msgpack: the body sent is the one timed, encoded here on the pool thread
+        with prof.stage("serialization"): body = streaming.EncodedBody(res, fmt)
+        if prof is not NULL_PROFILE: res["metrics"] = {**res["metrics"], "profile": prof.report()}
+        return Response(body.finish(res["metrics"]), media_type=body.media_type)
         
     except Exception as e:
         import traceback
         print(traceback.format_exc())
         return {"error": f"Engine Crash: {str(e)}"}
+    finally:
+        if prof is not NULL_PROFILE: prof.report() # never leave a profiler running on an early return
+
+@app.get("/system/metrics")
+async def get_system_metrics():
+    # Prometheus text exposition, cheap enough to scrape every few seconds (no exchange / DB pings).
+    # Covers this process only: requests, backtests and, with ENGINE_IN_API=1, its live engine. Each
+    # engine_worker.py serves its own engine's metrics on ENGINE_METRICS_PORT; scrape every one of them.
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/system/diagnostics")
 async def get_system_diagnostics():
+    # On-demand connectivity pings + a snapshot of the metrics registry
     return await run_full_diagnostics()
 
+price_board = BoardReader()
+
+@app.get("/data/prices")
+async def get_prices(broker: str = "DELTA", symbols: str = "BTCUSD"):
+    # Latest tickers from the shared price board (market_data_worker.py): no exchange call per request
+    b = broker.upper()
+    wanted = [s for s in symbols.split(",") if s]
+    prices = price_board.latest(b, wanted)
+    return {"broker": b, "prices": prices, "updated": price_board.updated.get(b), "missing": [s for s in wanted if s not in prices]}
+
 @app.get("/data/leverage")
 async def get_leverage(broker: str = "DELTA", symbol: str = "BTCUSDT"):
     b = broker.upper()
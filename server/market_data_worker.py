@@ -0,0 +1,29 @@
+import signal
+import asyncio
+from app.price_board import PriceBoard, BOARD_NAME, BOARD_SLOTS
+from app.market_data import run_publisher, POLL_SECONDS
+
+# The single market-data process: polls each broker's ticker endpoint once and publishes every
+# price to the shared-memory price board, so engine workers and the API read prices in place
+# instead of each polling the exchanges. Run one per host, next to the engine workers:
+#
+#   python market_data_worker.py
+#
+# Containers must share /dev/shm with it (e.g. ipc: host, or ipc: "service:market-data").
+# Without a fresh board the engines fall back to polling on their own.
+
+async def run():
+    board = PriceBoard.create()
+    print(f"🧮 Price board '{BOARD_NAME}' ready ({BOARD_SLOTS} slots).")
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM): loop.add_signal_handler(sig, stop.set)
+    tasks = [asyncio.create_task(run_publisher(board, broker, lambda: not stop.is_set())) for broker in POLL_SECONDS]
+    await stop.wait()
+    print("🛑 Market data stopping, engines fall back to their own polling.")
+    for t in tasks: t.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    board.close()
+
+if __name__ == "__main__":
+    asyncio.run(run())
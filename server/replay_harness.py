@@ -0,0 +1,238 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import shutil
+import resource
+import tempfile
+import numpy as np
+import pandas as pd
+
+# Offline load test of the live engine: replays recorded, vault or synthetic ticks through
+# RealTimeEngine.execute_trade against a throwaway SQLite database full of generated strategies.
+# History requests are answered from the replay data and LIVE orders go to an in-process mock
+# broker, so nothing leaves the machine.
+#
+#   python replay_harness.py --strategies 2000 --speed 0
+#   python replay_harness.py --vault /app/vault/BTCUSDT_1m.parquet --symbol BTCUSD --speed 100
+#   python replay_harness.py --ticks recorded.csv --speed 1      (columns: ts_ms,symbol,price[,volume])
+#
+# --speed is a multiple of real time; 0 replays as fast as the engine can go.
+
+WORK_DIR = tempfile.mkdtemp(prefix="algo_replay_")
+os.environ["DATABASE_URL"] = f"sqlite:///{WORK_DIR}/replay.db" # before the app modules create their engine
+
+from app import models, database, security
+from app.engine import RealTimeEngine
+from app.timeframes import TF_MS, resample
+from app.paper_ledger import paper_ledger
+from app.metrics import metrics
+
+TEMPLATES = ('ema_cross', 'rsi', 'supertrend')
+
+def pct(values, q):
+    return round(float(np.percentile(values, q)), 3) if len(values) else None
+
+def rss_mb():
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1) # peak RSS, KB on Linux
+
+class ReplayMarket:
+    # Tick tape per symbol (ts_ms, price, volume), also the source of every history request
+    def __init__(self):
+        self.tapes = {}
+
+    def add_bars(self, symbol, df, span_ms):
+        # Four ticks per bar: open, the nearer extreme, the other extreme, close
+        ts = df['timestamp'].values
+        ts = ts.astype(np.int64) if ts.dtype.kind in 'iu' else ts.astype('datetime64[ms]').astype(np.int64)
+        o, h, l, c, v = (df[k].values.astype(np.float64) for k in ['open', 'high', 'low', 'close', 'volume'])
+        up = c >= o
+        prices = np.column_stack([o, np.where(up, l, h), np.where(up, h, l), c]).ravel()
+        times = (ts[:, None] + np.arange(4) * (span_ms // 4)).ravel()
+        self.tapes[symbol] = (times, prices, np.repeat(v / 4, 4))
+
+    def add_ticks(self, symbol, ts_ms, prices, volumes=None):
+        order = np.argsort(ts_ms, kind='stable')
+        vols = np.zeros(len(order)) if volumes is None else np.asarray(volumes, dtype=np.float64)[order]
+        self.tapes[symbol] = (np.asarray(ts_ms, dtype=np.int64)[order], np.asarray(prices, dtype=np.float64)[order], vols)
+
+    def history(self, symbol, timeframe, limit, now_ms):
+        tape = self.tapes.get(symbol)
+        if tape is None or timeframe not in TF_MS: return pd.DataFrame()
+        times, prices, vols = tape
+        span = TF_MS[timeframe]
+        lo = int(np.searchsorted(times, now_ms - now_ms % span - limit * span, side='left'))
+        hi = int(np.searchsorted(times, now_ms, side='right'))
+        if hi <= lo: return pd.DataFrame()
+        p = prices[lo:hi]
+        ticks = pd.DataFrame({'open': p, 'high': p, 'low': p, 'close': p, 'volume': vols[lo:hi]})
+        return resample(times[lo:hi], ticks, span).tail(limit).reset_index(drop=True)
+
+    def merged(self):
+        # Every tape interleaved in time order: (ts_ms, symbol index, price), plus the symbol names
+        names = sorted(self.tapes)
+        ts = np.concatenate([self.tapes[n][0] for n in names])
+        sym = np.concatenate([np.full(len(self.tapes[n][0]), i) for i, n in enumerate(names)])
+        px = np.concatenate([self.tapes[n][1] for n in names])
+        order = np.argsort(ts, kind='stable')
+        return ts[order], sym[order], px[order], names
+
+class MockBroker:
+    # Stands in for the Delta / CoinDCX REST APIs: fixed balance, every market order accepted
+    def __init__(self, balance=10000.0, latency_ms=0.0):
+        self.balance, self.latency = balance, latency_ms / 1000
+        self.orders = []
+
+    async def submit(self, broker, symbol, side, qty, bracket=None):
+        if self.latency: await asyncio.sleep(self.latency)
+        self.orders.append((broker, symbol, side, qty, bool(bracket)))
+        return f"mock-{len(self.orders)}", None
+
+class ReplayEngine(RealTimeEngine):
+    def __init__(self, market, broker):
+        super().__init__()
+        self.market, self.broker, self.clock_ms = market, broker, 0
+        self.now = lambda: self.clock_ms / 1000
+
+    async def fetch_history(self, symbol, broker="DELTA", timeframe='1m', limit=100):
+        return self.market.history(symbol, timeframe, limit, self.clock_ms)
+
+    async def get_balance(self, broker, api_key_enc, secret_enc, symbol=""):
+        return self.broker.balance
+
+    async def submit_order(self, broker, symbol, side, qty, api_key, secret, bracket=None):
+        return await self.broker.submit(broker, symbol, side, qty, bracket)
+
+def synthetic_bars(minutes, seed):
+    rng = np.random.default_rng(seed)
+    close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.0008, minutes)))
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    spread = np.abs(rng.normal(0, 0.0005, minutes)) * close
+    return pd.DataFrame({
+        'timestamp': 1704067200000 + np.arange(minutes, dtype=np.int64) * 60000, # 2024-01-01
+        'open': open_, 'high': np.maximum(open_, close) + spread, 'low': np.minimum(open_, close) - spread,
+        'close': close, 'volume': rng.uniform(1, 500, minutes)
+    })
+
+def make_logic(rng, live):
+    kind = TEMPLATES[int(rng.integers(len(TEMPLATES)))]
+    if kind == 'ema_cross':
+        conditions = [{'left': {'type': 'ema', 'params': {'length': int(rng.integers(5, 30))}}, 'operator': 'CROSSES_ABOVE',
+                       'right': {'type': 'sma', 'params': {'length': int(rng.integers(31, 120))}}}]
+    elif kind == 'rsi':
+        conditions = [{'left': {'type': 'rsi', 'params': {'length': int(rng.integers(7, 28))}}, 'operator': 'LESS_THAN',
+                       'right': {'type': 'number', 'value': int(rng.integers(25, 45))}}]
+    else:
+        conditions = [{'left': {'type': 'close'}, 'operator': 'CROSSES_ABOVE',
+                       'right': {'type': 'supertrend', 'params': {'length': int(rng.integers(7, 21)), 'multiplier': 3}}}]
+    return {
+        'timeframe': str(rng.choice(['1m', '5m', '15m'])), 'side': str(rng.choice(['BUY', 'SELL'])),
+        'sl': round(float(rng.uniform(0.2, 2)), 2), 'tp': round(float(rng.uniform(0.4, 4)), 2), 'tsl': float(rng.choice([0, 0, 0.5])),
+        'walletPct': 10, 'leverage': 1, 'tradeMode': 'LIVE' if live else 'PAPER', 'conditions': conditions
+    }
+
+def seed_database(symbols, broker, strategies, live_fraction, seed):
+    models.Base.metadata.create_all(bind=database.engine)
+    rng = np.random.default_rng(seed)
+    db = database.SessionLocal()
+    key, secret = security.encrypt_value("mock-key"), security.encrypt_value("mock-secret")
+    users = []
+    for u in range(max(1, strategies // 10)):
+        user = models.User(email=f"replay{u}@example.com", full_name="Replay", picture="")
+        if broker == "COINDCX": user.coindcx_api_key, user.coindcx_api_secret = key, secret
+        else: user.delta_api_key, user.delta_api_secret = key, secret
+        users.append(user)
+    db.add_all(users)
+    db.flush()
+    db.add_all([models.Strategy(name=f"replay-{k}", symbol=symbols[k % len(symbols)], broker=broker, is_running=True,
+                                logic_configuration=make_logic(rng, rng.random() < live_fraction), owner_id=users[k % len(users)].id)
+                for k in range(strategies)])
+    db.commit()
+    db.close()
+
+async def replay(engine, market, broker, speed, start_ms):
+    ts, sym, px, names = market.merged()
+    first = int(np.searchsorted(ts, start_ms, side='left'))
+    busy, lag = [], []
+    wall0, t0 = time.perf_counter(), ts[first] if first < len(ts) else 0
+    for k in range(first, len(ts)):
+        if speed > 0:
+            due = wall0 + (ts[k] - t0) / 1000 / speed
+            delay = due - time.perf_counter()
+            if delay > 0: await asyncio.sleep(delay)
+            lag.append((time.perf_counter() - due) * 1000)
+        engine.clock_ms = int(ts[k])
+        started = time.perf_counter()
+        db = database.SessionLocal()
+        try: await engine.execute_trade(db, names[sym[k]], float(px[k]), broker, started)
+        finally: db.close()
+        busy.append((time.perf_counter() - started) * 1000)
+    return len(ts) - first, time.perf_counter() - wall0, busy, lag
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay ticks through the live engine against a mock broker")
+    parser.add_argument("--strategies", type=int, default=500)
+    parser.add_argument("--symbols", default="BTCUSD,ETHUSD", help="synthetic tapes (ignored with --vault / --ticks)")
+    parser.add_argument("--broker", default="DELTA", choices=["DELTA", "COINDCX"])
+    parser.add_argument("--vault", help="vault Parquet file to replay (bars -> 4 ticks each)")
+    parser.add_argument("--vault-tf", default="1m", choices=list(TF_MS))
+    parser.add_argument("--symbol", default="BTCUSD", help="symbol name for the --vault tape")
+    parser.add_argument("--ticks", help="recorded ticks CSV: ts_ms,symbol,price[,volume]")
+    parser.add_argument("--minutes", type=int, default=240, help="minutes of market to replay")
+    parser.add_argument("--warmup-hours", type=float, default=72, help="tape before the replay start that serves history requests")
+    parser.add_argument("--speed", type=float, default=0, help="1 = real time, 100 = 100x, 0 = as fast as possible")
+    parser.add_argument("--live-fraction", type=float, default=0.2, help="share of LIVE strategies (orders go to the mock broker)")
+    parser.add_argument("--broker-latency-ms", type=float, default=0)
+    parser.add_argument("--seed", type=int, default=11)
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    market = ReplayMarket()
+    warmup_ms = int(args.warmup_hours * 3600000)
+    if args.ticks:
+        rec = pd.read_csv(args.ticks)
+        for name, g in rec.groupby('symbol'): market.add_ticks(str(name), g['ts_ms'].values, g['price'].values, g['volume'].values if 'volume' in g else None)
+    elif args.vault:
+        from fast_vault import load_window
+        market.add_bars(args.symbol, load_window(args.vault), TF_MS[args.vault_tf])
+    else:
+        for i, name in enumerate(filter(None, args.symbols.split(","))):
+            market.add_bars(name, synthetic_bars(int(warmup_ms / 60000) + args.minutes, args.seed + i), TF_MS['1m'])
+    ends = [tape[0][-1] for tape in market.tapes.values()]
+    starts = [tape[0][0] for tape in market.tapes.values()]
+    # Replay the last --minutes of the tape, everything before it is history
+    start_ms = max(min(ends) - args.minutes * 60000, min(starts) + min(warmup_ms, min(ends) - min(starts)))
+
+    try:
+        seed_database(sorted(market.tapes), args.broker, args.strategies, args.live_fraction, args.seed)
+        broker = MockBroker(latency_ms=args.broker_latency_ms)
+        engine = ReplayEngine(market, broker)
+        rss_before = rss_mb()
+        ticks, wall, busy, lag = asyncio.run(replay(engine, market, args.broker, args.speed, start_ms))
+    finally:
+        database.engine.dispose()
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+    evaluated = sum(m.total for m in metrics.meters.get('strategies_evaluated', {}).values())
+    report = {
+        "strategies": args.strategies, "symbols": sorted(market.tapes), "speed": args.speed or "max",
+        "ticks": ticks, "wall_seconds": round(wall, 3),
+        "ticks_per_sec": round(ticks / wall, 1) if wall else None,
+        "strategy_evaluations": evaluated,
+        "strategies_per_sec": round(evaluated / wall, 1) if wall else None,
+        "tick_ms": {"p50": pct(busy, 50), "p99": pct(busy, 99), "max": pct(busy, 100)},
+        "tick_lag_ms": {"p50": pct(lag, 50), "p99": pct(lag, 99), "max": pct(lag, 100)} if lag else None,
+        "orders": {"mock_broker": len(broker.orders), "paper_fills": len(paper_ledger.fills)},
+        "memory_mb": {"peak_rss_before_replay": rss_before, "peak_rss": rss_mb()},
+        "engine_state": {"candle_books": len(engine.books), "indicator_streams": len(engine.streams), "paper_accounts": len(paper_ledger.rows)},
+        "order_path": metrics.snapshot().get("order_path", {})
+    }
+    text = json.dumps(report, indent=1)
+    if args.out:
+        with open(args.out, "w") as f: f.write(text)
+    else: print(text)
+
+if __name__ == "__main__":
+    main()
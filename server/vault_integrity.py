@@ -0,0 +1,196 @@
+import os
+import sys
+import json
+import time
+import zlib
+import argparse
+import numpy as np
+import pandas as pd
+import fast_vault
+
+# Sidecar integrity index per vault file (<symbol>_<tf>.index.json next to the Parquet file):
+#   days    per UTC day: expected vs actual candle count and a CRC32 of the day's rows
+#   gaps    missing ranges [start_ms, end_ms]; "confirmed" once the source answered a refetch with no
+#           candles (exchange outage, or before the listing), so repair doesn't ask again. A refetch
+#           that failed (network / HTTP errors) confirms nothing
+# A rebuilt index is compared with the previous one: a day whose count is unchanged but whose CRC
+# changed was rewritten underneath us. repair() refetches only the unconfirmed gap ranges.
+#
+#   python vault_integrity.py                       (index + report every vault file)
+#   python vault_integrity.py --repair BTCUSDT_1m   (also refetch its gaps)
+INDEX_VERSION = 2
+DAY_MS = 86400000
+
+def index_path(file_path): return file_path[:-len(".parquet")] + ".index.json"
+
+def load_index(file_path):
+    try:
+        with open(index_path(file_path)) as f: return json.load(f)
+    except (OSError, ValueError): return None
+
+def save_index(file_path, index):
+    tmp = index_path(file_path) + ".tmp"
+    with open(tmp, "w") as f: json.dump(index, f)
+    os.replace(tmp, index_path(file_path))
+
+def file_state(file_path):
+    # Size and mtime of the vault file and of its appended tail (None without one)
+    state = {}
+    for key, path in (("", file_path), ("tail_", fast_vault.tail_path(file_path))):
+        try: stat = os.stat(path)
+        except FileNotFoundError: stat = None
+        state[key + "size"], state[key + "mtime"] = (stat.st_size, stat.st_mtime) if stat else (None, None)
+    return state
+
+def find_gaps(ts, step, head_ms=fast_vault.VAULT_START_MS):
+    # [start, end] of every missing candle run, plus the head before the first candle
+    gaps = []
+    if len(ts) == 0: return gaps
+    if ts[0] > head_ms: gaps.append([int(head_ms), int(ts[0] - step)])
+    jumps = np.nonzero(np.diff(ts) > step)[0]
+    for i in jumps: gaps.append([int(ts[i] + step), int(ts[i + 1] - step)])
+    return gaps
+
+def build_index(file_path, tf, previous=None):
+    step = fast_vault.TF_SECONDS[tf] * 1000
+    df = fast_vault.load_window(file_path)
+    ts = df['timestamp'].values.astype('datetime64[ms]').astype(np.int64)
+    order = np.argsort(ts, kind='stable')
+    ts = ts[order]
+    rows = np.empty(len(ts), dtype=[('t', '<i8')] + [(c, '<f8') for c in fast_vault.OHLCV])
+    rows['t'] = ts
+    for c in fast_vault.OHLCV: rows[c] = df[c].values.astype(np.float64)[order]
+
+    days = {}
+    if len(ts):
+        day_ids = ts // DAY_MS
+        bounds = np.flatnonzero(np.diff(day_ids)) + 1
+        starts, ends = np.concatenate(([0], bounds)), np.concatenate((bounds, [len(ts)]))
+        first, last = int(ts[0]), int(ts[-1])
+        for lo, hi in zip(starts, ends):
+            day_start = int(day_ids[lo]) * DAY_MS
+            # Slots of this day inside [first candle, last candle]: listing day and today are partial
+            slot_lo, slot_hi = max(day_start, first), min(day_start + DAY_MS - step, last)
+            expected = (slot_hi - slot_lo) // step + 1
+            day = pd.Timestamp(day_start, unit='ms').strftime('%Y-%m-%d')
+            days[day] = {"expected": int(expected), "actual": int(hi - lo), "crc": zlib.crc32(rows[lo:hi].tobytes())}
+
+    confirmed = {tuple(g["range"]) for g in (previous or {}).get("gaps", []) if g.get("confirmed")}
+    gaps = [{"range": g, "candles": (g[1] - g[0]) // step + 1, "confirmed": tuple(g) in confirmed} for g in find_gaps(ts, step)]
+    return {
+        "version": INDEX_VERSION, "tf": tf, "rows": int(len(ts)), "duplicates": int(len(ts) - len(np.unique(ts))),
+        "first_ms": int(ts[0]) if len(ts) else None, "last_ms": int(ts[-1]) if len(ts) else None,
+        "file": file_state(file_path), "indexed_at": int(time.time()),
+        "days": days, "gaps": gaps
+    }
+
+def compare(previous, index):
+    # Days whose rows changed without their count changing (silent rewrites / corruption). The previous
+    # last day is skipped: its newest candle was still forming and syncs replace it.
+    if not previous: return []
+    old = previous.get("days", {})
+    forming = pd.Timestamp(previous["last_ms"], unit='ms').strftime('%Y-%m-%d') if previous.get("last_ms") else None
+    return sorted(d for d, v in index["days"].items() if d in old and d != forming and old[d]["actual"] == v["actual"] and old[d]["crc"] != v["crc"])
+
+def check(file_path, tf):
+    previous = load_index(file_path)
+    index = build_index(file_path, tf, previous)
+    index["modified_days"] = compare(previous, index)
+    save_index(file_path, index)
+    return index
+
+def current_index(file_path, tf):
+    # The stored index while the file hasn't changed since, else a rebuilt one
+    index = load_index(file_path)
+    if index and index.get("version") == INDEX_VERSION and index.get("file") == file_state(file_path): return index
+    return check(file_path, tf)
+
+def repair(symbol, tf, source="BINANCE", remote=None, budget=None):
+    # Refetch the unconfirmed gaps only; gaps the source answered empty are confirmed. Returns a summary.
+    file_path = fast_vault.vault_path(symbol, tf, source)
+    if not os.path.exists(file_path): return {"file": file_path, "error": "missing"}
+    index = current_index(file_path, tf)
+    fetch, per_request, workers = fast_vault.VAULT_SOURCES[source]
+    step = fast_vault.TF_SECONDS[tf] * 1000
+    open_gaps = [g for g in index["gaps"] if not g["confirmed"]]
+    span = per_request * step
+    pages, head = [], None
+    for g in open_gaps:
+        lo, hi = g["range"]
+        if index["first_ms"] is not None and hi == index["first_ms"] - step and lo == fast_vault.VAULT_START_MS:
+            # Before the first candle: probe the page right before it instead of years of empty pages
+            head = (max(lo, hi - span + step), hi)
+            pages.append((remote or symbol, tf, *head))
+            continue
+        for start in range(lo, hi + 1, span): pages.append((remote or symbol, tf, start, min(start + span - step, hi)))
+    rows, failed = fast_vault.fetch_pages(fetch, pages, workers, budget)
+    filled = 0
+    if rows:
+        new_df = fast_vault.candles_frame(rows)
+        before = index["rows"]
+        fast_vault.append_candles(file_path, new_df)
+        index = build_index(file_path, tf, index)
+        filled = index["rows"] - before
+    # Whatever is still missing inside a range every page of which was answered is not coming back;
+    # an answered, empty head probe means the market starts where the file does (a non-empty one: the
+    # next repair goes further back). Ranges overlapping a failed page stay open for the next repair.
+    answered = lambda lo, hi: not any(p[2] <= hi and lo <= p[3] for p in failed)
+    asked = [g["range"] for g in open_gaps if (head is None or g["range"][1] != head[1]) and answered(*g["range"])]
+    head_empty = head is not None and answered(*head) and not any(head[0] <= int(r[0]) <= head[1] for r in rows)
+    for g in index["gaps"]:
+        if any(a[0] <= g["range"][0] and g["range"][1] <= a[1] for a in asked): g["confirmed"] = True
+        if head_empty and g["range"][0] == fast_vault.VAULT_START_MS: g["confirmed"] = True
+    index["modified_days"] = []
+    index["checked_at"] = int(time.time())
+    save_index(file_path, index)
+    return {"file": file_path, "gaps_fetched": len(open_gaps), "requests": len(pages), "failed_requests": len(failed), "candles_filled": filled,
+            "gaps_left": sum(1 for g in index["gaps"] if not g["confirmed"])}
+
+def vault_files(vault_dir=None):
+    # (source, symbol, tf, path) of every vault file
+    vault_dir = vault_dir or fast_vault.VAULT_DIR
+    for source in fast_vault.VAULT_SOURCES:
+        folder = vault_dir if source == "BINANCE" else os.path.join(vault_dir, source.lower())
+        if not os.path.isdir(folder): continue
+        for name in sorted(os.listdir(folder)):
+            if not name.endswith(".parquet"): continue
+            symbol, _, tf = name[:-len(".parquet")].rpartition("_")
+            if tf in fast_vault.TF_SECONDS: yield source, symbol, tf, os.path.join(folder, name)
+
+def summary(index):
+    short = [d for d, v in index["days"].items() if v["actual"] < v["expected"]]
+    open_gaps = [g for g in index["gaps"] if not g["confirmed"]]
+    return short, open_gaps
+
+def main():
+    parser = argparse.ArgumentParser(description="Index, verify and repair the Parquet vault")
+    parser.add_argument("only", nargs="*", help="<symbol>_<tf> names to limit to (default: every file)")
+    parser.add_argument("--repair", action="store_true", help="refetch the missing ranges")
+    args = parser.parse_args()
+    bad = 0
+    for source, symbol, tf, path in vault_files():
+        if args.only and f"{symbol}_{tf}" not in args.only: continue
+        index = check(path, tf)
+        short, open_gaps = summary(index)
+        missing = sum(g["candles"] for g in open_gaps)
+        flag = "✅" if not (open_gaps or index["modified_days"] or index["duplicates"]) else "⚠️"
+        print(f"{flag} {source:<8}{symbol}_{tf}: {index['rows']} candles, {len(short)} short days, "
+              f"{len(open_gaps)} gaps ({missing} candles), {len(index['modified_days'])} modified days, {index['duplicates']} duplicates")
+        if args.repair and open_gaps:
+            remote = None
+            if source != "BINANCE":
+                # Venue candle names come from the demand records backtests leave (see app/vault_scheduler.py)
+                from app.vault_scheduler import vault_scheduler, entry_key
+                remote = vault_scheduler.read_demand().get(entry_key(source, symbol, tf), {}).get("remote")
+                if not remote:
+                    print("   ⏭️ no candle name recorded for this venue file yet, skipped")
+                    bad += 1
+                    continue
+            res = repair(symbol, tf, source, remote)
+            print(f"   🔧 {res['requests']} requests ({res['failed_requests']} failed), {res['candles_filled']} candles filled, {res['gaps_left']} gaps left")
+            open_gaps = [] if not res["gaps_left"] else open_gaps
+        bad += bool(open_gaps or index["modified_days"])
+    sys.exit(1 if bad else 0)
+
+if __name__ == "__main__":
+    main()
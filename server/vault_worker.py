@@ -0,0 +1,34 @@
+import signal
+import asyncio
+import argparse
+from app.vault_scheduler import vault_scheduler, SCHEDULER_MODE
+from app.symbols import symbol_registry
+
+# Standalone vault scheduler (VAULT_SCHEDULER=sidecar for the API), sharing VAULT_DIR with it.
+# Replaces running mass_vault_builder.py / expanded_vault_builder.py by hand: --seed registers
+# demand once, after which the scheduler keeps those vaults fresh along with whatever users backtest.
+#
+#   python vault_worker.py
+#   python vault_worker.py --seed BTCUSDT,ETHUSDT,SOLUSDT --timeframes 1d,4h,1h,15m,5m --source COINDCX
+
+async def run(args):
+    if args.seed:
+        if args.source != "BINANCE": await asyncio.to_thread(symbol_registry.load)
+        for sym in filter(None, args.seed.split(",")):
+            market = symbol_registry.get(args.source, sym)
+            remote = market.candles if args.source != "BINANCE" else None
+            for tf in filter(None, args.timeframes.split(",")): vault_scheduler.note_demand(args.source, market.vault_key, tf, remote)
+        await asyncio.to_thread(vault_scheduler.flush)
+        print(f"🌱 Seeded {args.seed} x {args.timeframes} ({args.source}).")
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM): loop.add_signal_handler(sig, stop.set)
+    await vault_scheduler.run(lambda: not stop.is_set(), stop)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keep the Parquet vault fresh in the background")
+    parser.add_argument("--seed", default="", help="comma list of symbols to keep fresh even before anyone backtests them")
+    parser.add_argument("--timeframes", default="1d,4h,1h,15m,5m")
+    parser.add_argument("--source", default="BINANCE", choices=["BINANCE", "DELTA", "COINDCX"])
+    if SCHEDULER_MODE == "api": print("⚠️ VAULT_SCHEDULER=api: the API also competes for the scheduler lock (only one runs).")
+    asyncio.run(run(parser.parse_args()))